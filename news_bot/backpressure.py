@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any
+
+from news_bot.config import Settings
+from news_bot.database import Database
+from news_bot.metrics import QUEUE_DEPTH
+from news_bot.models import QueueType
+
+logger = logging.getLogger(__name__)
+
+
+class BackpressureController:
+    def __init__(self, settings: Settings, db: Database) -> None:
+        self.settings = settings
+        self.db = db
+        self.depths: dict[str, int] = {}
+        self.throttled: dict[str, bool] = {}
+        self.shed_total = 0
+        self._task: asyncio.Task[None] | None = None
+        self._stop_event = asyncio.Event()
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            await self._task
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("backpressure refresh failed")
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.settings.backpressure_check_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def is_throttled(self, queue_type: QueueType) -> bool:
+        return self.throttled.get(queue_type.value, False)
+
+    def rss_paused(self) -> bool:
+        return self.is_throttled(QueueType.SCRAPE) or self.is_throttled(QueueType.UPLOAD)
+
+    def priority_cap(self, queue_type: QueueType) -> int | None:
+        if queue_type == QueueType.SCRAPE and self.is_throttled(QueueType.UPLOAD):
+            return self.settings.backpressure_protected_priority
+        return None
+
+    async def refresh(self) -> None:
+        self.depths = await self.db.queue_depths()
+        for queue_type in QueueType:
+            QUEUE_DEPTH.labels(queue_type.value).set(self.depths.get(queue_type.value, 0))
+        for queue_type, high in self.settings.queue_high_watermarks.items():
+            low = self.settings.queue_low_watermarks.get(queue_type, high)
+            depth = self.depths.get(queue_type, 0)
+            was_throttled = self.throttled.get(queue_type, False)
+            if not was_throttled and depth >= high:
+                self.throttled[queue_type] = True
+                logger.warning("backpressure on queue=%s depth=%s high=%s", queue_type, depth, high)
+            elif was_throttled and depth <= low:
+                self.throttled[queue_type] = False
+                logger.info("backpressure off queue=%s depth=%s low=%s", queue_type, depth, low)
+        if any(self.throttled.values()):
+            await self._shed_stale()
+
+    async def _shed_stale(self) -> None:
+        cutoff = (datetime.utcnow() - timedelta(minutes=self.settings.stale_after_minutes)).isoformat()
+        min_priority = self.settings.backpressure_protected_priority + 1
+        for queue_type in (QueueType.SCRAPE, QueueType.UPLOAD):
+            dropped = await self.db.drop_stale_queue(queue_type, cutoff, min_priority)
+            if dropped:
+                self.shed_total += dropped
+                self.depths[queue_type.value] = max(self.depths.get(queue_type.value, 0) - dropped, 0)
+                logger.warning("shed stale items queue=%s count=%s", queue_type.value, dropped)
+
+    def describe(self) -> dict[str, Any]:
+        queues = {}
+        for queue_type in QueueType:
+            key = queue_type.value
+            queues[key] = {
+                "depth": self.depths.get(key, 0),
+                "high": self.settings.queue_high_watermarks.get(key),
+                "low": self.settings.queue_low_watermarks.get(key),
+                "throttled": self.throttled.get(key, False),
+            }
+        return {"queues": queues, "rss_paused": self.rss_paused(), "shed_total": self.shed_total}
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from news_bot.database import Database
+from news_bot.fair_queue import FairQueuePolicy
+from news_bot.metrics import DB_LOCK_WAIT_SECONDS
+from news_bot.models import NewsStatus, QueueType
+from news_bot.pipeline_trace import percentile
+from news_bot.search_index import SearchIndex
+from news_bot.state_manager import StateManager
+from news_bot.utils.id_generator import dedupe_hash
+from news_bot.utils.persian_text import normalize, search_text
+
+logger = logging.getLogger(__name__)
+
+
+CHUNK = 10000
+PARAGRAPH = "<p>" + "متن آزمایشی خبر برای سنجش اندازه پایگاه داده. " * 12 + "</p>"
+STATUS_WEIGHTS = (
+    (NewsStatus.PUBLISHED, 70),
+    (NewsStatus.DELETED, 8),
+    (NewsStatus.FAILED, 6),
+    (NewsStatus.STALE, 6),
+    (NewsStatus.UPLOADED, 4),
+    (NewsStatus.SCRAPED, 3),
+    (NewsStatus.NEW, 3),
+)
+QUEUE_WEIGHTS = ((QueueType.SCRAPE, 70), (QueueType.UPLOAD, 20), (QueueType.PUBLISH, 10))
+VOCABULARY = [f"{head}{tail}" for head in ("بر", "دا", "کو", "مه", "سا", "نو", "پا", "تر", "گل", "شه", "ری", "زا", "فر", "لو", "جا") for tail in ("ند", "رش", "ست", "یان", "گاه", "وری", "مان", "زه", "کار", "نگ", "بد", "هر", "دان", "یر", "وش")]
+
+
+@dataclass(slots=True)
+class ScaleConfig:
+    seen_hashes: int = 1_000_000
+    news: int = 500_000
+    queue: int = 100_000
+    body_bytes: int = 4000
+    concurrency: int = 16
+    seconds_per_workload: float = 10.0
+    seed: int = 7
+
+
+def source_url(number: int) -> str:
+    return f"https://www.khabaronline.ir/news/{number}"
+
+
+def title(number: int) -> str:
+    return f"خبر آزمایشی شماره {number}"
+
+
+def weighted(rng: random.Random, weights: tuple[tuple[object, int], ...]):
+    return rng.choices([value for value, _ in weights], [weight for _, weight in weights])[0]
+
+
+def populate(path: Path, config: ScaleConfig) -> None:
+    rng = random.Random(config.seed)
+    body = (PARAGRAPH * (config.body_bytes // len(PARAGRAPH.encode()) + 1))[: config.body_bytes // 2]
+    indexed_body = search_text(body)
+    started = datetime.utcnow() - timedelta(days=365)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=OFF;")
+    try:
+        for offset in range(0, config.news, CHUNK):
+            rows = []
+            for number in range(offset, min(offset + CHUNK, config.news)):
+                created = (started + timedelta(seconds=number * 365 * 86400 // max(config.news, 1))).isoformat()
+                status = weighted(rng, STATUS_WEIGHTS)
+                edit_url = f"https://cms.example/{number}/edit/" if status in {NewsStatus.UPLOADED, NewsStatus.PUBLISHED} else None
+                lead = " ".join(rng.sample(VOCABULARY, 3)) + " " + body[:300]
+                rows.append((
+                    f"news-{number}", source_url(number), title(number), lead, body,
+                    None, "سیاسی", status.value, edit_url, f"https://www.khabaronline.ir/rss/tp/{number % 12}", created, created,
+                    number + 1,
+                ))
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO news(id, source_url, title, lead, content_html, image_path, category, status, cms_edit_url, feed_url, created_at, updated_at, search_rowid)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO news_fts(rowid, news_id, title, lead, body) VALUES (?, ?, ?, ?, ?)",
+                [(row[12], row[0], normalize(row[2]), normalize(row[3]), indexed_body) for row in rows],
+            )
+            conn.commit()
+        now = datetime.utcnow().isoformat()
+        for offset in range(0, config.seen_hashes, CHUNK):
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen_hashes(hash, created_at) VALUES (?, ?)",
+                [(dedupe_hash(source_url(number), title(number)), now) for number in range(offset, min(offset + CHUNK, config.seen_hashes))],
+            )
+            conn.commit()
+        for offset in range(0, config.queue, CHUNK):
+            conn.executemany(
+                "INSERT OR IGNORE INTO queues(news_id, queue_type, priority, created_at) VALUES (?, ?, ?, ?)",
+                [
+                    (f"news-{rng.randrange(max(config.news, 1))}", weighted(rng, QUEUE_WEIGHTS).value, rng.choice((1, 100, 100, 100)), now)
+                    for _ in range(offset, min(offset + CHUNK, config.queue))
+                ],
+            )
+            conn.commit()
+    finally:
+        conn.close()
+
+
+class Workloads:
+    def __init__(self, db: Database, config: ScaleConfig) -> None:
+        self.db = db
+        self.config = config
+        self.state_manager = StateManager(db)
+        self.search_index = SearchIndex(db)
+        self.policy = FairQueuePolicy()
+        self.rng = random.Random(config.seed)
+        self._fresh = 0
+
+    def _fresh_id(self) -> str:
+        self._fresh += 1
+        return f"bench-{self._fresh}"
+
+    async def add_queue(self) -> None:
+        await self.db.add_queue(self._fresh_id(), QueueType.SCRAPE)
+
+    async def pop_queue(self) -> None:
+        await self.db.pop_queue(weighted(self.rng, QUEUE_WEIGHTS))
+
+    async def pop_queue_fair(self) -> None:
+        await self.db.pop_queue(weighted(self.rng, QUEUE_WEIGHTS), policy=self.policy)
+
+    async def rss_dedupe(self) -> None:
+        number = self.rng.randrange(int(self.config.seen_hashes * 1.25) + 1)
+        exists = await self.db.fetchone("SELECT hash FROM seen_hashes WHERE hash = ?", (dedupe_hash(source_url(number), title(number)),))
+        if not exists:
+            await self.db.fetchone("SELECT id FROM news WHERE source_url = ?", (source_url(number),))
+
+    async def get_state(self) -> None:
+        await self.state_manager.load()
+
+    async def status_queries(self) -> None:
+        choice = self.rng.randrange(3)
+        if choice == 0:
+            await self.db.queue_depths()
+        elif choice == 1:
+            await self.db.fetchall("SELECT status, COUNT(*) AS total FROM news GROUP BY status")
+        else:
+            await self.db.fetchall(
+                """
+                SELECT n.id, n.feed_url FROM news n
+                WHERE n.status = ? AND n.cms_edit_url IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM queues q WHERE q.news_id = n.id AND q.queue_type = ?)
+                ORDER BY n.updated_at
+                """,
+                (NewsStatus.UPLOADED.value, QueueType.PUBLISH.value),
+            )
+
+    async def search(self) -> None:
+        if self.rng.randrange(2):
+            query = " ".join(self.rng.sample(VOCABULARY, 2))
+        else:
+            query = f'"شماره {self.rng.randrange(max(self.config.news, 1))}"'
+        await self.search_index.search(query)
+
+    def operations(self) -> dict[str, Callable[[], Awaitable[None]]]:
+        return {
+            "add_queue": self.add_queue,
+            "pop_queue": self.pop_queue,
+            "pop_queue_fair": self.pop_queue_fair,
+            "rss_dedupe": self.rss_dedupe,
+            "get_state": self.get_state,
+            "status_queries": self.status_queries,
+            "search": self.search,
+        }
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict[str, float]:
+    if not latencies:
+        return {"ops": 0, "ops_per_second": 0.0}
+    return {
+        "ops": len(latencies),
+        "ops_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+async def run_workload(operations: dict[str, Callable[[], Awaitable[None]]], concurrency: int, seconds: float) -> dict[str, object]:
+    latencies: dict[str, list[float]] = {name: [] for name in operations}
+    names = list(operations)
+    lock_count, lock_sum = sum(DB_LOCK_WAIT_SECONDS.counts), DB_LOCK_WAIT_SECONDS.sum
+    deadline = time.perf_counter() + seconds
+
+    async def client(index: int) -> None:
+        turn = index
+        while time.perf_counter() < deadline:
+            name = names[turn % len(names)]
+            turn += 1
+            started = time.perf_counter()
+            await operations[name]()
+            latencies[name].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    waits = sum(DB_LOCK_WAIT_SECONDS.counts) - lock_count
+    return {
+        "operations": {name: summarize(values, elapsed) for name, values in latencies.items()},
+        "mean_lock_wait_ms": (DB_LOCK_WAIT_SECONDS.sum - lock_sum) / waits * 1000 if waits else 0.0,
+    }
+
+
+async def run_benchmark(config: ScaleConfig, path: Path) -> dict[str, object]:
+    db = Database(path)
+    await db.initialize()
+    row = await db.fetchone("SELECT COUNT(*) AS total FROM news")
+    if row["total"] < config.news:
+        started = time.perf_counter()
+        await asyncio.to_thread(populate, path, config)
+        logger.info("populated %s in %.1fs", path, time.perf_counter() - started)
+    workloads = Workloads(db, config)
+    operations = workloads.operations()
+    results: dict[str, object] = {}
+    for name, operation in operations.items():
+        results[name] = await run_workload({name: operation}, config.concurrency, config.seconds_per_workload)
+        logger.info("%s: %s", name, results[name]["operations"][name])
+    results["mixed"] = await run_workload(operations, config.concurrency, config.seconds_per_workload)
+    return {
+        "config": asdict(config),
+        "db_bytes": sum(candidate.stat().st_size for candidate in path.parent.glob(path.name + "*")),
+        "workloads": results,
+    }
+
+
+def compare(report: dict[str, object], baseline: dict[str, object], tolerance: float) -> list[str]:
+    regressions = []
+    for workload, result in baseline["workloads"].items():
+        current = report["workloads"].get(workload)
+        if not current:
+            continue
+        for name, stats in result["operations"].items():
+            now = current["operations"].get(name, {})
+            if stats.get("ops_per_second") and now.get("ops_per_second", 0) < stats["ops_per_second"] * (1 - tolerance):
+                regressions.append(f"{workload}/{name} {now.get('ops_per_second', 0):.0f} ops/s < baseline {stats['ops_per_second']:.0f}")
+            if stats.get("p99_ms") and now.get("p99_ms", 0) > stats["p99_ms"] * (1 + tolerance):
+                regressions.append(f"{workload}/{name} p99 {now['p99_ms']:.1f}ms > baseline {stats['p99_ms']:.1f}ms")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    defaults = ScaleConfig()
+    parser = argparse.ArgumentParser(description="SQLite queue and history benchmark at production-sized volumes")
+    parser.add_argument("--db", type=Path, default=Path("bench_scale.db"), help="reused if already populated")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for row counts")
+    parser.add_argument("--body-bytes", type=int, default=defaults.body_bytes)
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency)
+    parser.add_argument("--seconds", type=float, default=defaults.seconds_per_workload, help="duration of each workload")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="fail if the run regresses against this report")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    config = ScaleConfig(
+        seen_hashes=int(defaults.seen_hashes * args.scale),
+        news=int(defaults.news * args.scale),
+        queue=int(defaults.queue * args.scale),
+        body_bytes=args.body_bytes,
+        concurrency=args.concurrency,
+        seconds_per_workload=args.seconds,
+    )
+    report = asyncio.run(run_benchmark(config, args.db))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for regression in regressions:
+            logger.error("regression: %s", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from news_bot.benchmarks.stand_ins import CMSStandIn, NewsSiteStandIn, TelegramStandIn
+from news_bot.config import Settings
+from news_bot.database import Database
+from news_bot.main import App
+from news_bot.pipeline_trace import DISCOVERED, PUBLISHED, SCRAPED, UPLOADED, percentile
+
+logger = logging.getLogger(__name__)
+
+
+BENCH_CHAT_ID = 4242
+BENCH_USER = ("bench", "bench-password")
+STAGES = (
+    ("discovered→scraped", DISCOVERED, SCRAPED),
+    ("scraped→uploaded", SCRAPED, UPLOADED),
+    ("uploaded→published", UPLOADED, PUBLISHED),
+    ("discovered→published", DISCOVERED, PUBLISHED),
+)
+
+
+@dataclass(slots=True)
+class BenchmarkConfig:
+    feeds: int = 3
+    items_per_minute: float = 6.0
+    duration_seconds: int = 120
+    rss_interval_seconds: int = 5
+    approve_action: str = "publish"
+    approve_delay_seconds: float = 0.5
+    upload_concurrency: int = 2
+
+
+def build_settings(config: BenchmarkConfig, workdir: Path, site: NewsSiteStandIn, cms: CMSStandIn, telegram: TelegramStandIn) -> Settings:
+    settings = Settings(base_dir=workdir)
+    settings.rss_feeds = site.feed_urls()
+    settings.rss_interval_seconds = config.rss_interval_seconds
+    settings.cms_login_url = cms.login_url
+    settings.cms_add_url = cms.add_url
+    settings.cms_relogin_hours = None
+    settings.telegram_token = "100:bench"
+    settings.telegram_api_base_url = f"{telegram.url}/bot"
+    settings.allowed_chat_id = BENCH_CHAT_ID
+    settings.telegram_coalesce_seconds = 0.5
+    settings.publish_min_gap_seconds = 0
+    settings.publish_jitter_seconds = 0
+    settings.publish_max_per_hour = 0
+    settings.upload_concurrency = config.upload_concurrency
+    settings.worker_processes = 0
+    settings.metrics_port = 0
+    settings.headless = True
+    return settings
+
+
+async def seed(settings: Settings) -> None:
+    db = Database(settings.db_path)
+    await db.initialize()
+    await db.execute(
+        "INSERT OR REPLACE INTO cms_users(username, password, created_at) VALUES (?, ?, datetime('now'))",
+        BENCH_USER,
+    )
+    await db.execute("UPDATE state SET bot_status = 'ON', selected_user = ? WHERE id = 1", (BENCH_USER[0],))
+
+
+def usage() -> dict[str, float]:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "cpu_seconds": own.ru_utime + own.ru_stime,
+        "child_cpu_seconds": children.ru_utime + children.ru_stime,
+        "max_rss_mb": own.ru_maxrss / 1024,
+        "child_max_rss_mb": children.ru_maxrss / 1024,
+    }
+
+
+async def run_benchmark(config: BenchmarkConfig) -> dict[str, object]:
+    site = NewsSiteStandIn(config.feeds, config.items_per_minute)
+    cms = CMSStandIn(*BENCH_USER)
+    telegram = TelegramStandIn(BENCH_CHAT_ID, config.approve_action, config.approve_delay_seconds, otp_source=cms)
+    for server in (site, cms, telegram):
+        server.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="news-bot-bench-") as tmp:
+            settings = build_settings(config, Path(tmp), site, cms, telegram)
+            await seed(settings)
+            app = App(settings=settings)
+            before = usage()
+            started = time.time()
+            site.started_at = started
+            task = asyncio.create_task(app.run())
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout=config.duration_seconds)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            elapsed = time.time() - started
+            return await build_report(config, app, site, cms, telegram, elapsed, before, usage())
+    finally:
+        for server in (site, cms, telegram):
+            server.stop()
+
+
+async def build_report(
+    config: BenchmarkConfig,
+    app: App,
+    site: NewsSiteStandIn,
+    cms: CMSStandIn,
+    telegram: TelegramStandIn,
+    elapsed: float,
+    before: dict[str, float],
+    after: dict[str, float],
+) -> dict[str, object]:
+    offered = site.item_count(site.started_at + elapsed) - site.initial_items
+    published = cms.published()
+    source_times = {
+        site.title(feed, number): site.item_time(number)
+        for feed in range(config.feeds)
+        for number in range(site.item_count(site.started_at + elapsed))
+    }
+    end_to_end = [
+        float(story["published_at"]) - source_times[str(story["title"])]
+        for story in published
+        if str(story["title"]) in source_times
+    ]
+    stages: dict[str, object] = {}
+    for label, start, end in STAGES:
+        result = (await app.tracer.stage_latency(start, end, 0)).get("all")
+        stages[label] = {"count": result[0], "p50": result[1], "p95": result[2]} if result else None
+    counts = await app.db.fetchall("SELECT status, COUNT(*) AS total FROM news GROUP BY status")
+    return {
+        "config": asdict(config),
+        "elapsed_seconds": elapsed,
+        "offered_items": offered,
+        "published_items": len(published),
+        "uploaded_items": len(cms.stories),
+        "throughput_per_minute": len(published) * 60 / elapsed if elapsed else 0.0,
+        "source_to_published": {
+            "p50": percentile(end_to_end, 0.5),
+            "p95": percentile(end_to_end, 0.95),
+        } if end_to_end else None,
+        "stages": stages,
+        "news_status": {row["status"]: row["total"] for row in counts},
+        "cms_logins": cms.logins_total,
+        "telegram_messages": len(telegram.sent),
+        "feed_not_modified": site.not_modified_total,
+        "browser_launches": app.browser_host.launches_total,
+        "browser_idle_closes": app.browser_host.idle_closes_total,
+        "loop_stalls": app.watchdog.stalls_total,
+        "longest_loop_stall_seconds": app.watchdog.longest_stall,
+        "resources": {
+            "cpu_seconds": after["cpu_seconds"] - before["cpu_seconds"],
+            "child_cpu_seconds": after["child_cpu_seconds"] - before["child_cpu_seconds"],
+            "max_rss_mb": after["max_rss_mb"],
+            "child_max_rss_mb": after["child_max_rss_mb"],
+        },
+    }
+
+
+def compare(report: dict[str, object], baseline: dict[str, object], tolerance: float) -> list[str]:
+    regressions = []
+    throughput, base_throughput = report["throughput_per_minute"], baseline["throughput_per_minute"]
+    if base_throughput and throughput < base_throughput * (1 - tolerance):
+        regressions.append(f"throughput {throughput:.2f}/min < baseline {base_throughput:.2f}/min")
+    latency, base_latency = report.get("source_to_published"), baseline.get("source_to_published")
+    if base_latency and (not latency or latency["p95"] > base_latency["p95"] * (1 + tolerance)):
+        regressions.append(f"source→published p95 {latency['p95'] if latency else 'n/a'} > baseline {base_latency['p95']:.1f}s")
+    cpu, base_cpu = report["resources"]["cpu_seconds"], baseline["resources"]["cpu_seconds"]
+    if base_cpu and cpu > base_cpu * (1 + tolerance):
+        regressions.append(f"cpu {cpu:.1f}s > baseline {base_cpu:.1f}s")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local stand-in services")
+    parser.add_argument("--feeds", type=int, default=defaults.feeds)
+    parser.add_argument("--items-per-minute", type=float, default=defaults.items_per_minute, help="new items per feed per minute")
+    parser.add_argument("--duration", type=int, default=defaults.duration_seconds)
+    parser.add_argument("--rss-interval", type=int, default=defaults.rss_interval_seconds)
+    parser.add_argument("--approve", choices=("publish", "publishnow", "none"), default=defaults.approve_action)
+    parser.add_argument("--upload-concurrency", type=int, default=defaults.upload_concurrency)
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="fail if the run regresses against this report")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    config = BenchmarkConfig(
+        feeds=args.feeds,
+        items_per_minute=args.items_per_minute,
+        duration_seconds=args.duration,
+        rss_interval_seconds=args.rss_interval,
+        approve_action=args.approve,
+        upload_concurrency=args.upload_concurrency,
+    )
+    if config.approve_action == "none":
+        config.approve_action = ""
+    report = asyncio.run(run_benchmark(config))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for regression in regressions:
+            logger.error("regression: %s", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
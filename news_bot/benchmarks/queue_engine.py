@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from news_bot.database import Database
+from news_bot.fair_queue import FairQueuePolicy
+from news_bot.memory_queue import MemoryQueueEngine
+from news_bot.models import NewsStatus, QueueType
+from news_bot.pipeline_trace import percentile
+
+logger = logging.getLogger(__name__)
+
+
+FEEDS = ("https://a.example/rss", "https://b.example/rss", "https://c.example/rss", None)
+PRIORITIES = (1, 50, 100, 100, 100)
+OPERATIONS = (
+    ("add", 30),
+    ("add_many", 4),
+    ("ingest", 3),
+    ("pop", 25),
+    ("pop_fair", 25),
+    ("pop_urgent", 5),
+    ("defer", 6),
+    ("delete", 3),
+    ("drop_stale", 1),
+)
+
+
+def news_id(number: int) -> str:
+    return f"q{number:06d}"
+
+
+def feed_of(number: int) -> str | None:
+    return FEEDS[number % len(FEEDS)]
+
+
+def comparable(row: Any) -> tuple[Any, ...] | None:
+    if row is None:
+        return None
+    return (row["news_id"], row["queue_type"], row["priority"])
+
+
+def script(operations: int, news: int, seed: int) -> list[tuple[Any, ...]]:
+    rng = random.Random(seed)
+    kinds = [kind for kind, weight in OPERATIONS for _ in range(weight)]
+    queue_types = list(QueueType)
+    seen: list[int] = []
+    steps: list[tuple[Any, ...]] = []
+    for _ in range(operations):
+        kind = rng.choice(kinds)
+        queue_type = rng.choice(queue_types)
+        if kind == "add":
+            if queue_type is QueueType.SCRAPE or not seen:
+                number = rng.randrange(news)
+                seen.append(number)
+                steps.append((kind, QueueType.SCRAPE, number, rng.choice(PRIORITIES)))
+            else:
+                steps.append((kind, queue_type, rng.choice(seen), rng.choice(PRIORITIES)))
+        elif kind == "add_many" and seen:
+            steps.append((kind, QueueType.PUBLISH, rng.sample(seen, min(len(seen), rng.randrange(1, 8))), rng.choice(PRIORITIES)))
+        elif kind == "ingest":
+            steps.append((kind, [rng.randrange(news, news * 2) for _ in range(rng.randrange(1, 5))], rng.choice(PRIORITIES)))
+        elif kind in ("pop", "pop_fair", "pop_urgent"):
+            steps.append((kind, queue_type))
+        elif kind == "defer" and seen:
+            steps.append((kind, queue_type, rng.choice(seen), rng.choice(PRIORITIES), rng.random() < 0.5))
+        elif kind == "delete":
+            steps.append((kind, queue_type, rng.random()))
+        elif kind == "drop_stale":
+            steps.append((kind, queue_type))
+    return steps
+
+
+async def seed_news(db: Database, news: int) -> None:
+    now = datetime.utcnow()
+    rows = []
+    for number in range(news):
+        created_at = (now - timedelta(hours=3 if number % 7 == 0 else 0)).isoformat()
+        rows.append((news_id(number), f"https://news.example/{number}", f"story {number}", NewsStatus.NEW.value, feed_of(number), created_at, created_at))
+    await db.executemany(
+        """
+        INSERT INTO news(id, source_url, title, lead, content_html, image_path, category, status, cms_edit_url, feed_url, created_at, updated_at)
+        VALUES (?, ?, ?, '', '', NULL, 'سیاسی', ?, NULL, ?, ?, ?)
+        """,
+        rows,
+    )
+
+
+async def apply(db: Database, step: tuple[Any, ...], policy: FairQueuePolicy, stale_before: str) -> Any:
+    kind = step[0]
+    if kind == "add":
+        _, queue_type, number, priority = step
+        flow = feed_of(number) if queue_type is QueueType.SCRAPE else None
+        return await db.add_queue(news_id(number), queue_type, priority, flow=flow)
+    if kind == "add_many":
+        _, queue_type, numbers, priority = step
+        return await db.add_queue_many([news_id(number) for number in numbers], queue_type, priority)
+    if kind == "ingest":
+        _, numbers, priority = step
+        counts, queued = await db.ingest_urls([(news_id(number), f"https://news.example/{number}") for number in numbers], priority)
+        return counts, sorted(queued)
+    if kind == "pop":
+        return comparable(await db.pop_queue(step[1]))
+    if kind == "pop_fair":
+        return comparable(await db.pop_queue(step[1], policy=policy))
+    if kind == "pop_urgent":
+        return comparable(await db.pop_queue(step[1], policy.urgent_priority, policy))
+    if kind == "defer":
+        _, queue_type, number, priority, parked = step
+        return await db.defer_queue(news_id(number), queue_type, priority, time.time() + (3600 if parked else -1))
+    if kind == "delete":
+        _, queue_type, position = step
+        rows = await db.peek_queue(queue_type)
+        if rows:
+            await db.delete_queue(rows[int(position * len(rows))]["id"])
+        return None
+    if kind == "drop_stale":
+        return await db.drop_stale_queue(step[1], stale_before, 50)
+    raise ValueError(kind)
+
+
+async def queue_state(db: Database) -> dict[str, Any]:
+    return {
+        "depths": await db.queue_depths(),
+        "queues": {queue_type.value: [comparable(row) for row in await db.peek_queue(queue_type)] for queue_type in QueueType},
+    }
+
+
+async def queue_ids(db: Database) -> dict[str, list[int]]:
+    return {queue_type.value: [row["id"] for row in await db.peek_queue(queue_type)] for queue_type in QueueType}
+
+
+async def open_database(directory: Path, name: str, news: int, engine: bool) -> tuple[Database, MemoryQueueEngine | None]:
+    db = Database(directory / f"{name}.db")
+    await db.initialize()
+    await seed_news(db, news)
+    queue_engine = None
+    if engine:
+        queue_engine = MemoryQueueEngine(db, directory / f"{name}.journal")
+        await queue_engine.load()
+        db.attach_queue_engine(queue_engine)
+    return db, queue_engine
+
+
+async def run_parity(directory: Path, operations: int, news: int, seed: int) -> dict[str, Any]:
+    policy = FairQueuePolicy(aging_seconds=15, urgent_priority=1, weights={FEEDS[0]: 2.0})
+    stale_before = (datetime.utcnow() - timedelta(hours=1)).isoformat()
+    reference, _ = await open_database(directory, "parity_sqlite", news, engine=False)
+    candidate, engine = await open_database(directory, "parity_memory", news, engine=True)
+    mismatches: list[str] = []
+    for index, step in enumerate(script(operations, news, seed)):
+        expected = await apply(reference, step, policy, stale_before)
+        actual = await apply(candidate, step, policy, stale_before)
+        if expected != actual:
+            mismatches.append(f"step {index} {step[0]}: sqlite={expected!r} memory={actual!r}")
+            break
+    expected_state = await queue_state(reference)
+    if await queue_state(candidate) != expected_state:
+        mismatches.append("final queue contents differ")
+    live_ids = await queue_ids(candidate)
+    replayed = MemoryQueueEngine(candidate, engine.journal_path)
+    candidate.attach_queue_engine(None)
+    replayed_ops = await replayed.load()
+    candidate.attach_queue_engine(replayed)
+    if await queue_state(candidate) != expected_state:
+        mismatches.append("queue contents differ after journal replay")
+    if await queue_ids(candidate) != live_ids:
+        mismatches.append("queue ids differ after journal replay")
+    step = ("pop_fair", QueueType.SCRAPE)
+    if await apply(reference, step, policy, stale_before) != await apply(candidate, step, policy, stale_before):
+        mismatches.append("fair scheduling state differs after journal replay")
+    await replayed.stop()
+    checkpointed = MemoryQueueEngine(candidate, engine.journal_path)
+    candidate.attach_queue_engine(None)
+    await checkpointed.load()
+    candidate.attach_queue_engine(checkpointed)
+    if await queue_state(candidate) != await queue_state(reference):
+        mismatches.append("queue contents differ after checkpoint reload")
+    await checkpointed.stop()
+    return {"operations": operations, "replayed_operations": replayed_ops, "mismatches": mismatches}
+
+
+async def run_latency(directory: Path, items: int, engine: bool) -> dict[str, dict[str, float]]:
+    db, queue_engine = await open_database(directory, "latency_memory" if engine else "latency_sqlite", items, engine)
+    policy = FairQueuePolicy()
+    latencies: dict[str, list[float]] = {"add_queue": [], "pop_queue": [], "pop_queue_fair": []}
+    for number in range(items):
+        started = time.perf_counter()
+        await db.add_queue(news_id(number), QueueType.SCRAPE, 100, flow=feed_of(number))
+        latencies["add_queue"].append(time.perf_counter() - started)
+    for number in range(items):
+        name = "pop_queue_fair" if number % 2 else "pop_queue"
+        started = time.perf_counter()
+        await db.pop_queue(QueueType.SCRAPE, policy=policy if number % 2 else None)
+        latencies[name].append(time.perf_counter() - started)
+    if queue_engine:
+        await queue_engine.stop()
+    return {
+        name: {"p50_us": percentile(values, 0.5) * 1e6, "p99_us": percentile(values, 0.99) * 1e6}
+        for name, values in latencies.items()
+    }
+
+
+async def run(operations: int, news: int, seed: int, items: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory)
+        return {
+            "parity": await run_parity(path, operations, news, seed),
+            "latency": {
+                "sqlite": await run_latency(path, items, engine=False),
+                "memory": await run_latency(path, items, engine=True),
+            },
+        }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the in-memory queue engine against the SQLite queue and compare latency")
+    parser.add_argument("--operations", type=int, default=5000, help="length of the randomized parity script")
+    parser.add_argument("--news", type=int, default=400, help="distinct stories the script draws from")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--items", type=int, default=2000, help="queue items for the latency run")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    report = asyncio.run(run(args.operations, args.news, args.seed, args.items))
+    print(json.dumps(report, indent=2))
+    for mismatch in report["parity"]["mismatches"]:
+        logger.error("parity: %s", mismatch)
+    return 1 if report["parity"]["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
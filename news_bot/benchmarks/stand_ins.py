@@ -0,0 +1,432 @@
+from __future__ import annotations
+
+import json
+import random
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from email.utils import formatdate
+from html import escape
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LOREM = (
+    "به گزارش خبرنگار سرویس سیاسی، نشست امروز با حضور نمایندگان برگزار شد و درباره برنامه‌های اقتصادی گفت‌وگو شد. "
+    "کارشناسان معتقدند اجرای این طرح می‌تواند بر بازار و معیشت خانوارها اثر بگذارد. "
+)
+TINY_JPEG = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101011100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffda0008010100003f00fbd3ffd9"
+)
+
+
+@dataclass(slots=True)
+class Request:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+    form: dict[str, str] = field(default_factory=dict)
+    cookies: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class Response:
+    status: int = 200
+    body: bytes = b""
+    headers: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def html(cls, text: str, status: int = 200, **headers: str) -> Response:
+        return cls(status, text.encode(), {"Content-Type": "text/html; charset=utf-8", **headers})
+
+    @classmethod
+    def json(cls, payload: object) -> Response:
+        return cls(200, json.dumps(payload, ensure_ascii=False).encode(), {"Content-Type": "application/json"})
+
+    @classmethod
+    def redirect(cls, location: str, **headers: str) -> Response:
+        return cls(302, b"", {"Location": location, **headers})
+
+
+def parse_body(content_type: str, body: bytes) -> dict[str, str]:
+    if not body:
+        return {}
+    if content_type.startswith("application/json"):
+        return {key: value if isinstance(value, str) else json.dumps(value) for key, value in json.loads(body).items()}
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        form = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if not name:
+                continue
+            if part.get_filename():
+                form[name] = part.get_filename()
+            else:
+                form[name] = part.get_payload(decode=True).decode("utf-8", errors="replace")
+        return form
+    return {key: values[-1] for key, values in parse_qs(body.decode("utf-8"), keep_blank_values=True).items()}
+
+
+class StandInServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_: object) -> None:
+                pass
+
+            def _dispatch(self) -> None:
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                cookies = SimpleCookie(self.headers.get("Cookie", ""))
+                request = Request(
+                    method=self.command,
+                    path=parts.path,
+                    query={key: values[-1] for key, values in parse_qs(parts.query).items()},
+                    headers={key.lower(): value for key, value in self.headers.items()},
+                    form=parse_body(self.headers.get("Content-Type", ""), body),
+                    cookies={key: morsel.value for key, morsel in cookies.items()},
+                )
+                try:
+                    response = stand_in.handle(request)
+                except Exception as exc:
+                    response = Response(500, repr(exc).encode())
+                self.send_response(response.status)
+                for key, value in response.headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(response.body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(response.body)
+
+            do_GET = do_POST = do_HEAD = _dispatch
+
+        self.lock = threading.Lock()
+        self.requests_total = 0
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def handle(self, request: Request) -> Response:
+        with self.lock:
+            self.requests_total += 1
+        return self.route(request)
+
+    def route(self, request: Request) -> Response:
+        raise NotImplementedError
+
+
+class NewsSiteStandIn(StandInServer):
+    SITES = ("khabaronline", "mehrnews")
+
+    def __init__(self, feeds: int, items_per_minute: float, initial_items: int = 5, items_in_feed: int = 20) -> None:
+        super().__init__()
+        self.feeds = feeds
+        self.items_per_minute = items_per_minute
+        self.initial_items = initial_items
+        self.items_in_feed = items_in_feed
+        self.started_at = time.time()
+        self.not_modified_total = 0
+
+    def feed_urls(self) -> list[str]:
+        return [f"{self.url}/{self.SITES[index % 2]}/rss/tp/{index}" for index in range(self.feeds)]
+
+    def item_count(self, now: float | None = None) -> int:
+        elapsed = (time.time() if now is None else now) - self.started_at
+        return self.initial_items + int(elapsed * self.items_per_minute / 60)
+
+    def item_time(self, number: int) -> float:
+        return self.started_at + max(number - self.initial_items + 1, 0) * 60 / self.items_per_minute
+
+    @staticmethod
+    def title(feed: int, number: int) -> str:
+        return f"خبر آزمایشی {feed}-{number}"
+
+    def route(self, request: Request) -> Response:
+        parts = request.path.strip("/").split("/")
+        if len(parts) == 4 and parts[1:3] == ["rss", "tp"]:
+            return self._feed(int(parts[3]), request)
+        if len(parts) == 4 and parts[1] == "news":
+            return self._article(int(parts[2]), int(parts[3]))
+        if len(parts) == 4 and parts[1] == "img":
+            return Response(200, TINY_JPEG, {"Content-Type": "image/jpeg"})
+        return Response(404, b"not found")
+
+    def _feed(self, feed: int, request: Request) -> Response:
+        count = self.item_count()
+        etag = f'"{feed}-{count}"'
+        if request.headers.get("if-none-match") == etag:
+            with self.lock:
+                self.not_modified_total += 1
+            return Response(304, b"", {"ETag": etag})
+        site = self.SITES[feed % 2]
+        items = []
+        for number in range(count - 1, max(count - self.items_in_feed, 0) - 1, -1):
+            link = f"{self.url}/{site}/news/{feed}/{number}"
+            items.append(
+                f"<item><title>{escape(self.title(feed, number))}</title><link>{link}</link>"
+                f"<guid>{link}</guid><pubDate>{formatdate(self.item_time(number), usegmt=True)}</pubDate></item>"
+            )
+        xml = (
+            '<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>'
+            f"<title>{site} {feed}</title><link>{self.url}/{site}</link>{''.join(items)}</channel></rss>"
+        )
+        return Response(200, xml.encode(), {"Content-Type": "application/rss+xml; charset=utf-8", "ETag": etag})
+
+    def _article(self, feed: int, number: int) -> Response:
+        site = self.SITES[feed % 2]
+        rng = random.Random(feed * 100000 + number)
+        paragraphs = "".join(f"<p>{LOREM * rng.randint(1, 3)}</p>" for _ in range(rng.randint(4, 10)))
+        title = escape(self.title(feed, number))
+        return Response.html(
+            f"<html><head><title>{title}</title>"
+            f'<meta name="description" content="{escape(LOREM[:120])}"></head><body>'
+            '<div class="ads">تبلیغات</div>'
+            f'<article><h1>{title}</h1><img src="{self.url}/{site}/img/{feed}/{number}.jpg">'
+            f'<div class="item-text" itemprop="articleBody">{paragraphs}'
+            '<div class="related">مطالب مرتبط</div></div></article></body></html>'
+        )
+
+
+class CMSStandIn(StandInServer):
+    LOGIN_PATH = "/admin-start-bench"
+    OTP_PATH = "/admin-otp"
+    ADD_PATH = "/fa/admin/newsstudios/add/"
+    EDIT_PREFIX = "/fa/admin/newsstudios/"
+
+    def __init__(self, username: str, password: str, session_ttl_seconds: int = 24 * 3600) -> None:
+        super().__init__()
+        self.username = username
+        self.password = password
+        self.session_ttl_seconds = session_ttl_seconds
+        self.current_otp: str | None = None
+        self._pending_logins: set[str] = set()
+        self._sessions: set[str] = set()
+        self.logins_total = 0
+        self.stories: dict[int, dict[str, object]] = {}
+
+    @property
+    def login_url(self) -> str:
+        return self.url + self.LOGIN_PATH
+
+    @property
+    def add_url(self) -> str:
+        return self.url + self.ADD_PATH
+
+    def published(self) -> list[dict[str, object]]:
+        with self.lock:
+            return [story for story in self.stories.values() if story.get("published_at")]
+
+    def route(self, request: Request) -> Response:
+        if request.path == self.LOGIN_PATH:
+            return self._login(request)
+        if request.path == self.OTP_PATH:
+            return self._otp(request)
+        if request.cookies.get("sessionid") not in self._sessions:
+            return Response.redirect(self.login_url)
+        if request.path == self.ADD_PATH:
+            return self._add(request)
+        if request.path.startswith(self.EDIT_PREFIX) and request.path.endswith("/edit/"):
+            return self._edit(request, int(request.path[len(self.EDIT_PREFIX):].split("/")[0]))
+        return Response(404, b"not found")
+
+    def _login(self, request: Request) -> Response:
+        if request.method == "GET":
+            return Response.html(
+                "<html><body><form method='post'>"
+                "<input type='text' name='username'><input type='password' name='password'>"
+                "<button type='submit'>ارسال</button></form></body></html>"
+            )
+        if request.form.get("username") != self.username or request.form.get("password") != self.password:
+            return Response.html("<html><body>invalid credentials</body></html>", 403)
+        token = secrets.token_hex(8)
+        with self.lock:
+            self._pending_logins.add(token)
+            self.current_otp = f"{secrets.randbelow(10 ** 6):06d}"
+        inputs = "".join(f"<input type='text' name='otp{index}' maxlength='1'>" for index in range(1, 7))
+        return Response.html(
+            f"<html><body><form method='post' action='{self.OTP_PATH}'>{inputs}"
+            "<button type='submit'>ورود</button></form></body></html>",
+            **{"Set-Cookie": f"login_pending={token}; Path=/"},
+        )
+
+    def _otp(self, request: Request) -> Response:
+        token = request.cookies.get("login_pending")
+        code = "".join(request.form.get(f"otp{index}", "") for index in range(1, 7))
+        with self.lock:
+            if token not in self._pending_logins or code != self.current_otp:
+                return Response.html("<html><body>invalid code</body></html>", 403)
+            self._pending_logins.discard(token)
+            self.current_otp = None
+            session = secrets.token_hex(16)
+            self._sessions.add(session)
+            self.logins_total += 1
+        expires = formatdate(time.time() + self.session_ttl_seconds, usegmt=True)
+        return Response.redirect(self.ADD_PATH, **{"Set-Cookie": f"sessionid={session}; Path=/; Expires={expires}"})
+
+    def _add(self, request: Request) -> Response:
+        if request.method == "POST":
+            title = request.form.get("title", "")
+            if not title:
+                return self._add_form()
+            with self.lock:
+                story_id = len(self.stories) + 1
+                self.stories[story_id] = {
+                    "id": story_id,
+                    "title": title,
+                    "body_bytes": len(request.form.get("body", "")),
+                    "created_at": time.time(),
+                    "published_at": None,
+                }
+            return Response.redirect(f"{self.EDIT_PREFIX}{story_id}/edit/")
+        return self._add_form()
+
+    def _add_form(self) -> Response:
+        def select(name: str, labels: tuple[str, ...]) -> str:
+            options = "".join(f"<option value='{index}'>{label}</option>" for index, label in enumerate(labels, start=1))
+            return f"<select name='{name}'>{options}</select>"
+
+        return Response.html(
+            "<html><body><form method='post' enctype='multipart/form-data'>"
+            "<input type='hidden' name='csrfmiddlewaretoken' value='bench'>"
+            "<input type='text' name='title'><textarea name='lead'></textarea><input type='text' name='tags'>"
+            "<textarea name='body'></textarea><iframe srcdoc='<body></body>'></iframe><button type='button'>justify</button>"
+            + select("category", ("سیاسی", "اقتصادی", "اجتماعی"))
+            + select("position_front", ("عادی", "ویژه"))
+            + select("position_category", ("سطح یک", "سطح دو"))
+            + "<input type='file' name='image'><button type='submit'>ذخیره</button></form></body></html>"
+        )
+
+    def _edit(self, request: Request, story_id: int) -> Response:
+        with self.lock:
+            story = self.stories.get(story_id)
+            if story is None:
+                return Response(404, b"not found")
+            if request.method == "POST" and request.form.get("is_published"):
+                story["published_at"] = story["published_at"] or time.time()
+        if request.method == "POST":
+            return Response.redirect(f"{self.EDIT_PREFIX}{story_id}/edit/")
+        checkboxes = "".join(f"<input type='checkbox' name='{name}' value='on'>" for name in ("breaking", "headline", "telegram", "is_published"))
+        return Response.html(
+            "<html><body><form method='post'>"
+            f"<input type='hidden' name='csrfmiddlewaretoken' value='bench'><input type='text' name='title' value='{escape(str(story['title']))}'>"
+            f"{checkboxes}<input type='text' name='publish_datetime'><button type='submit'>ذخیره</button></form></body></html>"
+        )
+
+
+class TelegramStandIn(StandInServer):
+    BOT_USER = {"id": 100, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+    EDITOR = {"id": 200, "is_bot": False, "first_name": "editor"}
+
+    def __init__(
+        self,
+        chat_id: int,
+        approve_action: str | None = "publish",
+        approve_delay_seconds: float = 0.5,
+        otp_source: CMSStandIn | None = None,
+    ) -> None:
+        super().__init__()
+        self.chat_id = chat_id
+        self.approve_action = approve_action
+        self.approve_delay_seconds = approve_delay_seconds
+        self.otp_source = otp_source
+        self.sent: list[dict[str, object]] = []
+        self.approved: set[str] = set()
+        self._updates: list[tuple[float, dict[str, object]]] = []
+        self._update_id = 0
+        self._message_id = 0
+        self._available = threading.Condition(self.lock)
+
+    def _message(self, text: str, reply_markup: object = None) -> dict[str, object]:
+        self._message_id += 1
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": self.chat_id, "type": "private"},
+            "from": self.BOT_USER,
+            "text": text,
+        }
+        if reply_markup:
+            message["reply_markup"] = reply_markup
+        return message
+
+    def _push(self, update: dict[str, object], delay: float = 0.0) -> None:
+        self._update_id += 1
+        update["update_id"] = self._update_id
+        self._updates.append((time.time() + delay, update))
+        self._available.notify_all()
+
+    def route(self, request: Request) -> Response:
+        method = request.path.rsplit("/", 1)[-1]
+        params = {**request.query, **request.form}
+        if method == "getMe":
+            return Response.json({"ok": True, "result": self.BOT_USER})
+        if method == "getUpdates":
+            return Response.json({"ok": True, "result": self._get_updates(params)})
+        with self.lock:
+            if method == "sendMessage":
+                return Response.json({"ok": True, "result": self._send_message(params)})
+            if method in {"editMessageText", "editMessageReplyMarkup"}:
+                return Response.json({"ok": True, "result": self._message(params.get("text", ""))})
+        return Response.json({"ok": True, "result": True})
+
+    def _get_updates(self, params: dict[str, str]) -> list[dict[str, object]]:
+        offset = int(params.get("offset") or 0)
+        deadline = time.time() + min(float(params.get("timeout") or 0), 1.0)
+        with self._available:
+            self._updates = [(due, update) for due, update in self._updates if update["update_id"] >= offset]
+            while True:
+                now = time.time()
+                ready = [update for due, update in self._updates if due <= now]
+                if ready or now >= deadline:
+                    return ready
+                self._available.wait(timeout=max(min(deadline - now, 0.1), 0.01))
+
+    def _send_message(self, params: dict[str, str]) -> dict[str, object]:
+        text = params.get("text", "")
+        markup = json.loads(params["reply_markup"]) if params.get("reply_markup") else None
+        message = self._message(text, markup)
+        self.sent.append({"ts": time.time(), "text": text, "buttons": markup})
+        if self.otp_source and "OTP" in text and self.otp_source.current_otp:
+            self._push({"message": {**message, "from": self.EDITOR, "text": self.otp_source.current_otp}}, delay=0.2)
+        if self.approve_action and markup:
+            prefix = f"{self.approve_action}:"
+            for row in markup.get("inline_keyboard", []):
+                for button in row:
+                    data = button.get("callback_data") or ""
+                    if data.startswith(prefix) and data not in self.approved:
+                        self.approved.add(data)
+                        self._push(
+                            {
+                                "callback_query": {
+                                    "id": str(self._update_id + 1),
+                                    "from": self.EDITOR,
+                                    "chat_instance": "bench",
+                                    "data": data,
+                                    "message": message,
+                                }
+                            },
+                            delay=self.approve_delay_seconds,
+                        )
+        return message
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def _children(pid: int) -> list[int]:
+    found = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            found.append(int(entry.name))
+    return found
+
+
+def tree_rss_mb(pid: int) -> float:
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            for line in Path(f"/proc/{current}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+        except OSError:
+            continue
+        pending.extend(_children(current))
+    return total / 1024
+
+
+async def measure(base_dir: Path, idle_seconds: float) -> dict[str, object]:
+    started = time.perf_counter()
+    from news_bot.config import Settings
+    from news_bot.main import App
+
+    imported = time.perf_counter()
+    settings = Settings(base_dir=base_dir)
+    settings.telegram_token = ""
+    settings.metrics_port = 0
+    app = App(settings=settings)
+    await app.initialize()
+    initialized = time.perf_counter()
+    await asyncio.sleep(idle_seconds)
+    report = {
+        "import_seconds": imported - started,
+        "initialize_seconds": initialized - imported,
+        "idle_rss_mb": tree_rss_mb(os.getpid()),
+        "browser_running": app.browser_host.running,
+        "heavy_modules": sorted(name for name in ("playwright", "telegram", "bs4", "feedparser") if name in sys.modules),
+    }
+    await app.shutdown()
+    return report
+
+
+def run_child(idle_seconds: float) -> dict[str, object]:
+    with tempfile.TemporaryDirectory(prefix="news-bot-startup-") as tmp:
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-m", "news_bot.benchmarks.startup", "--child", tmp, "--idle", str(idle_seconds)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        report["process_seconds"] = time.perf_counter() - started - idle_seconds
+        return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Cold start time and idle memory of the bot process")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds to sit idle before sampling RSS")
+    parser.add_argument("--output", type=Path, help="write the JSON report here")
+    parser.add_argument("--child", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(asyncio.run(measure(args.child, args.idle))))
+        return 0
+    runs = [run_child(args.idle) for _ in range(args.runs)]
+    report = {
+        "runs": runs,
+        "median": {
+            key: statistics.median(run[key] for run in runs)
+            for key in ("import_seconds", "initialize_seconds", "process_seconds", "idle_rss_mb")
+        },
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
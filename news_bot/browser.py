@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
+
+from news_bot.config import Settings
+
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Page
+
+logger = logging.getLogger(__name__)
+
+
+TeardownFn = Callable[[], Awaitable[None]]
+
+
+class BrowserHost:
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.idle_seconds = settings.browser_idle_seconds
+        self.launches_total = 0
+        self.idle_closes_total = 0
+        self._playwright = None
+        self._browser: Browser | None = None
+        self._lock = asyncio.Lock()
+        self._leases = 0
+        self._last_used = time.monotonic()
+        self._teardown: list[TeardownFn] = []
+        self._reaper: asyncio.Task[None] | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._browser is not None
+
+    def on_teardown(self, callback: TeardownFn) -> Callable[[], None]:
+        self._teardown.append(callback)
+
+        def unregister() -> None:
+            if callback in self._teardown:
+                self._teardown.remove(callback)
+
+        return unregister
+
+    async def get_browser(self) -> Browser:
+        async with self._lock:
+            if self._browser is None:
+                from playwright.async_api import async_playwright
+
+                started = time.perf_counter()
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=self.settings.headless)
+                self.launches_total += 1
+                self._last_used = time.monotonic()
+                logger.info("browser launched in %.2fs", time.perf_counter() - started)
+                if self.idle_seconds and (self._reaper is None or self._reaper.done()):
+                    self._reaper = asyncio.create_task(self._reap())
+            return self._browser
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[Browser]:
+        self._leases += 1
+        try:
+            yield await self.get_browser()
+        finally:
+            self._leases -= 1
+            self._last_used = time.monotonic()
+
+    async def _reap(self) -> None:
+        while self._browser is not None:
+            await asyncio.sleep(max(self.idle_seconds / 4, 1))
+            if self._leases == 0 and time.monotonic() - self._last_used >= self.idle_seconds:
+                if await self._close(idle=True):
+                    self.idle_closes_total += 1
+                    logger.info("browser closed after %ss idle", self.idle_seconds)
+
+    async def _close(self, idle: bool = False) -> bool:
+        async with self._lock:
+            if self._browser is None or (idle and self._leases):
+                return False
+            for callback in list(self._teardown):
+                try:
+                    await callback()
+                except Exception:
+                    logger.exception("browser teardown callback failed")
+            try:
+                await self._browser.close()
+                if self._playwright:
+                    await self._playwright.stop()
+            finally:
+                self._browser = None
+                self._playwright = None
+            return True
+
+    async def stop(self) -> None:
+        if self._reaper and self._reaper is not asyncio.current_task():
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        await self._close()
+
+
+class ManagedContext:
+    def __init__(
+        self,
+        host: BrowserHost,
+        max_pages: int = 0,
+        storage_state: Callable[[], dict[str, Any] | None] | None = None,
+        before_retire: Callable[[BrowserContext], Awaitable[None]] | None = None,
+    ) -> None:
+        self.host = host
+        self.max_pages = max_pages
+        self.storage_state = storage_state
+        self.before_retire = before_retire
+        self.context: BrowserContext | None = None
+        self.recycled_total = 0
+        self._pages_opened = 0
+        self._open: dict[BrowserContext, int] = {}
+        self._closing: set[asyncio.Task[None]] = set()
+        self._lock = asyncio.Lock()
+        self._unregister: Callable[[], None] | None = None
+
+    async def get(self) -> BrowserContext:
+        async with self._lock:
+            if self._unregister is None:
+                self._unregister = self.host.on_teardown(self._forget)
+            if self.context is not None and self.max_pages and self._pages_opened >= self.max_pages:
+                await self._retire()
+            if self.context is None:
+                browser = await self.host.get_browser()
+                self.context = await browser.new_context(storage_state=self.storage_state() if self.storage_state else None)
+                self._open[self.context] = 0
+                self._pages_opened = 0
+            return self.context
+
+    async def new_page(self) -> Page:
+        context = await self.get()
+        page = await context.new_page()
+        self._pages_opened += 1
+        self._open[context] = self._open.get(context, 0) + 1
+        page.once("close", lambda _: self._page_closed(context))
+        return page
+
+    def owns(self, page: Page) -> bool:
+        return self.context is not None and page.context is self.context
+
+    def _page_closed(self, context: BrowserContext) -> None:
+        remaining = self._open.get(context)
+        if remaining is None:
+            return
+        self._open[context] = remaining - 1
+        if context is not self.context and remaining <= 1:
+            del self._open[context]
+            task = asyncio.create_task(context.close())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _retire(self) -> None:
+        context, self.context = self.context, None
+        self.recycled_total += 1
+        logger.info("recycling browser context after %s pages", self._pages_opened)
+        if self.before_retire:
+            try:
+                await self.before_retire(context)
+            except Exception:
+                logger.exception("failed to save browser context state before recycling")
+        if not self._open.get(context):
+            self._open.pop(context, None)
+            await context.close()
+
+    async def _forget(self) -> None:
+        self.context = None
+        self._open.clear()
+        self._pages_opened = 0
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._unregister:
+                self._unregister()
+                self._unregister = None
+            contexts = list(self._open)
+            await self._forget()
+        for context in contexts:
+            try:
+                await context.close()
+            except Exception:
+                logger.debug("browser context already closed", exc_info=True)
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+from urllib.parse import urlparse
+
+from news_bot.config import Settings
+from news_bot.metrics import CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def host_of(url: str) -> str:
+    return (urlparse(url).hostname or url).lower()
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, host: str, retry_at: float) -> None:
+        super().__init__(f"circuit open for {host}, retry in {max(retry_at - time.time(), 0):.0f}s")
+        self.host = host
+        self.retry_at = retry_at
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        host: str,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        open_seconds: float = 60,
+        max_open_seconds: float = 900,
+        on_change: Callable[[CircuitBreaker], None] | None = None,
+    ) -> None:
+        self.host = host
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.on_change = on_change
+        self.state = CLOSED
+        self.retry_at = 0.0
+        self.trips_total = 0
+        self.rejected_total = 0
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._cooldown = open_seconds
+        self._probe_started: float | None = None
+
+    def failure_ratio(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def available(self, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        if self.state == OPEN:
+            return now >= self.retry_at
+        if self.state == HALF_OPEN:
+            return self._probe_started is None or now - self._probe_started >= self.max_open_seconds
+        return True
+
+    def allow(self, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        if not self.available(now):
+            self.rejected_total += 1
+            return False
+        if self.state == OPEN:
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            self._probe_started = now
+        return True
+
+    def release(self) -> None:
+        self._probe_started = None
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            self._probe_started = None
+            self._cooldown = self.open_seconds
+            self._outcomes.clear()
+            self._transition(CLOSED)
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        if self.state == HALF_OPEN:
+            self._probe_started = None
+            self._cooldown = min(self._cooldown * 2, self.max_open_seconds)
+            self._open(now)
+            return
+        if self.state == OPEN:
+            return
+        self._outcomes.append(False)
+        if len(self._outcomes) >= self.min_calls and self.failure_ratio() >= self.failure_rate:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.retry_at = now + self._cooldown
+        self.trips_total += 1
+        self._transition(OPEN)
+        logger.warning("circuit open host=%s failure_rate=%.0f%% retry_in=%.0fs", self.host, self.failure_ratio() * 100, self._cooldown)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        if state == CLOSED:
+            logger.info("circuit closed host=%s", self.host)
+        CIRCUIT_STATE.labels(self.host).set(STATE_VALUES[state])
+        if self.on_change:
+            self.on_change(self)
+
+    def describe(self) -> dict[str, Any]:
+        return {
+            "host": self.host,
+            "state": self.state,
+            "failure_rate": self.failure_ratio(),
+            "calls": len(self._outcomes),
+            "retry_at": self.retry_at if self.state != CLOSED else None,
+            "trips_total": self.trips_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class BreakerRegistry:
+    def __init__(self, settings: Settings, on_change: Callable[[list[dict[str, Any]]], None] | None = None) -> None:
+        self.settings = settings
+        self.on_change = on_change
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._remote: dict[str, list[dict[str, Any]]] = {}
+
+    def get(self, url: str) -> CircuitBreaker:
+        host = host_of(url)
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                host,
+                window=self.settings.breaker_window,
+                min_calls=self.settings.breaker_min_calls,
+                failure_rate=self.settings.breaker_failure_rate,
+                open_seconds=self.settings.breaker_open_seconds,
+                max_open_seconds=self.settings.breaker_max_open_seconds,
+                on_change=self._changed,
+            )
+        return breaker
+
+    def available(self, url: str) -> bool:
+        return self.get(url).available()
+
+    def allow(self, url: str) -> bool:
+        return self.get(url).allow()
+
+    def success(self, url: str) -> None:
+        self.get(url).record_success()
+
+    def failure(self, url: str) -> None:
+        self.get(url).record_failure()
+
+    @contextmanager
+    def guard(self, url: str) -> Iterator[CircuitBreaker]:
+        breaker = self.get(url)
+        if not breaker.allow():
+            raise CircuitOpenError(breaker.host, breaker.retry_at)
+        try:
+            yield breaker
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+
+    def _changed(self, _: CircuitBreaker) -> None:
+        if self.on_change:
+            self.on_change(self.snapshot())
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        return [breaker.describe() for breaker in self._breakers.values()]
+
+    def update_remote(self, origin: str, rows: list[dict[str, Any]]) -> None:
+        self._remote[origin] = rows
+
+    def describe(self) -> list[dict[str, Any]]:
+        rows = [dict(row, origin="main") for row in self.snapshot()]
+        for origin, remote in self._remote.items():
+            rows.extend(dict(row, origin=origin) for row in remote)
+        return rows
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import aiofiles
-from bs4 import BeautifulSoup, Tag
+
+if TYPE_CHECKING:
+    from bs4 import Tag
 
 
 class ContentCleaner:
@@ -29,6 +32,8 @@ class ContentCleaner:
             await f.write(phrase + "\n")
 
     def clean(self, html: str) -> str:
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html, "html.parser")
         body = soup.select_one('div.item-text[itemprop="articleBody"]') or soup
 
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from news_bot.browser import BrowserHost
+from news_bot.circuit_breaker import CircuitOpenError
+from news_bot.cms.http_transport import CMSHttpTransport
+from news_bot.cms.page_pool import PagePool
+from news_bot.cms.publisher import CMSPublisher
+from news_bot.cms.session_manager import CMSSessionManager, PromptFn
+from news_bot.cms.uploader import CMSUploader
+from news_bot.config import Settings, SiteProfile
+from news_bot.database import Database
+from news_bot.state_manager import StateManager
+
+logger = logging.getLogger(__name__)
+
+
+class AccountUnavailable(CircuitOpenError):
+    def __init__(self, pool: str, retry_at: float) -> None:
+        RuntimeError.__init__(self, f"no logged-in CMS account free for profile {pool}, retry in {max(retry_at - time.time(), 0):.0f}s")
+        self.host = pool
+        self.retry_at = retry_at
+
+
+@dataclass(slots=True)
+class CMSAccount:
+    username: str
+    password: str
+    session: CMSSessionManager
+    http: CMSHttpTransport | None
+    page_pool: PagePool
+    uploader: CMSUploader
+    publisher: CMSPublisher
+    in_flight: int = 0
+    warmed: bool = False
+
+
+class CMSAccountPool:
+    def __init__(
+        self,
+        settings: Settings,
+        state_manager: StateManager,
+        db: Database,
+        refresh_seconds: float = 30,
+        monitor_sessions: bool = True,
+        browser_host: BrowserHost | None = None,
+        profile: SiteProfile | None = None,
+        login_lock: asyncio.Lock | None = None,
+    ) -> None:
+        self.settings = settings
+        self.state_manager = state_manager
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.monitor_sessions = monitor_sessions
+        self.browser_host = browser_host or BrowserHost(settings)
+        self._owns_browser = browser_host is None
+        self.profile = profile
+        self._login_lock = login_lock or asyncio.Lock()
+        self.default_session = CMSSessionManager(
+            settings,
+            state_manager,
+            browser_host=self.browser_host,
+            login_lock=self._login_lock,
+        )
+        self.accounts: dict[str, CMSAccount] = {}
+        self.on_otp_prompt: PromptFn | None = None
+        self._available = asyncio.Condition()
+        self._refreshed_at = 0.0
+
+    def invalidate(self) -> None:
+        self._refreshed_at = 0.0
+
+    def _build(self, username: str, password: str, session: CMSSessionManager) -> CMSAccount:
+        session.on_otp_prompt = self.on_otp_prompt
+        session.credentials = (username, password)
+        http = CMSHttpTransport(self.settings, session.cookies_path) if self.settings.cms_http_transport else None
+        page_pool = PagePool(session, self.settings.cms_add_url, self.settings.cms_page_pool_size)
+        return CMSAccount(
+            username=username,
+            password=password,
+            session=session,
+            http=http,
+            page_pool=page_pool,
+            uploader=CMSUploader(self.settings, session, http, page_pool),
+            publisher=CMSPublisher(session, http, page_pool),
+        )
+
+    async def _desired_users(self) -> dict[str, str]:
+        if self.settings.cms_multi_account and not self.profile:
+            rows = await self.db.fetchall("SELECT username, password FROM cms_users ORDER BY created_at")
+        else:
+            username = (self.profile and self.profile.cms_user) or self.state_manager.snapshot().get("selected_user")
+            if not username:
+                return {}
+            rows = await self.db.fetchall("SELECT username, password FROM cms_users WHERE username = ?", (username,))
+        return {row["username"]: row["password"] for row in rows}
+
+    async def refresh(self) -> None:
+        self._refreshed_at = time.monotonic()
+        desired = await self._desired_users()
+        for username in list(self.accounts):
+            account = self.accounts[username]
+            if username not in desired and account.in_flight == 0:
+                del self.accounts[username]
+                await self._close_account(account)
+                logger.info("CMS account removed user=%s", username)
+        for username, password in desired.items():
+            account = self.accounts.get(username)
+            if account:
+                account.password = password
+                account.session.credentials = (username, password)
+                continue
+            if self.profile or self.settings.cms_multi_account:
+                session = CMSSessionManager(
+                    self.settings,
+                    self.state_manager,
+                    username=StateManager.profile_session_key(self.profile.name, username) if self.profile else username,
+                    browser_host=self.browser_host,
+                    login_lock=self._login_lock,
+                )
+            else:
+                session = self.default_session
+            self.accounts[username] = self._build(username, password, session)
+            if self.monitor_sessions:
+                try:
+                    await session.validate()
+                except Exception:
+                    logger.exception("initial CMS session probe failed user=%s", username)
+                session.start_monitor()
+            logger.info("CMS account ready user=%s profile=%s", username, self.profile.name if self.profile else "-")
+
+    async def refresh_if_stale(self) -> None:
+        if time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            await self.refresh()
+
+    def is_authenticated(self, account: CMSAccount) -> bool:
+        return not self.state_manager.needs_login(account.session.username)
+
+    def unauthenticated(self) -> list[CMSAccount]:
+        return [account for account in self.accounts.values() if not self.is_authenticated(account)]
+
+    def start_logins(self) -> None:
+        for account in self.unauthenticated():
+            if account.session.start_login(account.username, account.password):
+                logger.info("CMS login started in background user=%s", account.username)
+
+    def _pick(self, urgent: bool = False) -> CMSAccount | None:
+        limit = self.settings.cms_account_concurrency + (self.settings.cms_account_fast_lane_slots if urgent else 0)
+        candidates = [
+            account
+            for account in self.accounts.values()
+            if account.in_flight < limit and self.is_authenticated(account)
+        ]
+        return min(candidates, key=lambda account: account.in_flight, default=None)
+
+    def has_capacity(self, urgent: bool = False) -> bool:
+        return self._pick(urgent) is not None
+
+    @asynccontextmanager
+    async def acquire(self, urgent: bool = False) -> AsyncIterator[CMSAccount]:
+        wait = self.settings.cms_account_wait_seconds
+        deadline = time.monotonic() + wait
+        async with self._available:
+            account = self._pick(urgent)
+            while account is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AccountUnavailable(self.profile.name if self.profile else "default", time.time() + wait)
+                try:
+                    await asyncio.wait_for(self._available.wait(), timeout=min(remaining, 1))
+                except asyncio.TimeoutError:
+                    pass
+                account = self._pick(urgent)
+            account.in_flight += 1
+        try:
+            await account.session.refresh_cookies()
+            if not account.http and not account.warmed:
+                account.warmed = True
+                await account.page_pool.prewarm()
+            yield account
+        finally:
+            async with self._available:
+                account.in_flight -= 1
+                self._available.notify_all()
+
+    def describe(self) -> list[dict[str, object]]:
+        return [
+            {
+                "username": account.username,
+                "profile": self.profile.name if self.profile else None,
+                "authenticated": self.is_authenticated(account),
+                "in_flight": account.in_flight,
+                "logging_in": account.session.login_in_progress(),
+                "valid_until": self.state_manager.session_valid_until(account.session.username),
+                "last_probe_ok": account.session.last_probe_ok,
+            }
+            for account in self.accounts.values()
+        ]
+
+    async def _close_account(self, account: CMSAccount) -> None:
+        if account.http:
+            await account.http.close()
+        await account.page_pool.close()
+        await account.session.stop()
+
+    async def stop(self) -> None:
+        for account in list(self.accounts.values()):
+            await self._close_account(account)
+        self.accounts.clear()
+        await self.default_session.stop()
+        if self._owns_browser:
+            await self.browser_host.stop()
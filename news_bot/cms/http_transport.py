@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import logging
+import mimetypes
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urljoin
+
+import httpx
+
+from news_bot.cms.session_manager import read_storage_state
+from news_bot.config import Settings
+from news_bot.utils.jalali_time import jalali_timestamp, now_tehran
+
+logger = logging.getLogger(__name__)
+
+
+PUBLISH_FLAGS = ("breaking", "headline", "telegram", "is_published")
+
+
+class CMSTransportMismatch(RuntimeError):
+    pass
+
+
+class CMSSubmitUncertain(RuntimeError):
+    pass
+
+
+@dataclass(slots=True)
+class ParsedForm:
+    url: str
+    action: str
+    fields: dict[str, str] = field(default_factory=dict)
+    options: dict[str, dict[str, str]] = field(default_factory=dict)
+    checkboxes: dict[str, str] = field(default_factory=dict)
+    file_fields: list[str] = field(default_factory=list)
+
+    def option_value(self, select_name: str, label: str) -> str:
+        options = self.options.get(select_name)
+        if options is None:
+            raise CMSTransportMismatch(f"select not found: {select_name}")
+        if label not in options:
+            raise CMSTransportMismatch(f"option {label!r} not found in select {select_name}")
+        return options[label]
+
+
+def parse_form(html: str, url: str, marker: str) -> ParsedForm:
+    from bs4 import BeautifulSoup, Tag
+
+    soup = BeautifulSoup(html, "html.parser")
+    form = next((f for f in soup.find_all("form") if f.find(attrs={"name": marker})), None)
+    if not isinstance(form, Tag):
+        raise CMSTransportMismatch(f"form with field {marker!r} not found at {url}")
+    parsed = ParsedForm(url=url, action=urljoin(url, form.get("action") or url))
+    for element in form.find_all(["input", "textarea", "select"]):
+        name = element.get("name")
+        if not name:
+            continue
+        if element.name == "textarea":
+            parsed.fields[name] = element.get_text()
+            continue
+        if element.name == "select":
+            options = {opt.get_text(strip=True): opt.get("value", opt.get_text(strip=True)) for opt in element.find_all("option")}
+            parsed.options[name] = options
+            selected = element.find("option", selected=True) or element.find("option")
+            parsed.fields[name] = selected.get("value", selected.get_text(strip=True)) if selected else ""
+            continue
+        input_type = (element.get("type") or "text").lower()
+        if input_type == "file":
+            parsed.file_fields.append(name)
+        elif input_type in {"checkbox", "radio"}:
+            parsed.checkboxes[name] = element.get("value", "on")
+            if element.has_attr("checked"):
+                parsed.fields[name] = parsed.checkboxes[name]
+        elif input_type not in {"submit", "button", "image", "reset"}:
+            parsed.fields[name] = element.get("value", "")
+    return parsed
+
+
+class CMSHttpTransport:
+    def __init__(self, settings: Settings, cookies_path: Path | None = None) -> None:
+        self.settings = settings
+        self.cookies_path = cookies_path or settings.cookies_path
+        self._client: httpx.AsyncClient | None = None
+        self._cookies_mtime: float | None = None
+        self._add_form: ParsedForm | None = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+            )
+        self._sync_cookies(self._client)
+        return self._client
+
+    def _sync_cookies(self, client: httpx.AsyncClient) -> None:
+        path = Path(self.cookies_path)
+        if not path.exists():
+            raise CMSTransportMismatch("no saved CMS cookies")
+        mtime = path.stat().st_mtime
+        if mtime == self._cookies_mtime:
+            return
+        client.cookies.clear()
+        storage_state = read_storage_state(path) or {}
+        for cookie in storage_state.get("cookies", []):
+            client.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+        self._cookies_mtime = mtime
+        self._add_form = None
+
+    async def close(self) -> None:
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def invalidate(self) -> None:
+        self._add_form = None
+
+    async def _fetch_form(self, url: str, marker: str) -> ParsedForm:
+        client = await self._get_client()
+        response = await client.get(url)
+        self._check_response(response, url)
+        return parse_form(response.text, str(response.url), marker)
+
+    def _check_response(self, response: httpx.Response, expected_url: str) -> None:
+        if response.status_code >= 400:
+            raise CMSTransportMismatch(f"HTTP {response.status_code} from {response.url}")
+        final_url = str(response.url)
+        if final_url.startswith(self.settings.cms_login_url):
+            raise CMSTransportMismatch(f"redirected to login page from {expected_url}")
+
+    async def _post(self, form: ParsedForm, data: dict[str, str], files: dict[str, tuple[str, bytes, str]] | None = None) -> httpx.Response:
+        client = await self._get_client()
+        try:
+            response = await client.post(form.action, data=data, files=files or None, headers={"Referer": form.url})
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            raise
+        except httpx.HTTPError as exc:
+            raise CMSSubmitUncertain(f"POST to {form.action} failed after sending: {exc}") from exc
+        try:
+            self._check_response(response, form.action)
+        except CMSTransportMismatch as exc:
+            raise CMSSubmitUncertain(str(exc)) from exc
+        return response
+
+    async def _load_image(self, image_path: str) -> tuple[str, bytes, str]:
+        if image_path.startswith(("http://", "https://")):
+            client = await self._get_client()
+            response = await client.get(image_path)
+            if response.status_code >= 400:
+                raise CMSTransportMismatch(f"image download failed HTTP {response.status_code}")
+            name = Path(response.url.path).name or "image.jpg"
+            content_type = response.headers.get("content-type", "").split(";")[0] or mimetypes.guess_type(name)[0]
+            return name, response.content, content_type or "application/octet-stream"
+        path = Path(image_path)
+        if not path.is_file():
+            raise CMSTransportMismatch(f"image not found: {image_path}")
+        return path.name, path.read_bytes(), mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    async def upload_news(self, payload: dict[str, str | None]) -> str:
+        if self._add_form is None:
+            self._add_form = await self._fetch_form(self.settings.cms_add_url, "title")
+        form = self._add_form
+        body_field = self.settings.cms_body_field
+        for required in ("title", "lead", "tags", body_field):
+            if required not in form.fields:
+                raise CMSTransportMismatch(f"add form has no field {required!r}")
+        data = dict(form.fields)
+        data.update({
+            "title": payload.get("title") or "",
+            "lead": payload.get("lead") or "",
+            "tags": "ایران",
+            body_field: payload.get("content_html") or "",
+            "category": form.option_value("category", payload.get("category") or "سیاسی"),
+            "position_front": form.option_value("position_front", "ویژه"),
+            "position_category": form.option_value("position_category", "سطح یک"),
+        })
+        files = None
+        image_path = payload.get("image_path")
+        if image_path:
+            if not form.file_fields:
+                raise CMSTransportMismatch("add form has no file input")
+            files = {form.file_fields[0]: await self._load_image(image_path)}
+        response = await self._post(form, data, files)
+        edit_url = str(response.url)
+        if edit_url.rstrip("/") == self.settings.cms_add_url.rstrip("/"):
+            self.invalidate()
+            raise CMSSubmitUncertain("CMS returned the add form again; submission rejected")
+        return edit_url
+
+    async def publish(self, edit_url: str) -> None:
+        form = await self._fetch_form(edit_url, "is_published")
+        for flag in PUBLISH_FLAGS:
+            if flag not in form.checkboxes:
+                raise CMSTransportMismatch(f"edit form has no checkbox {flag!r}")
+        if "publish_datetime" not in form.fields:
+            raise CMSTransportMismatch("edit form has no publish_datetime field")
+        data = dict(form.fields)
+        for flag in PUBLISH_FLAGS:
+            data[flag] = form.checkboxes[flag]
+        data["publish_datetime"] = jalali_timestamp(now_tehran())
+        await self._post(form, data)
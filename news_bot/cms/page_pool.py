@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin
+
+from news_bot.cms.session_manager import CMSSessionManager
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+
+async def click_and_wait_for_save(page: Page, selector: str, timeout_ms: int) -> str:
+    async with page.expect_response(
+        lambda response: response.request.method == "POST" and response.request.is_navigation_request(),
+        timeout=timeout_ms,
+    ) as response_info:
+        await page.click(selector)
+    response = await response_info.value
+    if response.status >= 400:
+        raise RuntimeError(f"CMS save failed with HTTP {response.status}")
+    location = response.headers.get("location")
+    if location:
+        return urljoin(response.url, location)
+    await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+    return page.url
+
+
+class PagePool:
+    def __init__(self, session_manager: CMSSessionManager, warm_url: str, size: int = 2) -> None:
+        self.session_manager = session_manager
+        self.warm_url = warm_url
+        self.size = max(size, 1)
+        self._idle: asyncio.Queue[Page] = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.size)
+        self._warming: set[asyncio.Task[None]] = set()
+        self._unregister = session_manager.browser_host.on_teardown(self._drain)
+
+    async def _warm(self, page: Page) -> None:
+        await page.goto(self.warm_url, wait_until="domcontentloaded")
+
+    def is_warm(self, page: Page) -> bool:
+        return page.url.startswith(self.warm_url)
+
+    async def _take(self) -> Page:
+        while not self._idle.empty():
+            page = self._idle.get_nowait()
+            if page.is_closed():
+                continue
+            if self.session_manager.owns(page):
+                return page
+            await page.close()
+        return await self.session_manager.get_page()
+
+    async def prewarm(self) -> None:
+        async with self.session_manager.browser_host.lease():
+            missing = self.size - self._idle.qsize()
+            for _ in range(max(missing, 0)):
+                page = await self.session_manager.get_page()
+                try:
+                    await self._warm(page)
+                except Exception:
+                    logger.exception("failed to prewarm CMS page")
+                    await page.close()
+                    return
+                self._idle.put_nowait(page)
+
+    @asynccontextmanager
+    async def acquire(self, warm: bool = True) -> AsyncIterator[Page]:
+        async with self._slots, self.session_manager.browser_host.lease():
+            page = await self._take()
+            if warm and not self.is_warm(page):
+                await self._warm(page)
+            reusable = False
+            try:
+                yield page
+                reusable = True
+            finally:
+                self._release(page, reusable)
+
+    def _release(self, page: Page, reusable: bool) -> None:
+        if page.is_closed():
+            return
+        if not reusable or self._idle.qsize() >= self.size:
+            task = asyncio.create_task(page.close())
+        else:
+            task = asyncio.create_task(self._rewarm(page))
+        self._warming.add(task)
+        task.add_done_callback(self._warming.discard)
+
+    async def _rewarm(self, page: Page) -> None:
+        try:
+            await self._warm(page)
+        except Exception:
+            logger.warning("failed to reset pooled CMS page; discarding it")
+            await page.close()
+            return
+        self._idle.put_nowait(page)
+
+    async def close(self) -> None:
+        self._unregister()
+        await self._drain()
+
+    async def _drain(self) -> None:
+        for task in list(self._warming):
+            task.cancel()
+        await asyncio.gather(*self._warming, return_exceptions=True)
+        while not self._idle.empty():
+            page = self._idle.get_nowait()
+            if not page.is_closed():
+                await page.close()
@@ -1,23 +1,113 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+import httpx
+
+from news_bot.cms.http_transport import CMSHttpTransport, CMSTransportMismatch
+from news_bot.cms.page_pool import PagePool, click_and_wait_for_save
 from news_bot.cms.session_manager import CMSSessionManager
 from news_bot.utils.jalali_time import jalali_timestamp, now_tehran
+from news_bot.utils.step_timer import StepTimer
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
 
 
 class CMSPublisher:
-    def __init__(self, session_manager: CMSSessionManager) -> None:
+    def __init__(
+        self,
+        session_manager: CMSSessionManager,
+        http: CMSHttpTransport | None = None,
+        page_pool: PagePool | None = None,
+    ) -> None:
         self.session_manager = session_manager
+        self.http = http
+        settings = session_manager.settings
+        self.page_pool = page_pool or PagePool(session_manager, settings.cms_add_url, settings.cms_page_pool_size)
 
     async def publish(self, edit_url: str) -> None:
-        page = await self.session_manager.get_page()
+        if self.http:
+            try:
+                await self.http.publish(edit_url)
+                return
+            except (CMSTransportMismatch, httpx.HTTPError) as exc:
+                logger.warning("HTTP publish fell back to browser: %s", exc)
+        await self._publish_with_browser(edit_url)
+
+    async def _publish_with_browser(self, edit_url: str) -> None:
+        timer = StepTimer("publish")
+        try:
+            async with self.page_pool.acquire(warm=False) as page:
+                timer.mark("page")
+                await page.goto(edit_url, wait_until="domcontentloaded")
+                timer.mark("navigate")
+                await self._fill_and_save(page, timer)
+        finally:
+            logger.info("cms %s", timer.summary())
+
+    async def _fill_and_save(self, page: Page, timer: StepTimer) -> None:
+        await page.check("input[name='breaking']")
+        await page.check("input[name='headline']")
+        await page.check("input[name='telegram']")
+        await page.check("input[name='is_published']")
+        await page.fill("input[name='publish_datetime']", jalali_timestamp(now_tehran()))
+        timer.mark("fields")
+        await click_and_wait_for_save(page, "button:has-text('ذخیره')", self.session_manager.settings.cms_save_timeout_ms)
+        timer.mark("save")
+
+    async def publish_batch(self, edit_urls: list[str]) -> list[BaseException | None]:
+        results: dict[str, BaseException | None] = {}
+        browser_urls = list(edit_urls)
+        if self.http:
+            outcomes = await asyncio.gather(*(self.http.publish(url) for url in edit_urls), return_exceptions=True)
+            browser_urls = []
+            for url, outcome in zip(edit_urls, outcomes):
+                if isinstance(outcome, (CMSTransportMismatch, httpx.HTTPError)):
+                    logger.warning("HTTP publish fell back to browser: %s", outcome)
+                    browser_urls.append(url)
+                else:
+                    results[url] = outcome
+        if browser_urls:
+            results.update(await self._publish_batch_with_browser(browser_urls))
+        return [results[url] for url in edit_urls]
+
+    async def _publish_batch_with_browser(self, edit_urls: list[str]) -> dict[str, BaseException | None]:
+        async with self.session_manager.browser_host.lease():
+            return await self._publish_pipelined(edit_urls)
+
+    async def _publish_pipelined(self, edit_urls: list[str]) -> dict[str, BaseException | None]:
+        results: dict[str, BaseException | None] = {}
+        pages = [await self.session_manager.get_page(), await self.session_manager.get_page()]
+        timer = StepTimer(f"publish_batch[{len(edit_urls)}]")
+        navigation = asyncio.create_task(pages[0].goto(edit_urls[0], wait_until="domcontentloaded"))
         try:
-            await page.goto(edit_url, wait_until="domcontentloaded")
-            await page.check("input[name='breaking']")
-            await page.check("input[name='headline']")
-            await page.check("input[name='telegram']")
-            await page.check("input[name='is_published']")
-            await page.fill("input[name='publish_datetime']", jalali_timestamp(now_tehran()))
-            await page.click("button:has-text('ذخیره')")
-            await page.wait_for_load_state("networkidle")
+            for index, edit_url in enumerate(edit_urls):
+                page = pages[index % 2]
+                try:
+                    await navigation
+                    timer.mark("navigate")
+                except Exception as exc:
+                    results[edit_url] = exc
+                if index + 1 < len(edit_urls):
+                    upcoming = pages[(index + 1) % 2]
+                    navigation = asyncio.create_task(upcoming.goto(edit_urls[index + 1], wait_until="domcontentloaded"))
+                if edit_url in results:
+                    continue
+                try:
+                    await self._fill_and_save(page, timer)
+                    results[edit_url] = None
+                except Exception as exc:
+                    results[edit_url] = exc
         finally:
-            await page.close()
+            if not navigation.done():
+                navigation.cancel()
+            await asyncio.gather(navigation, return_exceptions=True)
+            for page in pages:
+                await page.close()
+            logger.info("cms %s", timer.summary())
+        return results
@@ -1,42 +1,177 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlparse
 
-from playwright.async_api import BrowserContext, Page, TimeoutError, async_playwright
+import httpx
 
+from news_bot.browser import BrowserHost, ManagedContext
 from news_bot.config import Settings
+from news_bot.metrics import CMS_PAGES
 from news_bot.state_manager import StateManager
+from news_bot.utils.jalali_time import in_tehran_hours
+
+if TYPE_CHECKING:
+    from playwright.async_api import BrowserContext, Page
+
+logger = logging.getLogger(__name__)
+
+
+PromptFn = Callable[[str], Awaitable[None]]
+
+
+def read_storage_state(path: Path) -> dict[str, Any] | None:
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(data, list):
+        return {"cookies": data, "origins": []}
+    return data
 
 
 class CMSSessionManager:
-    def __init__(self, settings: Settings, state_manager: StateManager) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        state_manager: StateManager,
+        username: str | None = None,
+        browser_host: BrowserHost | None = None,
+        login_lock: asyncio.Lock | None = None,
+    ) -> None:
         self.settings = settings
         self.state_manager = state_manager
-        self._playwright = None
-        self._browser = None
-        self._context: BrowserContext | None = None
-
-    async def start(self) -> None:
-        self._playwright = await async_playwright().start()
-        self._browser = await self._playwright.chromium.launch(headless=self.settings.headless)
-        self._context = await self._browser.new_context()
-        if self.settings.cookies_path.exists():
-            cookies = json.loads(self.settings.cookies_path.read_text(encoding="utf-8"))
-            await self._context.add_cookies(cookies)
+        self.username = username
+        self.cookies_path = settings.cookies_path if username is None else settings.account_cookies_path(username)
+        self.browser_host = browser_host or BrowserHost(settings)
+        self._owns_browser = browser_host is None
+        self._login_lock = login_lock or asyncio.Lock()
+        self.contexts = ManagedContext(
+            self.browser_host,
+            settings.browser_context_max_pages,
+            storage_state=lambda: read_storage_state(self.cookies_path),
+            before_retire=self._save_storage_state,
+        )
+        self._cookies_mtime: float | None = None
+        self.on_otp_prompt: PromptFn | None = None
+        self._login_task: asyncio.Task[None] | None = None
+        self._login_failed_at: float | None = None
+        self.credentials: tuple[str, str] | None = None
+        self._monitor_task: asyncio.Task[None] | None = None
+        self.last_probe_at: float | None = None
+        self.last_probe_ok: bool | None = None
+        self._last_login_at: float | None = None
+
+    async def refresh_cookies(self) -> None:
+        context = self.contexts.context
+        if not context or not self.cookies_path.exists():
+            return
+        mtime = self.cookies_path.stat().st_mtime
+        if mtime == self._cookies_mtime:
+            return
+        storage_state = read_storage_state(self.cookies_path) or {}
+        await context.add_cookies(storage_state.get("cookies", []))
+        self._cookies_mtime = mtime
+
+    async def _save_storage_state(self, context: BrowserContext) -> dict[str, Any]:
+        storage_state = await context.storage_state()
+        Path(self.cookies_path).write_text(json.dumps(storage_state, ensure_ascii=False), encoding="utf-8")
+        self._cookies_mtime = self.cookies_path.stat().st_mtime
+        return storage_state
+
+    async def _persist_storage_state(self) -> dict[str, Any]:
+        if not self.contexts.context:
+            return read_storage_state(self.cookies_path) or {"cookies": [], "origins": []}
+        return await self._save_storage_state(self.contexts.context)
+
+    def session_expiry(self, cookies: list[dict[str, Any]]) -> datetime | None:
+        host = urlparse(self.settings.cms_add_url).hostname or ""
+        relevant = [
+            cookie
+            for cookie in cookies
+            if cookie.get("expires", -1) > 0 and host.endswith(str(cookie.get("domain", "")).lstrip("."))
+        ]
+        named = [cookie for cookie in relevant if cookie.get("name") in self.settings.cms_session_cookie_names]
+        candidates = named or relevant
+        if not candidates:
+            return None
+        return datetime.utcfromtimestamp(min(cookie["expires"] for cookie in candidates))
+
+    async def probe(self) -> bool:
+        storage_state = read_storage_state(self.cookies_path)
+        if not storage_state:
+            return False
+        cookies = httpx.Cookies()
+        for cookie in storage_state.get("cookies", []):
+            cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+        async with httpx.AsyncClient(cookies=cookies, timeout=15) as client:
+            response = await client.get(self.settings.cms_add_url)
+        return response.status_code == 200
+
+    async def validate(self) -> bool:
+        ok = await self.probe()
+        self.last_probe_at = time.time()
+        self.last_probe_ok = ok
+        if not ok:
+            await self.state_manager.set_session_valid_until(self.username, None)
+            return False
+        storage_state = await self._persist_storage_state()
+        expires = self.session_expiry(storage_state.get("cookies", []))
+        default_until = datetime.utcnow() + timedelta(hours=self.settings.cms_session_default_ttl_hours)
+        valid_until = expires or default_until
+        await self.state_manager.set_session_valid_until(self.username, valid_until)
+        if self._relogin_due(valid_until):
+            logger.info("CMS session for %s expires at %s; re-authenticating ahead of time", self.username or "default", valid_until)
+            if self.credentials:
+                self.start_login(*self.credentials)
+        return True
+
+    def _relogin_due(self, valid_until: datetime) -> bool:
+        ahead_seconds = self.settings.cms_relogin_ahead_hours * 3600
+        if self._last_login_at and time.time() - self._last_login_at < ahead_seconds:
+            return False
+        if valid_until - datetime.utcnow() > timedelta(hours=self.settings.cms_relogin_ahead_hours):
+            return False
+        return in_tehran_hours(time.time(), self.settings.cms_relogin_hours)
+
+    def start_monitor(self) -> None:
+        if self._monitor_task and not self._monitor_task.done():
+            return
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def _monitor(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.cms_session_probe_seconds)
+            if self.login_in_progress():
+                continue
+            try:
+                await self.validate()
+            except Exception:
+                logger.exception("CMS session probe failed user=%s", self.username or "default")
 
     async def stop(self) -> None:
-        if self._context:
-            await self._context.close()
-        if self._browser:
-            await self._browser.close()
-        if self._playwright:
-            await self._playwright.stop()
+        for task in (self._login_task, self._monitor_task):
+            if task and not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        await self.contexts.close()
+        if self._owns_browser:
+            await self.browser_host.stop()
 
     async def get_page(self) -> Page:
-        if not self._context:
-            raise RuntimeError("CMS session not started")
-        return await self._context.new_page()
+        page = await self.contexts.new_page()
+        CMS_PAGES.inc()
+        page.once("close", lambda _: CMS_PAGES.dec())
+        return page
+
+    def owns(self, page: Page) -> bool:
+        return self.contexts.owns(page)
 
     async def _fill_first(self, page: Page, selectors: list[str], value: str, timeout_ms: int = 15000) -> None:
         last_error: Exception | None = None
@@ -62,74 +197,150 @@ class CMSSessionManager:
                 last_error = exc
         raise RuntimeError(f"Could not find clickable element for selectors={selectors}") from last_error
 
+    async def is_authenticated(self) -> bool:
+        return not self.state_manager.needs_login(self.username)
+
+    def login_in_progress(self) -> bool:
+        return bool(self._login_task and not self._login_task.done())
+
+    def start_login(self, username: str, password: str) -> bool:
+        if self.login_in_progress():
+            return False
+        if self._login_failed_at and time.monotonic() - self._login_failed_at < self.settings.cms_login_cooldown_seconds:
+            return False
+        self._login_task = asyncio.create_task(self._login_with_retries(username, password))
+        return True
+
     async def ensure_login(self, username: str, password: str) -> None:
-        if not await self.state_manager.needs_login():
+        if await self.is_authenticated():
+            return
+        self.start_login(username, password)
+        if self._login_task:
+            await asyncio.shield(self._login_task)
+        if not await self.is_authenticated():
+            raise RuntimeError("CMS login failed")
+
+    async def _prompt(self, text: str) -> None:
+        if not self.on_otp_prompt:
             return
-        page = await self.get_page()
         try:
-            await page.goto(self.settings.cms_login_url, wait_until="domcontentloaded", timeout=60000)
-            await page.wait_for_timeout(1000)
+            await self.on_otp_prompt(text)
+        except Exception:
+            logger.exception("failed to send CMS login prompt")
 
-            await self._fill_first(
-                page,
-                [
-                    "input[name='username']",
-                    "input#username",
-                    "input[type='text']",
-                ],
-                username,
-            )
-            await self._fill_first(
-                page,
-                [
-                    "input[name='password']",
-                    "input#password",
-                    "input[type='password']",
-                ],
-                password,
-            )
-            await self._click_first(
-                page,
-                [
-                    "button:has-text('ارسال')",
-                    "button:has-text('OTP')",
-                    "button[type='submit']",
-                    "input[type='submit']",
-                ],
-            )
+    async def _login_with_retries(self, username: str, password: str) -> None:
+        if await self.is_authenticated() and not self._relogin_due_now():
+            return
+        await self._login_attempts(username, password)
+
+    def _relogin_due_now(self) -> bool:
+        valid_until = self.state_manager.session_valid_until(self.username)
+        return bool(valid_until) and self._relogin_due(datetime.fromisoformat(valid_until))
+
+    async def _login_attempts(self, username: str, password: str) -> None:
+        attempts = self.settings.cms_login_max_attempts
+        for attempt in range(1, attempts + 1):
+            try:
+                await self._login(username, password, attempt)
+                self._login_failed_at = None
+                logger.info("CMS login succeeded user=%s attempt=%s", username, attempt)
+                return
+            except asyncio.TimeoutError:
+                logger.warning("CMS login OTP not received user=%s attempt=%s/%s", username, attempt, attempts)
+            except Exception:
+                logger.exception("CMS login attempt failed user=%s attempt=%s/%s", username, attempt, attempts)
+        self._login_failed_at = time.monotonic()
+        await self._prompt(
+            f"CMS login for {self.username or username} failed after {attempts} attempts. "
+            f"Uploads stay parked; retrying in {self.settings.cms_login_cooldown_seconds // 60} min."
+        )
 
-            otp_future = self.state_manager.prepare_otp_waiter()
-            otp = await otp_future
+    async def _login(self, username: str, password: str, attempt: int) -> None:
+        async with self.browser_host.lease():
+            await self._login_in_browser(username, password, attempt)
+
+    async def _login_in_browser(self, username: str, password: str, attempt: int) -> None:
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        page = await self.get_page()
+        try:
+            async with self._login_lock:
+                await self._request_otp(page, username, password)
+                account = self.username or username
+                otp_future = self.state_manager.prepare_otp_waiter(account)
+                await self._prompt(
+                    f"CMS login for {account}: send the 6-digit OTP, or \"{account} <code>\" while other logins are waiting "
+                    f"(attempt {attempt}/{self.settings.cms_login_max_attempts}, expires in {self.settings.cms_otp_timeout_seconds}s)"
+                )
+            otp = await asyncio.wait_for(otp_future, timeout=self.settings.cms_otp_timeout_seconds)
             digits = [ch for ch in otp if ch.isdigit()][:6]
             if len(digits) != 6:
                 raise ValueError("OTP must be exactly 6 digits")
+            async with self._login_lock:
+                await self._submit_otp(page, digits)
+            storage_state = await self._persist_storage_state()
+            expires = self.session_expiry(storage_state.get("cookies", []))
+            valid_until = expires or datetime.utcnow() + timedelta(hours=self.settings.cms_session_default_ttl_hours)
+            await self.state_manager.set_session_valid_until(self.username, valid_until)
+            await self.state_manager.set_last_login_today(self.username)
+            self._last_login_at = time.time()
+        except PlaywrightTimeoutError as exc:
+            raise RuntimeError("CMS login timeout: login form elements not found or did not load in time") from exc
+        finally:
+            await page.close()
 
-            for idx, digit in enumerate(digits, start=1):
-                await self._fill_first(
-                    page,
-                    [
-                        f"input[name='otp{idx}']",
-                        f"input[id='otp{idx}']",
-                        f"input[name='code{idx}']",
-                    ],
-                    digit,
-                    timeout_ms=10000,
-                )
+    async def _request_otp(self, page: Page, username: str, password: str) -> None:
+        await page.goto(self.settings.cms_login_url, wait_until="domcontentloaded", timeout=60000)
+        await page.wait_for_timeout(1000)
+
+        await self._fill_first(
+            page,
+            [
+                "input[name='username']",
+                "input#username",
+                "input[type='text']",
+            ],
+            username,
+        )
+        await self._fill_first(
+            page,
+            [
+                "input[name='password']",
+                "input#password",
+                "input[type='password']",
+            ],
+            password,
+        )
+        await self._click_first(
+            page,
+            [
+                "button:has-text('ارسال')",
+                "button:has-text('OTP')",
+                "button[type='submit']",
+                "input[type='submit']",
+            ],
+        )
 
-            await self._click_first(
+    async def _submit_otp(self, page: Page, digits: list[str]) -> None:
+        for idx, digit in enumerate(digits, start=1):
+            await self._fill_first(
                 page,
                 [
-                    "button:has-text('ورود')",
-                    "button:has-text('Login')",
-                    "button[type='submit']",
-                    "input[type='submit']",
+                    f"input[name='otp{idx}']",
+                    f"input[id='otp{idx}']",
+                    f"input[name='code{idx}']",
                 ],
+                digit,
+                timeout_ms=10000,
             )
-            await page.wait_for_load_state("networkidle", timeout=60000)
-            cookies = await self._context.cookies() if self._context else []
-            Path(self.settings.cookies_path).write_text(json.dumps(cookies, ensure_ascii=False), encoding="utf-8")
-            await self.state_manager.set_last_login_today()
-        except TimeoutError as exc:
-            raise RuntimeError("CMS login timeout: login form elements not found or did not load in time") from exc
-        finally:
-            await page.close()
+
+        await self._click_first(
+            page,
+            [
+                "button:has-text('ورود')",
+                "button:has-text('Login')",
+                "button[type='submit']",
+                "input[type='submit']",
+            ],
+        )
+        await page.wait_for_load_state("networkidle", timeout=60000)
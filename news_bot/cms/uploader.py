@@ -1,35 +1,98 @@
 from __future__ import annotations
 
-from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import logging
+from collections import deque
+from typing import TYPE_CHECKING
+
+import httpx
 
 from news_bot.config import Settings
+from news_bot.cms.http_transport import CMSHttpTransport, CMSTransportMismatch
+from news_bot.cms.page_pool import PagePool, click_and_wait_for_save
 from news_bot.cms.session_manager import CMSSessionManager
+from news_bot.utils.step_timer import StepTimer
+
+if TYPE_CHECKING:
+    from playwright.async_api import Page
+
+logger = logging.getLogger(__name__)
+
+
+SET_EDITOR_CONTENT_JS = """
+(html) => {
+    if (window.tinymce && window.tinymce.activeEditor) {
+        window.tinymce.activeEditor.setContent(html);
+        return "tinymce";
+    }
+    if (window.CKEDITOR && window.CKEDITOR.instances) {
+        const instance = Object.values(window.CKEDITOR.instances)[0];
+        if (instance) {
+            instance.setData(html);
+            return "ckeditor";
+        }
+    }
+    const frame = document.querySelector("iframe");
+    if (frame && frame.contentDocument && frame.contentDocument.body) {
+        frame.contentDocument.body.innerHTML = html;
+        return "iframe";
+    }
+    return null;
+}
+"""
 
 
 class CMSUploader:
-    def __init__(self, settings: Settings, session_manager: CMSSessionManager) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        session_manager: CMSSessionManager,
+        http: CMSHttpTransport | None = None,
+        page_pool: PagePool | None = None,
+    ) -> None:
         self.settings = settings
         self.session_manager = session_manager
+        self.http = http
+        self.page_pool = page_pool or PagePool(session_manager, settings.cms_add_url, settings.cms_page_pool_size)
+        self.timings: deque[dict[str, float]] = deque(maxlen=200)
 
     async def upload_news(self, payload: dict[str, str | None]) -> str:
-        page = await self.session_manager.get_page()
+        if self.http:
+            try:
+                return await self.http.upload_news(payload)
+            except (CMSTransportMismatch, httpx.HTTPError) as exc:
+                logger.warning("HTTP upload fell back to browser: %s", exc)
+        return await self._upload_with_browser(payload)
+
+    async def _set_body(self, page: Page, html: str) -> None:
+        editor = await page.evaluate(SET_EDITOR_CONTENT_JS, html)
+        if editor is None:
+            await page.frame_locator("iframe").locator("body").fill(html)
+
+    async def _upload_with_browser(self, payload: dict[str, str | None]) -> str:
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        timer = StepTimer("upload")
         try:
-            await page.goto(self.settings.cms_add_url, wait_until="domcontentloaded")
-            await page.fill("input[name='title']", payload.get("title") or "")
-            await page.fill("textarea[name='lead']", payload.get("lead") or "")
-            await page.select_option("select[name='category']", label=payload.get("category") or "سیاسی")
-            await page.fill("input[name='tags']", "ایران")
-            iframe = page.frame_locator("iframe")
-            await iframe.locator("body").fill(payload.get("content_html") or "")
-            await page.click("button:has-text('justify')")
-            await page.select_option("select[name='position_front']", label="ویژه")
-            await page.select_option("select[name='position_category']", label="سطح یک")
-            if payload.get("image_path"):
-                await page.set_input_files("input[type='file']", payload["image_path"])
-            await page.click("button:has-text('ذخیره')")
-            await page.wait_for_load_state("networkidle")
-            return page.url
+            async with self.page_pool.acquire() as page:
+                timer.mark("page")
+                await page.fill("input[name='title']", payload.get("title") or "")
+                await page.fill("textarea[name='lead']", payload.get("lead") or "")
+                await page.select_option("select[name='category']", label=payload.get("category") or "سیاسی")
+                await page.fill("input[name='tags']", "ایران")
+                timer.mark("fields")
+                await self._set_body(page, payload.get("content_html") or "")
+                await page.click("button:has-text('justify')")
+                timer.mark("body")
+                await page.select_option("select[name='position_front']", label="ویژه")
+                await page.select_option("select[name='position_category']", label="سطح یک")
+                if payload.get("image_path"):
+                    await page.set_input_files("input[type='file']", payload["image_path"])
+                timer.mark("media")
+                edit_url = await click_and_wait_for_save(page, "button:has-text('ذخیره')", self.settings.cms_save_timeout_ms)
+                timer.mark("save")
+                return edit_url
         except PlaywrightTimeoutError as exc:
             raise RuntimeError("CMS upload timeout") from exc
         finally:
-            await page.close()
+            self.timings.append(dict(timer.steps, total=timer.total))
+            logger.info("cms %s", timer.summary())
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 from zoneinfo import ZoneInfo
+import json
 import os
 
 
@@ -12,22 +13,119 @@ class CMSUser:
     password: str
 
 
+@dataclass(slots=True)
+class SiteProfile:
+    name: str
+    prefix_html: str = ""
+    cms_login_url: str | None = None
+    cms_add_url: str | None = None
+    cms_user: str | None = None
+
+
+DEFAULT_SITE_PROFILES = {
+    "didbaniran": SiteProfile(
+        "didbaniran",
+        prefix_html='<p>به گزارش <a href="https://www.didbaniran.ir/"><strong>سایت دیده\u200cبان ایران</strong></a>،</p>',
+    ),
+}
+
+
+def load_site_profiles(path: str | None) -> dict[str, SiteProfile]:
+    profiles = dict(DEFAULT_SITE_PROFILES)
+    if not path:
+        return profiles
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(raw, dict):
+        raise ValueError(f"site profiles file {path} must map profile names to objects")
+    for name, fields in raw.items():
+        try:
+            profiles[name] = SiteProfile(name, **fields)
+        except TypeError as exc:
+            raise ValueError(f"invalid site profile {name!r} in {path}: {exc}") from exc
+    return profiles
+
+
 @dataclass(slots=True)
 class Settings:
     base_dir: Path = field(default_factory=lambda: Path(__file__).resolve().parent.parent)
     db_path: Path = field(init=False)
     blacklist_path: Path = field(init=False)
     cookies_path: Path = field(init=False)
+    profile_dir: Path = field(init=False)
     rss_interval_seconds: int = 120
     scrape_retry_count: int = 3
     upload_retry_count: int = 3
     publish_retry_count: int = 3
+    publish_min_gap_seconds: int = 120
+    publish_jitter_seconds: int = 120
+    publish_max_per_hour: int = 15
+    publish_quiet_hours: tuple[int, int] | None = None
+    publish_urgent_priority: int = 1
+    publish_batch_size: int = 10
+    worker_processes: int = field(default_factory=lambda: int(os.getenv("NEWS_BOT_WORKER_PROCESSES", "0")))
+    worker_heartbeat_timeout_seconds: int = 90
+    queue_high_watermarks: dict[str, int] = field(default_factory=lambda: {"SCRAPE": 200, "UPLOAD": 50})
+    queue_low_watermarks: dict[str, int] = field(default_factory=lambda: {"SCRAPE": 100, "UPLOAD": 20})
+    backpressure_protected_priority: int = 1
+    backpressure_check_seconds: int = 5
+    stale_after_minutes: int = 90
+    breaker_window: int = 20
+    breaker_min_calls: int = 5
+    breaker_failure_rate: float = 0.5
+    breaker_open_seconds: int = 60
+    breaker_max_open_seconds: int = 900
+    upload_concurrency: int = 4
+    handoff_max_items: int = 512
+    handoff_max_bytes: int = 16 * 1024 * 1024
+    queue_priority_aging_seconds: float = 15
+    queue_flow_weights: dict[str, float] = field(default_factory=dict)
+    queue_fast_lane_priority: int = 1
+    queue_fast_lane_workers: int = 1
+    queue_engine: str = field(default_factory=lambda: os.getenv("NEWS_BOT_QUEUE_ENGINE", "sqlite").strip().lower())
+    queue_journal_path: Path = field(init=False)
+    queue_checkpoint_seconds: float = 30
+    queue_journal_fsync_seconds: float = 1
+    manual_ingest_priority: int = 1
+    manual_ingest_max_urls: int = 500
+    cms_otp_timeout_seconds: int = 300
+    cms_login_max_attempts: int = 3
+    cms_login_cooldown_seconds: int = 900
     headless: bool = field(default_factory=lambda: os.getenv("PLAYWRIGHT_HEADLESS", "true").strip().lower() in {"1", "true", "yes", "on"})
     cms_login_url: str = "https://www.didbaniran.ir/admin-start-GeHid0Greph"
     cms_add_url: str = "https://www.didbaniran.ir/fa/admin/newsstudios/add/"
+    cms_http_transport: bool = field(default_factory=lambda: os.getenv("CMS_HTTP_TRANSPORT", "true").strip().lower() in {"1", "true", "yes", "on"})
+    cms_body_field: str = "body"
+    cms_page_pool_size: int = 2
+    cms_save_timeout_ms: int = 60000
+    cms_multi_account: bool = field(default_factory=lambda: os.getenv("CMS_MULTI_ACCOUNT", "false").strip().lower() in {"1", "true", "yes", "on"})
+    cms_account_concurrency: int = 2
+    cms_account_fast_lane_slots: int = 1
+    cms_account_wait_seconds: int = 30
+    cms_session_cookie_names: tuple[str, ...] = ("sessionid",)
+    cms_session_probe_seconds: int = 300
+    cms_session_default_ttl_hours: int = 24
+    cms_relogin_ahead_hours: int = 6
+    cms_relogin_hours: tuple[int, int] | None = (6, 8)
+    site_profiles: dict[str, SiteProfile] = field(default_factory=lambda: load_site_profiles(os.getenv("NEWS_BOT_SITE_PROFILES")))
+    fanout_profiles: tuple[str, ...] = field(default_factory=lambda: tuple(
+        name.strip() for name in os.getenv("NEWS_BOT_FANOUT_PROFILES", "").split(",") if name.strip()
+    ))
+    browser_idle_seconds: int = 600
+    browser_context_max_pages: int = 200
     tehran_tz: ZoneInfo = field(default_factory=lambda: ZoneInfo("Asia/Tehran"))
+    loop_stall_threshold_seconds: float = 1.0
+    search_result_limit: int = 10
+    profile_default_seconds: int = 30
+    metrics_host: str = field(default_factory=lambda: os.getenv("NEWS_BOT_METRICS_HOST", "127.0.0.1"))
+    metrics_port: int = field(default_factory=lambda: int(os.getenv("NEWS_BOT_METRICS_PORT", "0")))
     telegram_token: str = field(default_factory=lambda: os.getenv("TELEGRAM_BOT_TOKEN", ""))
+    telegram_api_base_url: str | None = field(default_factory=lambda: os.getenv("TELEGRAM_API_BASE_URL") or None)
     allowed_chat_id: int | None = field(default_factory=lambda: int(os.getenv("TELEGRAM_ALLOWED_CHAT_ID", "0")) or None)
+    telegram_chat_messages_per_minute: int = 20
+    telegram_global_messages_per_second: int = 25
+    telegram_coalesce_seconds: float = 3
+    telegram_digest_max_items: int = 8
+    telegram_send_max_attempts: int = 5
     rss_feeds: list[str] = field(default_factory=lambda: [
         "https://www.khabaronline.ir/rss/tp/1",
     ])
@@ -36,6 +134,19 @@ class Settings:
         self.db_path = self.base_dir / "news_automation.db"
         self.blacklist_path = self.base_dir / "blacklist.txt"
         self.cookies_path = self.base_dir / "cms_cookies.json"
+        self.profile_dir = self.base_dir / "profiles"
+        self.queue_journal_path = self.base_dir / "queue.journal"
+
+    def account_cookies_path(self, username: str) -> Path:
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in username)
+        return self.base_dir / f"cms_cookies_{safe}.json"
+
+    def for_profile(self, profile: SiteProfile) -> Settings:
+        return replace(
+            self,
+            cms_login_url=profile.cms_login_url or self.cms_login_url,
+            cms_add_url=profile.cms_add_url or self.cms_add_url,
+        )
 
 
 SETTINGS = Settings()
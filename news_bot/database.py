@@ -1,19 +1,33 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import sqlite3
+import time
+from collections.abc import Callable
 from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, TypeVar
 
-from news_bot.models import QueueType
+from news_bot.fair_queue import MANUAL_FLOW, FairQueuePolicy, pop_fair
+from news_bot.metrics import DB_LOCK_WAIT_SECONDS, DB_QUERY_SECONDS
+from news_bot.models import NewsStatus, QueueType
+
+if TYPE_CHECKING:
+    from news_bot.memory_queue import MemoryQueueEngine
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 class Database:
     def __init__(self, path: Path) -> None:
         self.path = path
         self._lock = asyncio.Lock()
+        self.search_available = False
+        self.queue_engine: MemoryQueueEngine | None = None
 
     @contextmanager
     def _connect(self):
@@ -27,9 +41,18 @@ class Database:
         finally:
             conn.close()
 
-    async def initialize(self) -> None:
+    async def _call(self, function: Callable[..., T], *args: Any) -> T:
+        waited = time.perf_counter()
         async with self._lock:
-            await asyncio.to_thread(self._initialize_sync)
+            started = time.perf_counter()
+            DB_LOCK_WAIT_SECONDS.observe(started - waited)
+            try:
+                return await asyncio.to_thread(function, *args)
+            finally:
+                DB_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+    async def initialize(self) -> None:
+        await self._call(self._initialize_sync)
 
     def _initialize_sync(self) -> None:
         with self._connect() as conn:
@@ -88,6 +111,74 @@ class Database:
                 )
                 """
             )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS telegram_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pipeline_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    news_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    attempt INTEGER,
+                    duration REAL,
+                    detail TEXT
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_events_news ON pipeline_events(news_id, ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pipeline_events_event ON pipeline_events(event, ts)")
+            self._ensure_column(conn, "news", "feed_url", "TEXT")
+            self._ensure_column(conn, "cms_users", "last_login_date", "TEXT")
+            self._ensure_column(conn, "cms_users", "session_valid_until", "TEXT")
+            self._ensure_column(conn, "state", "session_valid_until", "TEXT")
+            self._ensure_column(conn, "queues", "not_before", "REAL")
+            self._ensure_column(conn, "news", "search_rowid", "INTEGER")
+            self._ensure_column(conn, "queues", "flow", "TEXT")
+            self._initialize_flows(conn)
+            try:
+                conn.execute(
+                    """
+                    CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+                        news_id UNINDEXED, title, lead, body,
+                        tokenize = 'unicode61 remove_diacritics 2'
+                    )
+                    """
+                )
+                self.search_available = True
+            except sqlite3.OperationalError:
+                logger.warning("SQLite was built without FTS5; /search is disabled")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cms_sessions (
+                    session_key TEXT PRIMARY KEY,
+                    session_valid_until TEXT
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS profile_posts (
+                    news_id TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    cms_edit_url TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY(news_id, profile)
+                )
+                """
+            )
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS seen_hashes (
@@ -97,17 +188,64 @@ class Database:
                 """
             )
 
+    @staticmethod
+    def _initialize_flows(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue_flows (
+                queue_type TEXT NOT NULL,
+                flow TEXT NOT NULL,
+                finish REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY(queue_type, flow)
+            )
+            """
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS queue_vtime (queue_type TEXT PRIMARY KEY, vtime REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queues_flow ON queues(queue_type, flow, priority, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_queues_flow_age ON queues(queue_type, flow, id)")
+        conn.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS queues_assign_flow AFTER INSERT ON queues
+            BEGIN
+                UPDATE queues
+                SET flow = COALESCE(NEW.flow, (SELECT feed_url FROM news WHERE id = NEW.news_id), '{MANUAL_FLOW}')
+                WHERE id = NEW.id;
+                INSERT OR IGNORE INTO queue_flows(queue_type, flow)
+                VALUES (NEW.queue_type, COALESCE(NEW.flow, (SELECT feed_url FROM news WHERE id = NEW.news_id), '{MANUAL_FLOW}'));
+            END
+            """
+        )
+        conn.execute(
+            f"""
+            UPDATE queues
+            SET flow = COALESCE((SELECT feed_url FROM news WHERE news.id = queues.news_id), '{MANUAL_FLOW}')
+            WHERE flow IS NULL
+            """
+        )
+        conn.execute("INSERT OR IGNORE INTO queue_flows(queue_type, flow) SELECT DISTINCT queue_type, flow FROM queues")
+
+    @staticmethod
+    def _ensure_column(conn: sqlite3.Connection, table: str, column: str, definition: str) -> None:
+        columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
     async def execute(self, query: str, params: tuple[Any, ...] = ()) -> None:
-        async with self._lock:
-            await asyncio.to_thread(self._execute_sync, query, params)
+        await self._call(self._execute_sync, query, params)
 
     def _execute_sync(self, query: str, params: tuple[Any, ...]) -> None:
         with self._connect() as conn:
             conn.execute(query, params)
 
+    async def executemany(self, query: str, params_seq: list[tuple[Any, ...]]) -> None:
+        await self._call(self._executemany_sync, query, params_seq)
+
+    def _executemany_sync(self, query: str, params_seq: list[tuple[Any, ...]]) -> None:
+        with self._connect() as conn:
+            conn.executemany(query, params_seq)
+
     async def fetchone(self, query: str, params: tuple[Any, ...] = ()) -> sqlite3.Row | None:
-        async with self._lock:
-            return await asyncio.to_thread(self._fetchone_sync, query, params)
+        return await self._call(self._fetchone_sync, query, params)
 
     def _fetchone_sync(self, query: str, params: tuple[Any, ...]) -> sqlite3.Row | None:
         with self._connect() as conn:
@@ -115,40 +253,363 @@ class Database:
             return cur.fetchone()
 
     async def fetchall(self, query: str, params: tuple[Any, ...] = ()) -> list[sqlite3.Row]:
-        async with self._lock:
-            return await asyncio.to_thread(self._fetchall_sync, query, params)
+        return await self._call(self._fetchall_sync, query, params)
 
     def _fetchall_sync(self, query: str, params: tuple[Any, ...]) -> list[sqlite3.Row]:
         with self._connect() as conn:
             cur = conn.execute(query, params)
             return list(cur.fetchall())
 
-    async def add_queue(self, news_id: str, queue_type: QueueType, priority: int = 100) -> None:
+    def attach_queue_engine(self, engine: MemoryQueueEngine | None) -> None:
+        self.queue_engine = engine
+
+    async def load_queue_snapshot(
+        self,
+    ) -> tuple[list[tuple[Any, ...]], list[tuple[str, str, float]], list[tuple[str, float]], int]:
+        return await self._call(self._load_queue_snapshot_sync)
+
+    def _load_queue_snapshot_sync(
+        self,
+    ) -> tuple[list[tuple[Any, ...]], list[tuple[str, str, float]], list[tuple[str, float]], int]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, news_id, queue_type, priority, created_at, COALESCE(flow, '{MANUAL_FLOW}'), not_before
+                FROM queues ORDER BY id
+                """
+            ).fetchall()
+            flows = conn.execute("SELECT queue_type, flow, finish FROM queue_flows").fetchall()
+            vtimes = conn.execute("SELECT queue_type, vtime FROM queue_vtime").fetchall()
+            sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'queues'").fetchone()
+        return (
+            [tuple(row) for row in rows],
+            [tuple(row) for row in flows],
+            [tuple(row) for row in vtimes],
+            max(sequence["seq"] if sequence else 0, rows[-1]["id"] if rows else 0),
+        )
+
+    async def save_queue_snapshot(
+        self,
+        rows: list[tuple[Any, ...]],
+        flows: list[tuple[str, str, float]],
+        vtimes: list[tuple[str, float]],
+    ) -> None:
+        await self._call(self._save_queue_snapshot_sync, rows, flows, vtimes)
+
+    def _save_queue_snapshot_sync(
+        self,
+        rows: list[tuple[Any, ...]],
+        flows: list[tuple[str, str, float]],
+        vtimes: list[tuple[str, float]],
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM queues")
+            conn.execute("DELETE FROM queue_flows")
+            conn.executemany(
+                "INSERT INTO queues(id, news_id, queue_type, priority, created_at, flow, not_before) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany("INSERT OR REPLACE INTO queue_flows(queue_type, flow, finish) VALUES (?, ?, ?)", flows)
+            conn.executemany("INSERT OR REPLACE INTO queue_vtime(queue_type, vtime) VALUES (?, ?)", vtimes)
+
+    async def add_queue(self, news_id: str, queue_type: QueueType, priority: int = 100, flow: str | None = None) -> None:
+        if self.queue_engine:
+            self.queue_engine.add(news_id, queue_type, priority, flow)
+            return
         now = datetime.utcnow().isoformat()
         await self.execute(
+            """
+            INSERT OR IGNORE INTO queues(news_id, queue_type, priority, created_at, flow)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (news_id, queue_type.value, priority, now, flow),
+        )
+
+    async def add_queue_many(self, news_ids: list[str], queue_type: QueueType, priority: int = 100) -> None:
+        if self.queue_engine:
+            for news_id in news_ids:
+                self.queue_engine.add(news_id, queue_type, priority)
+            return
+        now = datetime.utcnow().isoformat()
+        await self.executemany(
             """
             INSERT OR IGNORE INTO queues(news_id, queue_type, priority, created_at)
             VALUES (?, ?, ?, ?)
             """,
-            (news_id, queue_type.value, priority, now),
+            [(news_id, queue_type.value, priority, now) for news_id in news_ids],
         )
 
-    async def pop_queue(self, queue_type: QueueType) -> sqlite3.Row | None:
-        async with self._lock:
-            return await asyncio.to_thread(self._pop_queue_sync, queue_type)
+    async def clear_queues(self) -> None:
+        if self.queue_engine:
+            self.queue_engine.clear()
+            return
+        await self.execute("DELETE FROM queues")
+
+    async def ingest_urls(self, items: list[tuple[str, str]], priority: int) -> tuple[dict[str, int], list[str]]:
+        engine = self.queue_engine
+        counts, queued = await self._call(self._ingest_urls_sync, items, priority, engine is None)
+        if engine:
+            for news_id in queued:
+                engine.upsert(news_id, QueueType.SCRAPE, priority)
+        return counts, queued
+
+    def _ingest_urls_sync(self, items: list[tuple[str, str]], priority: int, enqueue: bool) -> tuple[dict[str, int], list[str]]:
+        counts = {"inserted": 0, "requeued": 0, "skipped": 0}
+        queued: list[str] = []
+        retryable = (NewsStatus.NEW.value, NewsStatus.FAILED.value, NewsStatus.STALE.value)
+        now = datetime.utcnow().isoformat()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for news_id, source_url in items:
+                existing = conn.execute("SELECT id, status FROM news WHERE source_url = ?", (source_url,)).fetchone()
+                if existing and existing["status"] not in retryable:
+                    counts["skipped"] += 1
+                    continue
+                if existing:
+                    news_id = existing["id"]
+                    conn.execute("UPDATE news SET status = ?, updated_at = ? WHERE id = ?", (NewsStatus.NEW.value, now, news_id))
+                    counts["requeued"] += 1
+                else:
+                    conn.execute(
+                        """
+                        INSERT INTO news(id, source_url, title, lead, content_html, image_path, category, status, cms_edit_url, feed_url, created_at, updated_at)
+                        VALUES (?, ?, ?, '', '', NULL, 'سیاسی', ?, NULL, NULL, ?, ?)
+                        """,
+                        (news_id, source_url, source_url, NewsStatus.NEW.value, now, now),
+                    )
+                    counts["inserted"] += 1
+                if enqueue:
+                    conn.execute(
+                        """
+                        INSERT INTO queues(news_id, queue_type, priority, created_at)
+                        VALUES (?, ?, ?, ?)
+                        ON CONFLICT(news_id, queue_type) DO UPDATE SET priority = MIN(priority, excluded.priority)
+                        """,
+                        (news_id, QueueType.SCRAPE.value, priority, now),
+                    )
+                queued.append(news_id)
+        return counts, queued
 
-    def _pop_queue_sync(self, queue_type: QueueType) -> sqlite3.Row | None:
+    async def defer_queue(self, news_id: str, queue_type: QueueType, priority: int, not_before: float) -> None:
+        if self.queue_engine:
+            self.queue_engine.defer(news_id, queue_type, priority, not_before)
+            return
+        await self.execute(
+            """
+            INSERT INTO queues(news_id, queue_type, priority, created_at, not_before)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(news_id, queue_type) DO UPDATE SET
+                priority = MIN(queues.priority, excluded.priority),
+                not_before = excluded.not_before
+            """,
+            (news_id, queue_type.value, priority, datetime.utcnow().isoformat(), not_before),
+        )
+
+    async def pop_queue(
+        self,
+        queue_type: QueueType,
+        max_priority: int | None = None,
+        policy: FairQueuePolicy | None = None,
+    ) -> sqlite3.Row | dict[str, Any] | None:
+        if self.queue_engine:
+            return self.queue_engine.pop(queue_type, max_priority, policy)
+        return await self._call(self._pop_queue_sync, queue_type, max_priority, policy)
+
+    def _pop_queue_sync(
+        self,
+        queue_type: QueueType,
+        max_priority: int | None = None,
+        policy: FairQueuePolicy | None = None,
+    ) -> sqlite3.Row | None:
         with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if policy:
+                return pop_fair(conn, queue_type, max_priority, policy, time.time())
             row = conn.execute(
                 """
                 SELECT id, news_id, queue_type, priority, created_at
                 FROM queues
-                WHERE queue_type = ?
+                WHERE queue_type = ? AND (? IS NULL OR priority <= ?) AND (not_before IS NULL OR not_before <= ?)
                 ORDER BY priority ASC, id ASC
                 LIMIT 1
                 """,
-                (queue_type.value,),
+                (queue_type.value, max_priority, max_priority, time.time()),
             ).fetchone()
             if row:
                 conn.execute("DELETE FROM queues WHERE id = ?", (row["id"],))
             return row
+
+    async def peek_queue(self, queue_type: QueueType) -> list[sqlite3.Row] | list[dict[str, Any]]:
+        if self.queue_engine:
+            return self.queue_engine.peek(queue_type)
+        return await self.fetchall(
+            """
+            SELECT id, news_id, queue_type, priority, created_at
+            FROM queues
+            WHERE queue_type = ?
+            ORDER BY priority ASC, id ASC
+            """,
+            (queue_type.value,),
+        )
+
+    async def delete_queue(self, queue_id: int) -> None:
+        if self.queue_engine:
+            self.queue_engine.delete(queue_id)
+            return
+        await self.execute("DELETE FROM queues WHERE id = ?", (queue_id,))
+
+    async def awaiting_approval(self) -> list[sqlite3.Row]:
+        if self.queue_engine:
+            queued = self.queue_engine.news_ids(QueueType.PUBLISH)
+            rows = await self.fetchall(
+                "SELECT id, feed_url FROM news WHERE status = ? AND cms_edit_url IS NOT NULL ORDER BY updated_at",
+                (NewsStatus.UPLOADED.value,),
+            )
+            return [row for row in rows if row["id"] not in queued]
+        return await self.fetchall(
+            """
+            SELECT n.id, n.feed_url FROM news n
+            WHERE n.status = ? AND n.cms_edit_url IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM queues q WHERE q.news_id = n.id AND q.queue_type = ?)
+            ORDER BY n.updated_at
+            """,
+            (NewsStatus.UPLOADED.value, QueueType.PUBLISH.value),
+        )
+
+    async def queue_depths(self) -> dict[str, int]:
+        if self.queue_engine:
+            return self.queue_engine.depths()
+        rows = await self.fetchall("SELECT queue_type, COUNT(*) AS depth FROM queues GROUP BY queue_type")
+        return {row["queue_type"]: row["depth"] for row in rows}
+
+    async def add_outbox(self, chat_id: int, kind: str, payload: str) -> None:
+        await self.execute(
+            "INSERT INTO telegram_outbox(chat_id, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+            (chat_id, kind, payload, datetime.utcnow().isoformat()),
+        )
+
+    async def due_outbox(self, now: float) -> list[sqlite3.Row]:
+        return await self.fetchall(
+            "SELECT * FROM telegram_outbox WHERE next_attempt_at <= ? ORDER BY id",
+            (now,),
+        )
+
+    async def next_outbox_attempt(self, after: float) -> float | None:
+        row = await self.fetchone("SELECT MIN(next_attempt_at) AS next_at FROM telegram_outbox WHERE next_attempt_at > ?", (after,))
+        return row["next_at"] if row else None
+
+    async def delete_outbox(self, ids: list[int]) -> None:
+        await self.executemany("DELETE FROM telegram_outbox WHERE id = ?", [(outbox_id,) for outbox_id in ids])
+
+    async def defer_outbox(self, ids: list[int], next_attempt_at: float) -> None:
+        await self.executemany(
+            "UPDATE telegram_outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?",
+            [(next_attempt_at, outbox_id) for outbox_id in ids],
+        )
+
+    async def profile_posts(self, news_ids: list[str]) -> list[sqlite3.Row]:
+        placeholders = ",".join("?" for _ in news_ids)
+        return await self.fetchall(
+            f"SELECT news_id, profile, status, cms_edit_url FROM profile_posts WHERE news_id IN ({placeholders})",
+            tuple(news_ids),
+        )
+
+    async def set_profile_posts(self, rows: list[tuple[str, str, NewsStatus, str | None]]) -> None:
+        now = datetime.utcnow().isoformat()
+        await self.executemany(
+            """
+            INSERT INTO profile_posts(news_id, profile, status, cms_edit_url, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(news_id, profile) DO UPDATE SET
+                status = excluded.status,
+                cms_edit_url = COALESCE(excluded.cms_edit_url, profile_posts.cms_edit_url),
+                updated_at = excluded.updated_at
+            """,
+            [(news_id, profile, status.value, edit_url, now) for news_id, profile, status, edit_url in rows],
+        )
+
+    async def index_news_many(self, items: list[tuple[str, str, str, str]]) -> None:
+        await self._call(self._index_news_many_sync, items)
+
+    def _index_news_many_sync(self, items: list[tuple[str, str, str, str]]) -> None:
+        with self._connect() as conn:
+            for news_id, title, lead, body in items:
+                row = conn.execute("SELECT search_rowid FROM news WHERE id = ?", (news_id,)).fetchone()
+                if not row:
+                    continue
+                cur = conn.execute(
+                    "INSERT OR REPLACE INTO news_fts(rowid, news_id, title, lead, body) VALUES (?, ?, ?, ?, ?)",
+                    (row["search_rowid"], news_id, title, lead, body),
+                )
+                if row["search_rowid"] is None:
+                    conn.execute("UPDATE news SET search_rowid = ? WHERE id = ?", (cur.lastrowid, news_id))
+
+    async def unindexed_news(self, after_rowid: int, limit: int) -> list[sqlite3.Row]:
+        return await self.fetchall(
+            """
+            SELECT rowid, id, title, lead, content_html FROM news
+            WHERE rowid > ? AND search_rowid IS NULL
+            ORDER BY rowid
+            LIMIT ?
+            """,
+            (after_rowid, limit),
+        )
+
+    async def search_news(self, match: str, limit: int) -> list[sqlite3.Row]:
+        return await self.fetchall(
+            """
+            SELECT n.id, n.title, n.status, n.source_url, n.cms_edit_url, n.created_at,
+                   snippet(news_fts, 3, '«', '»', '…', 12) AS snippet
+            FROM news_fts JOIN news n ON n.id = news_fts.news_id
+            WHERE news_fts MATCH ?
+            ORDER BY bm25(news_fts, 0.0, 8.0, 4.0, 1.0)
+            LIMIT ?
+            """,
+            (match, limit),
+        )
+
+    async def drop_stale_queue(self, queue_type: QueueType, created_before: str, min_priority: int) -> int:
+        engine = self.queue_engine
+        if engine is None:
+            return await self._call(self._drop_stale_queue_sync, queue_type, created_before, min_priority)
+        candidates = list(engine.news_ids(queue_type, min_priority))
+        stale = await self._call(self._mark_stale_sync, candidates, created_before)
+        engine.discard(queue_type, stale)
+        return len(stale)
+
+    def _mark_stale_sync(self, news_ids: list[str], created_before: str) -> set[str]:
+        stale: set[str] = set()
+        with self._connect() as conn:
+            for start in range(0, len(news_ids), 500):
+                chunk = news_ids[start : start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                rows = conn.execute(
+                    f"SELECT id FROM news WHERE created_at < ? AND id IN ({placeholders})",
+                    (created_before, *chunk),
+                ).fetchall()
+                stale.update(row["id"] for row in rows)
+            conn.executemany(
+                "UPDATE news SET status = ?, updated_at = ? WHERE id = ?",
+                [(NewsStatus.STALE.value, datetime.utcnow().isoformat(), news_id) for news_id in stale],
+            )
+        return stale
+
+    def _drop_stale_queue_sync(self, queue_type: QueueType, created_before: str, min_priority: int) -> int:
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT q.id, q.news_id
+                FROM queues q JOIN news n ON n.id = q.news_id
+                WHERE q.queue_type = ? AND q.priority >= ? AND n.created_at < ?
+                """,
+                (queue_type.value, min_priority, created_before),
+            ).fetchall()
+            if not rows:
+                return 0
+            conn.executemany("DELETE FROM queues WHERE id = ?", [(row["id"],) for row in rows])
+            conn.executemany(
+                "UPDATE news SET status = ?, updated_at = ? WHERE id = ?",
+                [(NewsStatus.STALE.value, datetime.utcnow().isoformat(), row["news_id"]) for row in rows],
+            )
+            return len(rows)
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_seconds: float = 1.0, tick_seconds: float = 0.1) -> None:
+        self.threshold_seconds = threshold_seconds
+        self.tick_seconds = tick_seconds
+        self.stalls_total = 0
+        self.longest_stall = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._last_tick = time.monotonic()
+        self._handle: asyncio.TimerHandle | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._tick()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _tick(self) -> None:
+        self._last_tick = time.monotonic()
+        if self._loop and not self._stopped.is_set():
+            self._handle = self._loop.call_later(self.tick_seconds, self._tick)
+
+    def _watch(self) -> None:
+        reported_tick = 0.0
+        while not self._stopped.wait(self.tick_seconds):
+            last_tick = self._last_tick
+            stalled = time.monotonic() - last_tick
+            if stalled < self.threshold_seconds:
+                continue
+            self.longest_stall = max(self.longest_stall, stalled)
+            if last_tick == reported_tick:
+                continue
+            reported_tick = last_tick
+            self.stalls_total += 1
+            self._report(stalled)
+
+    def _report(self, stalled: float) -> None:
+        task_name = "unknown"
+        if self._loop:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = f"{task.get_name()} {task.get_coro()!r}"
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        stack = "".join(traceback.format_stack(frame)) if frame else "unavailable"
+        logger.warning("event loop stalled for %.2fs in task %s\n%s", stalled, task_name, stack)
+
+
+class Profiler:
+    def __init__(self, output_dir: Path, top_n: int = 30) -> None:
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self._lock = asyncio.Lock()
+
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def _path(self, kind: str, suffix: str) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        return self.output_dir / f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.{suffix}"
+
+    async def cpu(self, seconds: float) -> tuple[Path, str]:
+        async with self._lock:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+            path = self._path("cpu", "prof")
+            profile.dump_stats(str(path))
+            buffer = io.StringIO()
+            pstats.Stats(profile, stream=buffer).sort_stats("cumulative").print_stats(self.top_n)
+            summary = buffer.getvalue()
+            path.with_suffix(".txt").write_text(summary, encoding="utf-8")
+            logger.info("cpu profile written to %s", path)
+            return path, summary
+
+    async def memory(self, seconds: float) -> tuple[Path, str]:
+        async with self._lock:
+            started_here = not tracemalloc.is_tracing()
+            if started_here:
+                tracemalloc.start(25)
+            try:
+                await asyncio.sleep(seconds)
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                if started_here:
+                    tracemalloc.stop()
+            snapshot = snapshot.filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            stats = snapshot.statistics("lineno")
+            total = sum(stat.size for stat in stats)
+            lines = [f"traced {total / 1024:.1f} KiB in {len(stats)} locations"]
+            lines.extend(str(stat) for stat in stats[: self.top_n])
+            summary = "\n".join(lines)
+            path = self._path("mem", "txt")
+            path.write_text(summary, encoding="utf-8")
+            logger.info("memory snapshot written to %s", path)
+            return path, summary
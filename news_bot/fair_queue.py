@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from news_bot.config import Settings
+from news_bot.models import QueueType
+
+MANUAL_FLOW = "manual"
+
+HEAD_QUERY = """
+    SELECT id, news_id, queue_type, priority, created_at
+    FROM queues
+    WHERE queue_type = ? AND flow = ? AND (? IS NULL OR priority <= ?) AND (not_before IS NULL OR not_before <= ?)
+    ORDER BY {order}
+    LIMIT 1
+"""
+
+
+@dataclass(slots=True)
+class FairQueuePolicy:
+    aging_seconds: float = 30.0
+    urgent_priority: int = 1
+    weights: dict[str, float] = field(default_factory=dict)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> FairQueuePolicy:
+        return cls(
+            aging_seconds=settings.queue_priority_aging_seconds,
+            urgent_priority=settings.queue_fast_lane_priority,
+            weights=settings.queue_flow_weights,
+        )
+
+    def effective_priority(self, priority: int, created_at: str, now: datetime) -> float:
+        if self.aging_seconds <= 0:
+            return priority
+        age = (now - datetime.fromisoformat(created_at)).total_seconds()
+        return max(priority - max(age, 0) / self.aging_seconds, self.urgent_priority)
+
+    def weight(self, flow: str) -> float:
+        return max(self.weights.get(flow, 1.0), 0.01)
+
+
+def pop_fair(
+    conn: sqlite3.Connection,
+    queue_type: QueueType,
+    max_priority: int | None,
+    policy: FairQueuePolicy,
+    now: float,
+) -> sqlite3.Row | None:
+    clock = conn.execute("SELECT vtime FROM queue_vtime WHERE queue_type = ?", (queue_type.value,)).fetchone()
+    vtime = clock["vtime"] if clock else 0.0
+    utcnow = datetime.utcfromtimestamp(now)
+    best: tuple[tuple[int, float, float, int], str, sqlite3.Row] | None = None
+    for flow in conn.execute("SELECT flow, finish FROM queue_flows WHERE queue_type = ?", (queue_type.value,)).fetchall():
+        params = (queue_type.value, flow["flow"], max_priority, max_priority, now)
+        head = conn.execute(HEAD_QUERY.format(order="priority, id"), params).fetchone()
+        if head is None:
+            if not conn.execute("SELECT 1 FROM queues WHERE queue_type = ? AND flow = ? LIMIT 1", params[:2]).fetchone():
+                conn.execute("DELETE FROM queue_flows WHERE queue_type = ? AND flow = ?", params[:2])
+            continue
+        effective = policy.effective_priority(head["priority"], head["created_at"], utcnow)
+        if head["priority"] > policy.urgent_priority and policy.aging_seconds > 0:
+            oldest = conn.execute(HEAD_QUERY.format(order="id"), params).fetchone()
+            aged = policy.effective_priority(oldest["priority"], oldest["created_at"], utcnow)
+            if aged < effective:
+                head, effective = oldest, aged
+        band = 0 if effective <= policy.urgent_priority else 1
+        key = (band, max(vtime, flow["finish"]), effective, head["id"])
+        if best is None or key < best[0]:
+            best = (key, flow["flow"], head)
+    if best is None:
+        return None
+    (_, start, _, _), flow, row = best
+    conn.execute(
+        "UPDATE queue_flows SET finish = ? WHERE queue_type = ? AND flow = ?",
+        (start + 1 / policy.weight(flow), queue_type.value, flow),
+    )
+    conn.execute(
+        """
+        INSERT INTO queue_vtime(queue_type, vtime) VALUES (?, ?)
+        ON CONFLICT(queue_type) DO UPDATE SET vtime = excluded.vtime
+        """,
+        (queue_type.value, start),
+    )
+    conn.execute("DELETE FROM queues WHERE id = ?", (row["id"],))
+    return row
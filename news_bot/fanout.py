@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from news_bot.browser import BrowserHost
+from news_bot.circuit_breaker import BreakerRegistry, CircuitOpenError
+from news_bot.cms.account_pool import CMSAccountPool
+from news_bot.cms.http_transport import CMSSubmitUncertain
+from news_bot.cms.session_manager import PromptFn
+from news_bot.config import Settings, SiteProfile
+from news_bot.database import Database
+from news_bot.metrics import PUBLISH_SECONDS, UPLOAD_SECONDS
+from news_bot.models import NewsStatus, QueueType
+from news_bot.pipeline_stats import OUTCOME_RETRY
+from news_bot.pipeline_trace import FAILED, PUBLISHED, UPLOADED, PipelineTracer
+from news_bot.state_manager import StateManager
+
+logger = logging.getLogger(__name__)
+
+
+RecordFn = Callable[[QueueType, str], None]
+
+
+@dataclass(slots=True)
+class ProfileTarget:
+    profile: SiteProfile
+    settings: Settings
+    accounts: CMSAccountPool
+
+
+class ProfileFanout:
+    def __init__(
+        self,
+        settings: Settings,
+        state_manager: StateManager,
+        db: Database,
+        breakers: BreakerRegistry,
+        browser_host: BrowserHost,
+        tracer: PipelineTracer,
+        record: RecordFn,
+        monitor_sessions: bool = True,
+    ) -> None:
+        self.settings = settings
+        self.db = db
+        self.breakers = breakers
+        self.tracer = tracer
+        self.record = record
+        login_lock = asyncio.Lock()
+        self.targets: list[ProfileTarget] = []
+        for name in settings.fanout_profiles:
+            profile = settings.site_profiles.get(name)
+            if profile is None:
+                raise ValueError(f"unknown fan-out profile {name!r}; known: {', '.join(settings.site_profiles)}")
+            profile_settings = settings.for_profile(profile)
+            self.targets.append(ProfileTarget(
+                profile,
+                profile_settings,
+                CMSAccountPool(
+                    profile_settings,
+                    state_manager,
+                    db,
+                    monitor_sessions=monitor_sessions,
+                    browser_host=browser_host,
+                    profile=profile,
+                    login_lock=login_lock,
+                ),
+            ))
+        self._by_name = {target.profile.name: target for target in self.targets}
+
+    @property
+    def on_otp_prompt(self) -> PromptFn | None:
+        return self.targets[0].accounts.on_otp_prompt if self.targets else None
+
+    @on_otp_prompt.setter
+    def on_otp_prompt(self, prompt: PromptFn | None) -> None:
+        for target in self.targets:
+            target.accounts.on_otp_prompt = prompt
+
+    def invalidate(self) -> None:
+        for target in self.targets:
+            target.accounts.invalidate()
+
+    async def refresh(self) -> None:
+        for target in self.targets:
+            await target.accounts.refresh()
+
+    async def refresh_if_stale(self) -> None:
+        for target in self.targets:
+            await target.accounts.refresh_if_stale()
+
+    def unauthenticated(self) -> bool:
+        return any(target.accounts.unauthenticated() for target in self.targets)
+
+    def start_logins(self) -> None:
+        for target in self.targets:
+            target.accounts.start_logins()
+
+    def upload_ready(self, urgent: bool = False) -> bool:
+        return any(
+            self.breakers.available(target.settings.cms_add_url) and target.accounts.has_capacity(urgent)
+            for target in self.targets
+        )
+
+    def publish_ready(self) -> bool:
+        return any(
+            self.breakers.available(target.settings.cms_add_url) and target.accounts.has_capacity()
+            for target in self.targets
+        )
+
+    async def reset_failed(self, news_id: str) -> None:
+        await self.db.execute("DELETE FROM profile_posts WHERE news_id = ? AND status = ?", (news_id, NewsStatus.FAILED.value))
+
+    async def upload(self, news_id: str, payload: dict[str, Any], urgent: bool = False) -> dict[str, str]:
+        done = {row["profile"] for row in await self.db.profile_posts([news_id])}
+        pending = [target for target in self.targets if target.profile.name not in done]
+        outcomes = await asyncio.gather(
+            *(self._upload_one(target, news_id, payload, urgent) for target in pending),
+            return_exceptions=True,
+        )
+        deferred = self._deferred(pending, outcomes)
+        if deferred:
+            raise deferred
+        rows = await self.db.profile_posts([news_id])
+        return {row["profile"]: row["cms_edit_url"] for row in rows if row["cms_edit_url"] and row["profile"] in self._by_name}
+
+    async def _upload_one(self, target: ProfileTarget, news_id: str, payload: dict[str, Any], urgent: bool) -> None:
+        name = target.profile.name
+        body = dict(payload, content_html=f"{target.profile.prefix_html}{payload.get('content_html') or ''}")
+        for attempt in range(1, self.settings.upload_retry_count + 1):
+            try:
+                async with target.accounts.acquire(urgent) as account:
+                    with self.breakers.guard(target.settings.cms_add_url), UPLOAD_SECONDS.time() as upload_timer:
+                        edit_url = await account.uploader.upload_news(body)
+                self.tracer.record(news_id, UPLOADED, attempt, upload_timer.elapsed, f"{name} {account.username}")
+                await self.db.set_profile_posts([(news_id, name, NewsStatus.UPLOADED, edit_url)])
+                return
+            except CircuitOpenError:
+                raise
+            except CMSSubmitUncertain:
+                logger.exception("upload failed after the form was submitted; not retrying news_id=%s profile=%s", news_id, name)
+                break
+            except Exception:
+                logger.exception("upload retry failed news_id=%s profile=%s", news_id, name)
+                self.record(QueueType.UPLOAD, OUTCOME_RETRY)
+                await asyncio.sleep(1)
+        self.tracer.record(news_id, FAILED, self.settings.upload_retry_count, detail=f"{QueueType.UPLOAD.value} {name}")
+        await self.db.set_profile_posts([(news_id, name, NewsStatus.FAILED, None)])
+
+    async def publish(self, news_ids: list[str]) -> tuple[set[str], CircuitOpenError | None]:
+        rows = await self.db.profile_posts(news_ids)
+        pending: dict[str, dict[str, str]] = {}
+        for row in rows:
+            if row["status"] == NewsStatus.UPLOADED.value and row["cms_edit_url"] and row["profile"] in self._by_name:
+                pending.setdefault(row["profile"], {})[row["news_id"]] = row["cms_edit_url"]
+        targets = [self._by_name[name] for name in pending]
+        outcomes = await asyncio.gather(
+            *(self._publish_profile(target, pending[target.profile.name]) for target in targets),
+            return_exceptions=True,
+        )
+        deferred = self._deferred(targets, outcomes)
+        rows = await self.db.profile_posts(news_ids)
+        published = {row["news_id"] for row in rows if row["status"] == NewsStatus.PUBLISHED.value}
+        return published, deferred
+
+    async def _publish_profile(self, target: ProfileTarget, pending: dict[str, str]) -> None:
+        name = target.profile.name
+        pending = dict(pending)
+        for attempt in range(1, self.settings.publish_retry_count + 1):
+            try:
+                started = time.perf_counter()
+                async with target.accounts.acquire() as account:
+                    with self.breakers.guard(target.settings.cms_add_url):
+                        results = await account.publisher.publish_batch(list(pending.values()))
+                per_item = (time.perf_counter() - started) / len(results)
+            except CircuitOpenError:
+                raise
+            except Exception:
+                logger.exception("publish failed profile=%s size=%d", name, len(pending))
+                self.record(QueueType.PUBLISH, OUTCOME_RETRY)
+                await asyncio.sleep(1)
+                continue
+            published = []
+            for news_id, error in zip(list(pending), results):
+                if error is None:
+                    published.append(news_id)
+                    del pending[news_id]
+                    PUBLISH_SECONDS.observe(per_item)
+                    self.tracer.record(news_id, PUBLISHED, attempt, per_item, f"{name} {account.username}")
+                else:
+                    logger.warning("publish retry failed news_id=%s profile=%s: %s", news_id, name, error)
+                    self.breakers.failure(target.settings.cms_add_url)
+                    self.record(QueueType.PUBLISH, OUTCOME_RETRY)
+            await self.db.set_profile_posts([(news_id, name, NewsStatus.PUBLISHED, None) for news_id in published])
+            if not pending:
+                return
+            await asyncio.sleep(1)
+        for news_id in pending:
+            self.tracer.record(news_id, FAILED, self.settings.publish_retry_count, detail=f"{QueueType.PUBLISH.value} {name}")
+        await self.db.set_profile_posts([(news_id, name, NewsStatus.FAILED, None) for news_id in pending])
+
+    @staticmethod
+    def _deferred(targets: list[ProfileTarget], outcomes: list[BaseException | None]) -> CircuitOpenError | None:
+        deferred: CircuitOpenError | None = None
+        for target, outcome in zip(targets, outcomes):
+            if isinstance(outcome, CircuitOpenError):
+                if deferred is None or outcome.retry_at < deferred.retry_at:
+                    deferred = outcome
+            elif isinstance(outcome, BaseException):
+                logger.error("fan-out job failed profile=%s", target.profile.name, exc_info=outcome)
+        return deferred
+
+    def describe(self) -> list[dict[str, object]]:
+        return [row for target in self.targets for row in target.accounts.describe()]
+
+    async def stop(self) -> None:
+        for target in self.targets:
+            await target.accounts.stop()
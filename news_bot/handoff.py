@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any
+
+from news_bot.metrics import STAGE_HANDOFF
+from news_bot.models import QueueType
+
+
+class StageHandoff:
+    def __init__(self, max_items: int = 512, max_bytes: int = 16 * 1024 * 1024) -> None:
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.evicted_total = 0
+        self._items: OrderedDict[tuple[str, str], tuple[dict[str, Any], int]] = OrderedDict()
+        self._bytes = 0
+
+    def put(self, news_id: str, stage: QueueType, row: dict[str, Any]) -> None:
+        key = (stage.value, news_id)
+        self._pop(key)
+        size = len(row.get("content_html") or "") + 256
+        if size > self.max_bytes:
+            return
+        self._items[key] = (row, size)
+        self._bytes += size
+        while len(self._items) > self.max_items or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._items.popitem(last=False)
+            self._bytes -= evicted
+            self.evicted_total += 1
+
+    def take(self, news_id: str, stage: QueueType) -> dict[str, Any] | None:
+        row = self._pop((stage.value, news_id))
+        STAGE_HANDOFF.labels(stage.value, "memory" if row else "database").inc()
+        return row
+
+    def discard(self, news_id: str) -> None:
+        for stage in QueueType:
+            self._pop((stage.value, news_id))
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._bytes = 0
+
+    def _pop(self, key: tuple[str, str]) -> dict[str, Any] | None:
+        item = self._items.pop(key, None)
+        if item is None:
+            return None
+        self._bytes -= item[1]
+        return item[0]
+
+    def describe(self) -> dict[str, int]:
+        return {"items": len(self._items), "bytes": self._bytes, "evicted_total": self.evicted_total}
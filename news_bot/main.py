@@ -2,30 +2,42 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import signal
 import sys
+import time
 import types
 from datetime import datetime
 from pathlib import Path
+from typing import Any
 
-if __name__ == "__main__" and __package__ in {None, ""}:
+if __name__ in {"__main__", "__mp_main__"} and __package__ in {None, ""}:
     package_root = Path(__file__).resolve().parent
     shim = types.ModuleType("news_bot")
     shim.__path__ = [str(package_root)]
     sys.modules.setdefault("news_bot", shim)
 
+from news_bot.browser import BrowserHost
+from news_bot.circuit_breaker import BreakerRegistry, CircuitOpenError
 from news_bot.cleaner import ContentCleaner
-from news_bot.cms.publisher import CMSPublisher
-from news_bot.cms.session_manager import CMSSessionManager
-from news_bot.cms.uploader import CMSUploader
-from news_bot.config import SETTINGS
+from news_bot.cms.account_pool import CMSAccountPool
+from news_bot.cms.http_transport import CMSSubmitUncertain
+from news_bot.config import SETTINGS, Settings
 from news_bot.database import Database
+from news_bot.diagnostics import LoopWatchdog, Profiler
+from news_bot.fanout import ProfileFanout
+from news_bot.handoff import StageHandoff
+from news_bot.memory_queue import MemoryQueueEngine
+from news_bot.metrics import CLEAN_SECONDS, PUBLISH_SECONDS, SCRAPE_SECONDS, UPLOAD_SECONDS, LoopLagMonitor, MetricsServer
 from news_bot.models import NewsStatus, QueueType
+from news_bot.pipeline_trace import CLEANED, ENQUEUED, FAILED, NOTIFIED, PUBLISHED, SCRAPED, UPLOADED, PipelineTracer
+from news_bot.pipeline_stats import OUTCOME_FAILED, OUTCOME_OK, OUTCOME_RETRY, PipelineStats, seconds_since
+from news_bot.process_pool import ProcessEventRelay, WorkerProcessPool
 from news_bot.queue_manager import QueueManager
 from news_bot.rss_monitor import RSSMonitor
 from news_bot.scheduler import Scheduler
+from news_bot.search_index import SearchIndex
 from news_bot.scraper.khabaronline import KhabarOnlineScraper
 from news_bot.state_manager import StateManager
-from news_bot.telegram_bot import TelegramController
 
 logging.basicConfig(
     level=logging.INFO,
@@ -36,57 +48,161 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("telegram.ext").setLevel(logging.INFO)
 
 
-PROFILE_PREFIX = {
-    "didbaniran": '<p>به گزارش <a href="https://www.didbaniran.ir/"><strong>سایت دیده\u200cبان ایران</strong></a>،</p>',
-}
-
-
 class App:
-    def __init__(self) -> None:
-        self.settings = SETTINGS
+    def __init__(self, relay: ProcessEventRelay | None = None, settings: Settings | None = None) -> None:
+        self.settings = settings or SETTINGS
+        self.relay = relay
         self.db = Database(self.settings.db_path)
+        self.queue_engine: MemoryQueueEngine | None = None
+        if self.settings.queue_engine == "memory":
+            if relay is None and self.settings.worker_processes == 0:
+                self.queue_engine = MemoryQueueEngine(
+                    self.db,
+                    self.settings.queue_journal_path,
+                    checkpoint_seconds=self.settings.queue_checkpoint_seconds,
+                    fsync_seconds=self.settings.queue_journal_fsync_seconds,
+                )
+            elif relay is None:
+                logger.warning("in-memory queue engine needs worker_processes=0; using the sqlite queue")
         self.state_manager = StateManager(self.db)
         self.cleaner = ContentCleaner(self.settings.blacklist_path)
-        self.rss_monitor = RSSMonitor(self.settings, self.db)
-        self.scraper = KhabarOnlineScraper(headless=self.settings.headless)
-        self.session_manager = CMSSessionManager(self.settings, self.state_manager)
-        self.uploader = CMSUploader(self.settings, self.session_manager)
-        self.publisher = CMSPublisher(self.session_manager)
-        self.queue_manager = QueueManager(self.db)
-        self.telegram = TelegramController(
+        self.browser_host = BrowserHost(self.settings)
+        self.scraper = KhabarOnlineScraper(self.browser_host, self.settings.browser_context_max_pages)
+        self.accounts = CMSAccountPool(
             self.settings,
-            self.db,
             self.state_manager,
-            self.queue_manager,
-            self.cleaner,
+            self.db,
+            monitor_sessions=relay is None,
+            browser_host=self.browser_host,
+        )
+        self.tracer = PipelineTracer(self.db)
+        self.search_index = SearchIndex(self.db)
+        self.handoff = StageHandoff(self.settings.handoff_max_items, self.settings.handoff_max_bytes)
+        self.queue_manager = QueueManager(self.db, self.settings, self.tracer)
+        self.stats = PipelineStats()
+        self.breakers = BreakerRegistry(self.settings, on_change=self._relay_breakers if relay else None)
+        self.fanout: ProfileFanout | None = None
+        if self.settings.fanout_profiles:
+            self.fanout = ProfileFanout(
+                self.settings,
+                self.state_manager,
+                self.db,
+                self.breakers,
+                self.browser_host,
+                self.tracer,
+                self._record,
+                monitor_sessions=relay is None,
+            )
+        self.watchdog = LoopWatchdog(self.settings.loop_stall_threshold_seconds)
+        self.profiler = Profiler(self.settings.profile_dir)
+        self.rss_monitor = RSSMonitor(
+            self.settings,
+            self.db,
+            self.queue_manager.backpressure,
+            self.stats,
+            self.tracer,
+            breakers=self.breakers,
         )
+        self.telegram: TelegramController | None = None
+        if relay is None:
+            from news_bot.telegram_bot import TelegramController
+
+            self.telegram = TelegramController(
+                self.settings,
+                self.db,
+                self.state_manager,
+                self.queue_manager,
+                self.cleaner,
+                stats=self.stats,
+                accounts=self.accounts,
+                tracer=self.tracer,
+                profiler=self.profiler,
+                breakers=self.breakers,
+                search_index=self.search_index,
+                fanout=self.fanout,
+                handoff=self.handoff,
+            )
         self.scheduler = Scheduler(self.rss_monitor, self.queue_manager)
+        self.worker_pool: WorkerProcessPool | None = None
+        self.loop_lag = LoopLagMonitor()
+        self._profile_tasks: set[asyncio.Task[None]] = set()
+        self.metrics_server: MetricsServer | None = None
+        if self.telegram:
+            self.accounts.on_otp_prompt = self.telegram.send_message
+            if self.fanout:
+                self.fanout.on_otp_prompt = self.telegram.send_message
+        self.state_manager.subscribe(lambda _: self.accounts.invalidate())
+        if self.fanout:
+            self.state_manager.subscribe(lambda _: self.fanout.invalidate())
 
-    async def initialize(self) -> None:
+    async def initialize(self, stages: tuple[QueueType, ...] = tuple(QueueType)) -> None:
         await self.db.initialize()
+        if self.queue_engine:
+            await self.queue_engine.load()
+            self.db.attach_queue_engine(self.queue_engine)
+            self.queue_engine.start()
+        await self.state_manager.load()
         await self.cleaner.load_blacklist()
-        await self.session_manager.start()
-        self.queue_manager.setup_workers(self._scrape_worker, self._upload_worker, self._publish_worker)
+        if self.fanout:
+            await self.fanout.refresh()
+        else:
+            await self.accounts.refresh()
+        self.tracer.start()
+        if self.relay is None:
+            self.search_index.start()
+        self.queue_manager.setup_workers(
+            self._scrape_worker,
+            self._upload_worker,
+            self._publish_worker,
+            stages=stages,
+            upload_ready=self._upload_ready,
+            publish_batch_fn=self._publish_batch_worker,
+            publish_ready=self._publish_ready,
+        )
 
     async def shutdown(self) -> None:
         await self.scheduler.stop()
-        await self.telegram.stop()
-        await self.session_manager.stop()
+        if self.worker_pool:
+            await self.worker_pool.stop()
+        if self.telegram:
+            await self.telegram.stop()
+        await self._stop_metrics()
+        await self.tracer.stop()
+        await self.search_index.stop()
+        if self.queue_engine:
+            await self.queue_engine.stop()
+        await self._stop_cms()
+
+    async def _stop_cms(self) -> None:
+        if self.fanout:
+            await self.fanout.stop()
+        await self.accounts.stop()
+        await self.browser_host.stop()
+
+    @staticmethod
+    def _can_run(state: dict[str, str | None]) -> bool:
+        return state.get("bot_status") == "ON" and bool(state.get("selected_user"))
 
     async def _scrape_worker(self, news_id: str) -> None:
         row = await self.db.fetchone("SELECT * FROM news WHERE id = ?", (news_id,))
         if not row:
             return
         source_url = row["source_url"]
-        for _ in range(self.settings.scrape_retry_count):
+        for attempt in range(1, self.settings.scrape_retry_count + 1):
             try:
-                scraped = await self.scraper.scrape(source_url)
-                cleaned = self.cleaner.clean(scraped["content_html"] or "")
-                state = await self.state_manager.get_state()
-                profile = str(state.get("selected_profile") or "didbaniran")
-                prefix = PROFILE_PREFIX.get(profile, "")
-                content_html = f"{prefix}{cleaned}"
+                with self.breakers.guard(source_url), SCRAPE_SECONDS.time() as scrape_timer:
+                    scraped = await self.scraper.scrape(source_url)
+                self.tracer.record(news_id, SCRAPED, attempt, scrape_timer.elapsed)
+                with CLEAN_SECONDS.time() as clean_timer:
+                    cleaned = self.cleaner.clean(scraped["content_html"] or "")
+                self.tracer.record(news_id, CLEANED, attempt, clean_timer.elapsed)
+                content_html = cleaned
+                if not self.fanout:
+                    profile = self.settings.site_profiles.get(str(self.state_manager.snapshot().get("selected_profile") or ""))
+                    content_html = f"{profile.prefix_html if profile else ''}{cleaned}"
                 now = datetime.utcnow().isoformat()
+                title = scraped["title"] or row["title"]
+                lead = scraped["lead"] or ""
                 await self.db.execute(
                     """
                     UPDATE news
@@ -94,8 +210,8 @@ class App:
                     WHERE id = ?
                     """,
                     (
-                        scraped["title"] or row["title"],
-                        scraped["lead"] or "",
+                        title,
+                        lead,
                         content_html,
                         scraped["image_path"],
                         NewsStatus.SCRAPED.value,
@@ -103,25 +219,59 @@ class App:
                         news_id,
                     ),
                 )
-                await self.db.add_queue(news_id, QueueType.UPLOAD)
+                await self.search_index.index(news_id, title, lead, cleaned)
+                if self.fanout:
+                    await self.fanout.reset_failed(news_id)
+                self.handoff.put(news_id, QueueType.UPLOAD, {
+                    "id": news_id,
+                    "title": title,
+                    "lead": lead,
+                    "category": row["category"],
+                    "content_html": content_html,
+                    "image_path": scraped["image_path"],
+                    "status": NewsStatus.SCRAPED.value,
+                    "updated_at": now,
+                })
+                await self.db.add_queue(news_id, QueueType.UPLOAD, flow=row["feed_url"])
+                self.tracer.record(news_id, ENQUEUED, detail=QueueType.UPLOAD.value)
+                self._record(QueueType.SCRAPE, OUTCOME_OK, seconds_since(row["created_at"]))
                 return
+            except CircuitOpenError:
+                raise
             except Exception:
                 logger.exception("scrape retry failed news_id=%s", news_id)
+                self._record(QueueType.SCRAPE, OUTCOME_RETRY)
                 await asyncio.sleep(1)
+        self._record(QueueType.SCRAPE, OUTCOME_FAILED)
+        self.tracer.record(news_id, FAILED, self.settings.scrape_retry_count, detail=QueueType.SCRAPE.value)
         await self.db.execute("UPDATE news SET status = ? WHERE id = ?", (NewsStatus.FAILED.value, news_id))
 
-    async def _upload_worker(self, news_id: str) -> None:
-        state = await self.state_manager.get_state()
-        username = state.get("selected_user")
-        if not username:
-            return
-        creds = await self.db.fetchone("SELECT username, password FROM cms_users WHERE username = ?", (username,))
-        if not creds:
+    async def _refresh_accounts(self) -> None:
+        pool = self.fanout or self.accounts
+        await pool.refresh_if_stale()
+        if pool.unauthenticated():
+            if self.relay:
+                self.relay.request_login()
+            else:
+                pool.start_logins()
+
+    async def _upload_ready(self, urgent: bool = False) -> bool:
+        if self.fanout:
+            await self._refresh_accounts()
+            return self.fanout.upload_ready(urgent)
+        if not self.breakers.available(self.settings.cms_add_url):
+            return False
+        await self._refresh_accounts()
+        return self.accounts.has_capacity(urgent)
+
+    async def _upload_worker(self, news_id: str, urgent: bool = False) -> None:
+        if not self.state_manager.snapshot().get("selected_user"):
             return
-        row = await self.db.fetchone("SELECT * FROM news WHERE id = ?", (news_id,))
+        row = self.handoff.take(news_id, QueueType.UPLOAD)
+        if row is None:
+            row = await self.db.fetchone("SELECT * FROM news WHERE id = ?", (news_id,))
         if not row or row["status"] == NewsStatus.DELETED.value:
             return
-        await self.session_manager.ensure_login(creds["username"], creds["password"])
         payload = {
             "title": row["title"],
             "lead": row["lead"],
@@ -129,46 +279,279 @@ class App:
             "content_html": row["content_html"],
             "image_path": row["image_path"],
         }
-        for _ in range(self.settings.upload_retry_count):
+        if self.fanout:
+            await self._upload_fanout(row, payload, urgent)
+            return
+        for attempt in range(1, self.settings.upload_retry_count + 1):
             try:
-                edit_url = await self.uploader.upload_news(payload)
+                async with self.accounts.acquire(urgent) as account:
+                    with self.breakers.guard(self.settings.cms_add_url), UPLOAD_SECONDS.time() as upload_timer:
+                        edit_url = await account.uploader.upload_news(payload)
+                self.tracer.record(news_id, UPLOADED, attempt, upload_timer.elapsed, account.username)
                 now = datetime.utcnow().isoformat()
                 await self.db.execute(
                     "UPDATE news SET cms_edit_url = ?, status = ?, updated_at = ? WHERE id = ?",
                     (edit_url, NewsStatus.UPLOADED.value, now, news_id),
                 )
-                await self.telegram.send_uploaded_notification(news_id, row["title"], edit_url)
+                self._record(QueueType.UPLOAD, OUTCOME_OK, seconds_since(row["updated_at"]))
+                if self.relay:
+                    self.relay.uploaded(news_id, row["title"], edit_url)
+                else:
+                    self.handoff.put(news_id, QueueType.PUBLISH, {"cms_edit_url": edit_url, "updated_at": now})
+                    if self.telegram:
+                        await self.telegram.send_uploaded_notification(news_id, row["title"], edit_url)
+                self.tracer.record(news_id, NOTIFIED)
                 return
+            except CircuitOpenError:
+                raise
+            except CMSSubmitUncertain:
+                logger.exception("upload failed after the form was submitted; not retrying news_id=%s", news_id)
+                break
             except Exception:
                 logger.exception("upload retry failed news_id=%s", news_id)
+                self._record(QueueType.UPLOAD, OUTCOME_RETRY)
                 await asyncio.sleep(1)
+        self._record(QueueType.UPLOAD, OUTCOME_FAILED)
+        self.tracer.record(news_id, FAILED, self.settings.upload_retry_count, detail=QueueType.UPLOAD.value)
         await self.db.execute("UPDATE news SET status = ? WHERE id = ?", (NewsStatus.FAILED.value, news_id))
 
+    async def _upload_fanout(self, row: Any, payload: dict[str, Any], urgent: bool) -> None:
+        news_id = row["id"]
+        edit_urls = await self.fanout.upload(news_id, payload, urgent)
+        if not edit_urls:
+            self._record(QueueType.UPLOAD, OUTCOME_FAILED)
+            await self.db.execute("UPDATE news SET status = ? WHERE id = ?", (NewsStatus.FAILED.value, news_id))
+            return
+        primary = next(edit_urls[target.profile.name] for target in self.fanout.targets if target.profile.name in edit_urls)
+        await self.db.execute(
+            "UPDATE news SET cms_edit_url = ?, status = ?, updated_at = ? WHERE id = ?",
+            (primary, NewsStatus.UPLOADED.value, datetime.utcnow().isoformat(), news_id),
+        )
+        self._record(QueueType.UPLOAD, OUTCOME_OK, seconds_since(row["updated_at"]))
+        links = "\n".join(f"{profile}: {url}" for profile, url in edit_urls.items())
+        if self.relay:
+            self.relay.uploaded(news_id, row["title"], links)
+        elif self.telegram:
+            await self.telegram.send_uploaded_notification(news_id, row["title"], links)
+        self.tracer.record(news_id, NOTIFIED)
+
+    async def _publish_fanout(self, news_ids: list[str]) -> None:
+        placeholders = ",".join("?" for _ in news_ids)
+        rows = await self.db.fetchall(f"SELECT id, updated_at FROM news WHERE id IN ({placeholders})", tuple(news_ids))
+        uploaded_at = {row["id"]: row["updated_at"] for row in rows}
+        published, deferred = await self.fanout.publish(list(uploaded_at))
+        settled = [news_id for news_id in uploaded_at if news_id in published or not deferred]
+        for news_id in settled:
+            self._record(QueueType.PUBLISH, OUTCOME_OK if news_id in published else OUTCOME_FAILED, seconds_since(uploaded_at[news_id]))
+        now = datetime.utcnow().isoformat()
+        await self.db.executemany(
+            "UPDATE news SET status = ?, updated_at = ? WHERE id = ?",
+            [(NewsStatus.PUBLISHED.value if news_id in published else NewsStatus.FAILED.value, now, news_id) for news_id in settled],
+        )
+        if deferred:
+            raise deferred
+
     async def _publish_worker(self, news_id: str) -> None:
-        row = await self.db.fetchone("SELECT cms_edit_url FROM news WHERE id = ?", (news_id,))
+        if self.fanout:
+            await self._publish_fanout([news_id])
+            return
+        row = self.handoff.take(news_id, QueueType.PUBLISH)
+        if row is None:
+            row = await self.db.fetchone("SELECT cms_edit_url, updated_at FROM news WHERE id = ?", (news_id,))
         if not row or not row["cms_edit_url"]:
             return
-        for _ in range(self.settings.publish_retry_count):
+        for attempt in range(1, self.settings.publish_retry_count + 1):
             try:
-                await self.publisher.publish(row["cms_edit_url"])
+                async with self.accounts.acquire() as account:
+                    with self.breakers.guard(self.settings.cms_add_url), PUBLISH_SECONDS.time() as publish_timer:
+                        await account.publisher.publish(row["cms_edit_url"])
+                self.tracer.record(news_id, PUBLISHED, attempt, publish_timer.elapsed, account.username)
                 await self.db.execute("UPDATE news SET status = ?, updated_at = ? WHERE id = ?", (NewsStatus.PUBLISHED.value, datetime.utcnow().isoformat(), news_id))
+                self._record(QueueType.PUBLISH, OUTCOME_OK, seconds_since(row["updated_at"]))
                 return
+            except CircuitOpenError:
+                raise
             except Exception:
                 logger.exception("publish retry failed news_id=%s", news_id)
+                self._record(QueueType.PUBLISH, OUTCOME_RETRY)
                 await asyncio.sleep(1)
+        self._record(QueueType.PUBLISH, OUTCOME_FAILED)
+        self.tracer.record(news_id, FAILED, self.settings.publish_retry_count, detail=QueueType.PUBLISH.value)
         await self.db.execute("UPDATE news SET status = ? WHERE id = ?", (NewsStatus.FAILED.value, news_id))
 
+    async def _publish_batch_worker(self, news_ids: list[str]) -> None:
+        if self.fanout:
+            await self._publish_fanout(news_ids)
+            return
+        found: dict[str, Any] = {}
+        for news_id in news_ids:
+            row = self.handoff.take(news_id, QueueType.PUBLISH)
+            if row:
+                found[news_id] = row
+        missing = [news_id for news_id in news_ids if news_id not in found]
+        if missing:
+            placeholders = ",".join("?" for _ in missing)
+            rows = await self.db.fetchall(
+                f"SELECT id, cms_edit_url, updated_at FROM news WHERE id IN ({placeholders}) AND cms_edit_url IS NOT NULL",
+                tuple(missing),
+            )
+            found.update((row["id"], row) for row in rows)
+        ready = [news_id for news_id in news_ids if news_id in found and found[news_id]["cms_edit_url"]]
+        pending = {news_id: found[news_id]["cms_edit_url"] for news_id in ready}
+        uploaded_at = {news_id: found[news_id]["updated_at"] for news_id in ready}
+        for attempt in range(1, self.settings.publish_retry_count + 1):
+            if not pending:
+                return
+            try:
+                started = time.perf_counter()
+                async with self.accounts.acquire() as account:
+                    with self.breakers.guard(self.settings.cms_add_url):
+                        results = await account.publisher.publish_batch(list(pending.values()))
+                per_item = (time.perf_counter() - started) / len(results)
+            except CircuitOpenError:
+                raise
+            except Exception:
+                logger.exception("publish batch failed size=%d", len(pending))
+                for _ in pending:
+                    self._record(QueueType.PUBLISH, OUTCOME_RETRY)
+                await asyncio.sleep(1)
+                continue
+            published = []
+            for news_id, error in zip(list(pending), results):
+                if error is None:
+                    published.append(news_id)
+                    del pending[news_id]
+                    PUBLISH_SECONDS.observe(per_item)
+                    self.tracer.record(news_id, PUBLISHED, attempt, per_item, account.username)
+                    self._record(QueueType.PUBLISH, OUTCOME_OK, seconds_since(uploaded_at[news_id]))
+                else:
+                    logger.warning("publish retry failed news_id=%s: %s", news_id, error)
+                    self.breakers.failure(self.settings.cms_add_url)
+                    self._record(QueueType.PUBLISH, OUTCOME_RETRY)
+            now = datetime.utcnow().isoformat()
+            await self.db.executemany(
+                "UPDATE news SET status = ?, updated_at = ? WHERE id = ?",
+                [(NewsStatus.PUBLISHED.value, now, news_id) for news_id in published],
+            )
+            logger.info("publish batch done published=%d failed=%d", len(published), len(pending))
+            if pending:
+                await asyncio.sleep(1)
+        for news_id in pending:
+            self._record(QueueType.PUBLISH, OUTCOME_FAILED)
+            self.tracer.record(news_id, FAILED, self.settings.publish_retry_count, detail=QueueType.PUBLISH.value)
+        await self.db.executemany(
+            "UPDATE news SET status = ? WHERE id = ?",
+            [(NewsStatus.FAILED.value, news_id) for news_id in pending],
+        )
+
+    async def _publish_ready(self) -> bool:
+        if self.fanout:
+            await self._refresh_accounts()
+            return self.fanout.publish_ready()
+        if not self.breakers.available(self.settings.cms_add_url):
+            return False
+        await self._refresh_accounts()
+        return self.accounts.has_capacity()
+
+    def _relay_breakers(self, rows: list[dict[str, Any]]) -> None:
+        if self.relay:
+            self.relay.emit("breakers", rows)
+
+    def _record(self, stage: QueueType, outcome: str, latency: float | None = None) -> None:
+        self.stats.record(stage.value, outcome, latency)
+        if self.relay:
+            self.relay.emit("stat", stage.value, outcome, latency)
+
+    async def _on_worker_event(self, index: int, kind: str, payload: tuple[Any, ...]) -> None:
+        if kind == "uploaded":
+            if not self.fanout:
+                news_id, _, edit_url = payload
+                self.handoff.put(news_id, QueueType.PUBLISH, {"cms_edit_url": edit_url, "updated_at": datetime.utcnow().isoformat()})
+            if self.telegram:
+                await self.telegram.send_uploaded_notification(*payload)
+        elif kind == "stat":
+            self.stats.record(*payload)
+        elif kind == "breakers":
+            self.breakers.update_remote(f"worker {index}", payload[0])
+        elif kind == "login_required":
+            if self.fanout:
+                await self.fanout.refresh_if_stale()
+                self.fanout.start_logins()
+                return
+            await self.accounts.refresh_if_stale()
+            self.accounts.start_logins()
+
+    async def _start_metrics(self, port: int) -> None:
+        self.loop_lag.start()
+        self.watchdog.start()
+        if port <= 0:
+            return
+        self.metrics_server = MetricsServer(self.settings.metrics_host, port)
+        try:
+            await self.metrics_server.start()
+        except OSError:
+            logger.exception("failed to start metrics endpoint on port %s", port)
+            self.metrics_server = None
+
+    async def _stop_metrics(self) -> None:
+        self.watchdog.stop()
+        await self.loop_lag.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+
+    def _install_profile_signals(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig, kind in ((getattr(signal, "SIGUSR1", None), "cpu"), (getattr(signal, "SIGUSR2", None), "mem")):
+            if sig is None:
+                continue
+            try:
+                loop.add_signal_handler(sig, self._start_profile, kind)
+            except (NotImplementedError, RuntimeError):
+                return
+
+    def _start_profile(self, kind: str) -> None:
+        if self.profiler.busy():
+            logger.warning("profile request ignored: another profile is running")
+            return
+        task = asyncio.create_task(self._profile(kind, self.settings.profile_default_seconds))
+        self._profile_tasks.add(task)
+        task.add_done_callback(self._profile_tasks.discard)
+
+    async def _profile(self, kind: str, seconds: float) -> None:
+        try:
+            if kind == "cpu":
+                path, _ = await self.profiler.cpu(seconds)
+            else:
+                path, _ = await self.profiler.memory(seconds)
+        except Exception:
+            logger.exception("%s profile failed", kind)
+            return
+        if self.telegram:
+            await self.telegram.send_message(f"{kind} profile written to {path}")
+
     async def run(self) -> None:
-        await self.initialize()
-        await self.telegram.start()
+        processes = self.settings.worker_processes
+        if processes > 0:
+            await self.initialize(stages=(QueueType.PUBLISH,))
+            self.worker_pool = WorkerProcessPool(
+                processes,
+                worker_process_main,
+                self._on_worker_event,
+                heartbeat_timeout=self.settings.worker_heartbeat_timeout_seconds,
+            )
+        else:
+            await self.initialize()
+        await self._start_metrics(self.settings.metrics_port)
+        self._install_profile_signals()
+        if self.telegram:
+            await self.telegram.start()
+        if self.worker_pool:
+            self.worker_pool.start()
         scheduler_running = False
-        logger.info("system started | playwright headless=%s", self.settings.headless)
+        logger.info("system started | playwright headless=%s worker_processes=%s", self.settings.headless, processes)
         try:
             while True:
-                state = await self.state_manager.get_state()
-                bot_status = state.get("bot_status")
-                selected_user = state.get("selected_user")
-                can_run = bot_status == "ON" and bool(selected_user)
+                can_run = self._can_run(self.state_manager.snapshot())
                 if can_run and not scheduler_running:
                     self.scheduler.start()
                     scheduler_running = True
@@ -177,12 +560,35 @@ class App:
                     await self.scheduler.stop()
                     scheduler_running = False
                     logger.info("automation workers stopped")
+                await self.state_manager.wait_changed()
+        finally:
+            await self.shutdown()
+
+    async def run_worker(self, stop_flag: Any) -> None:
+        await self.initialize(stages=(QueueType.SCRAPE, QueueType.UPLOAD))
+        port = self.settings.metrics_port
+        await self._start_metrics(port + self.relay.index + 1 if port > 0 and self.relay else 0)
+        self._install_profile_signals()
+        workers_running = False
+        try:
+            while not stop_flag.is_set():
+                if self.relay:
+                    self.relay.heartbeat()
+                can_run = self._can_run(await self.state_manager.load())
+                if can_run and not workers_running:
+                    self.queue_manager.start()
+                    workers_running = True
+                elif not can_run and workers_running:
+                    await self.queue_manager.stop()
+                    workers_running = False
                 await asyncio.sleep(1)
         finally:
-            if scheduler_running:
-                await self.scheduler.stop()
-            await self.telegram.stop()
-            await self.session_manager.stop()
+            await self.shutdown()
+
+
+def worker_process_main(index: int, events: Any, stop_flag: Any) -> None:
+    app = App(relay=ProcessEventRelay(index, events))
+    asyncio.run(app.run_worker(stop_flag))
 
 
 async def main() -> None:
@@ -0,0 +1,455 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from news_bot.database import Database
+from news_bot.fair_queue import MANUAL_FLOW, FairQueuePolicy
+from news_bot.models import QueueType
+
+logger = logging.getLogger(__name__)
+
+
+ADD = "add"
+SET = "set"
+DELETE = "del"
+POP = "pop"
+PRUNE = "prune"
+CLEAR = "clear"
+
+
+@dataclass(slots=True)
+class QueueEntry:
+    id: int
+    news_id: str
+    queue_type: str
+    priority: int
+    created_at: str
+    flow: str = MANUAL_FLOW
+    not_before: float | None = None
+
+    def row(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "news_id": self.news_id,
+            "queue_type": self.queue_type,
+            "priority": self.priority,
+            "created_at": self.created_at,
+        }
+
+
+@dataclass(slots=True)
+class FlowState:
+    finish: float = 0.0
+    size: int = 0
+    by_priority: list[tuple[int, int]] = field(default_factory=list)
+    by_age: list[int] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Lane:
+    entries: dict[int, QueueEntry] = field(default_factory=dict)
+    by_news: dict[str, int] = field(default_factory=dict)
+    flows: dict[str, FlowState] = field(default_factory=dict)
+    delayed: list[tuple[float, int]] = field(default_factory=list)
+    vtime: float = 0.0
+
+
+class MemoryQueueEngine:
+    def __init__(
+        self,
+        db: Database,
+        journal_path: Path,
+        checkpoint_seconds: float = 30.0,
+        fsync_seconds: float = 1.0,
+        max_flow_hints: int = 20000,
+    ) -> None:
+        self.db = db
+        self.journal_path = journal_path
+        self.rotated_path = journal_path.with_name(journal_path.name + ".1")
+        self.checkpoint_seconds = checkpoint_seconds
+        self.fsync_seconds = fsync_seconds
+        self.max_flow_hints = max_flow_hints
+        self.checkpoints_total = 0
+        self._lanes: dict[str, Lane] = {}
+        self._next_id = 1
+        self._flow_hints: dict[str, str] = {}
+        self._fd: int | None = None
+        self._ops = 0
+        self._unsynced = False
+        self._replaying = False
+        self._task: asyncio.Task[None] | None = None
+        self._stop_event = asyncio.Event()
+
+    async def load(self) -> int:
+        rows, flows, vtimes, sequence = await self.db.load_queue_snapshot()
+        self._lanes.clear()
+        self._next_id = sequence + 1
+        for queue_type, flow, finish in flows:
+            self._lane(queue_type).flows[flow] = FlowState(finish=finish)
+        for queue_type, vtime in vtimes:
+            self._lane(queue_type).vtime = vtime
+        now = time.time()
+        for row in rows:
+            self._insert(QueueEntry(*row), now)
+        journals = [path for path in (self.rotated_path, self.journal_path) if path.exists() and path.stat().st_size]
+        replayed = 0
+        self._replaying = True
+        try:
+            for path in journals:
+                replayed += self._replay(path, now)
+        finally:
+            self._replaying = False
+        self._fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if journals:
+            logger.info("queue journal replayed %s operations", replayed)
+            self._ops = replayed + 1
+            await self.checkpoint()
+        return replayed
+
+    def _replay(self, path: Path, now: float) -> int:
+        count = 0
+        with path.open(encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    logger.warning("queue journal %s ends with a torn record; ignoring it", path.name)
+                    break
+                self._apply(op, now)
+                count += 1
+        return count
+
+    def _apply(self, op: list[Any], now: float) -> None:
+        kind = op[0]
+        if kind == ADD:
+            _, queue_id, news_id, queue_type, priority, created_at, flow, not_before = op
+            self._next_id = max(self._next_id, queue_id + 1)
+            lane = self._lane(queue_type)
+            if queue_id not in lane.entries:
+                self._insert(QueueEntry(queue_id, news_id, queue_type, priority, created_at, flow, not_before), now)
+        elif kind == SET:
+            _, queue_id, queue_type, priority, not_before = op
+            entry = self._lane(queue_type).entries.get(queue_id)
+            if entry:
+                self._update(self._lanes[queue_type], entry, priority, not_before, now)
+        elif kind in (DELETE, POP):
+            queue_id, queue_type = op[1], op[2]
+            lane = self._lane(queue_type)
+            if kind == POP:
+                lane.flows.setdefault(op[3], FlowState()).finish = op[4]
+                lane.vtime = op[5]
+            entry = lane.entries.get(queue_id)
+            if entry:
+                self._remove(lane, entry)
+        elif kind == PRUNE:
+            _, queue_type, flow = op
+            lane = self._lane(queue_type)
+            if flow in lane.flows and not lane.flows[flow].size:
+                del lane.flows[flow]
+        elif kind == CLEAR:
+            self._clear()
+
+    def _journal(self, *op: Any) -> None:
+        if self._replaying:
+            return
+        self._ops += 1
+        if self._fd is None:
+            return
+        os.write(self._fd, (json.dumps(op, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+        self._unsynced = True
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+        try:
+            await self.checkpoint()
+        finally:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    async def _run(self) -> None:
+        last_checkpoint = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.fsync_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if self._unsynced and self._fd is not None:
+                    self._unsynced = False
+                    await asyncio.to_thread(os.fsync, self._fd)
+                if time.monotonic() - last_checkpoint >= self.checkpoint_seconds:
+                    last_checkpoint = time.monotonic()
+                    await self.checkpoint()
+            except Exception:
+                logger.exception("queue journal maintenance failed")
+
+    async def checkpoint(self) -> None:
+        if not self._ops or self._fd is None:
+            return
+        os.close(self._fd)
+        if self.rotated_path.exists():
+            with self.rotated_path.open("ab") as rotated:
+                rotated.write(self.journal_path.read_bytes())
+            self.journal_path.unlink()
+        else:
+            os.replace(self.journal_path, self.rotated_path)
+        self._fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._ops = 0
+        self._unsynced = False
+        rows, flows, vtimes = self._snapshot()
+        await self.db.save_queue_snapshot(rows, flows, vtimes)
+        self.rotated_path.unlink()
+        self.checkpoints_total += 1
+
+    def _snapshot(self) -> tuple[list[tuple[Any, ...]], list[tuple[str, str, float]], list[tuple[str, float]]]:
+        rows = []
+        flows = []
+        vtimes = []
+        for queue_type, lane in self._lanes.items():
+            rows.extend(
+                (entry.id, entry.news_id, entry.queue_type, entry.priority, entry.created_at, entry.flow, entry.not_before)
+                for entry in lane.entries.values()
+            )
+            flows.extend((queue_type, name, flow.finish) for name, flow in lane.flows.items())
+            vtimes.append((queue_type, lane.vtime))
+        rows.sort()
+        return rows, flows, vtimes
+
+    def _lane(self, queue_type: str) -> Lane:
+        lane = self._lanes.get(queue_type)
+        if lane is None:
+            lane = self._lanes[queue_type] = Lane()
+        return lane
+
+    def _insert(self, entry: QueueEntry, now: float) -> None:
+        lane = self._lane(entry.queue_type)
+        lane.entries[entry.id] = entry
+        lane.by_news[entry.news_id] = entry.id
+        if entry.flow != MANUAL_FLOW:
+            self._flow_hints.pop(entry.news_id, None)
+            self._flow_hints[entry.news_id] = entry.flow
+            if len(self._flow_hints) > self.max_flow_hints:
+                del self._flow_hints[next(iter(self._flow_hints))]
+        flow = lane.flows.get(entry.flow)
+        if flow is None:
+            flow = lane.flows[entry.flow] = FlowState()
+        flow.size += 1
+        self._park_or_push(lane, flow, entry, now)
+
+    def _park_or_push(self, lane: Lane, flow: FlowState, entry: QueueEntry, now: float) -> None:
+        if entry.not_before is not None and entry.not_before > now:
+            heapq.heappush(lane.delayed, (entry.not_before, entry.id))
+            return
+        entry.not_before = None
+        heapq.heappush(flow.by_priority, (entry.priority, entry.id))
+        heapq.heappush(flow.by_age, entry.id)
+        if len(flow.by_priority) > 2 * flow.size + 64:
+            self._compact(lane, flow, entry.flow)
+
+    def _compact(self, lane: Lane, flow: FlowState, name: str) -> None:
+        live = [entry for entry in lane.entries.values() if entry.flow == name and entry.not_before is None]
+        flow.by_priority = [(entry.priority, entry.id) for entry in live]
+        flow.by_age = [entry.id for entry in live]
+        heapq.heapify(flow.by_priority)
+        heapq.heapify(flow.by_age)
+
+    def _update(self, lane: Lane, entry: QueueEntry, priority: int, not_before: float | None, now: float) -> None:
+        entry.priority = priority
+        entry.not_before = not_before
+        self._park_or_push(lane, lane.flows[entry.flow], entry, now)
+
+    def _remove(self, lane: Lane, entry: QueueEntry) -> None:
+        del lane.entries[entry.id]
+        if lane.by_news.get(entry.news_id) == entry.id:
+            del lane.by_news[entry.news_id]
+        lane.flows[entry.flow].size -= 1
+
+    def _promote(self, lane: Lane, now: float) -> None:
+        while lane.delayed and lane.delayed[0][0] <= now:
+            not_before, queue_id = heapq.heappop(lane.delayed)
+            entry = lane.entries.get(queue_id)
+            if entry and entry.not_before == not_before:
+                self._park_or_push(lane, lane.flows[entry.flow], entry, now)
+
+    @staticmethod
+    def _head(lane: Lane, flow: FlowState, max_priority: int | None) -> QueueEntry | None:
+        heap = flow.by_priority
+        while heap:
+            priority, queue_id = heap[0]
+            entry = lane.entries.get(queue_id)
+            if entry is None or entry.not_before is not None or entry.priority != priority:
+                heapq.heappop(heap)
+                continue
+            return entry if max_priority is None or priority <= max_priority else None
+        return None
+
+    @staticmethod
+    def _oldest(lane: Lane, flow: FlowState, max_priority: int | None) -> QueueEntry | None:
+        heap = flow.by_age
+        while heap:
+            entry = lane.entries.get(heap[0])
+            if entry is None or entry.not_before is not None:
+                heapq.heappop(heap)
+                continue
+            if max_priority is None or entry.priority <= max_priority:
+                return entry
+            break
+        eligible = (
+            lane.entries[queue_id] for queue_id in set(heap)
+            if queue_id in lane.entries
+            and lane.entries[queue_id].not_before is None
+            and lane.entries[queue_id].priority <= max_priority
+        )
+        return min(eligible, key=lambda entry: entry.id, default=None)
+
+    def add(self, news_id: str, queue_type: QueueType, priority: int = 100, flow: str | None = None) -> None:
+        lane = self._lane(queue_type.value)
+        if news_id in lane.by_news:
+            return
+        self._add(lane, news_id, queue_type.value, priority, flow, None)
+
+    def _add(self, lane: Lane, news_id: str, queue_type: str, priority: int, flow: str | None, not_before: float | None) -> None:
+        flow = flow or self._flow_hints.get(news_id, MANUAL_FLOW)
+        entry = QueueEntry(self._next_id, news_id, queue_type, priority, datetime.utcnow().isoformat(), flow, not_before)
+        self._next_id += 1
+        self._journal(ADD, entry.id, news_id, queue_type, priority, entry.created_at, entry.flow, not_before)
+        self._insert(entry, time.time())
+
+    def upsert(self, news_id: str, queue_type: QueueType, priority: int, flow: str | None = None) -> None:
+        lane = self._lane(queue_type.value)
+        queue_id = lane.by_news.get(news_id)
+        if queue_id is None:
+            self._add(lane, news_id, queue_type.value, priority, flow, None)
+            return
+        entry = lane.entries[queue_id]
+        if priority < entry.priority:
+            self._journal(SET, queue_id, entry.queue_type, priority, entry.not_before)
+            self._update(lane, entry, priority, entry.not_before, time.time())
+
+    def defer(self, news_id: str, queue_type: QueueType, priority: int, not_before: float) -> None:
+        lane = self._lane(queue_type.value)
+        queue_id = lane.by_news.get(news_id)
+        if queue_id is None:
+            self._add(lane, news_id, queue_type.value, priority, None, not_before)
+            return
+        entry = lane.entries[queue_id]
+        priority = min(entry.priority, priority)
+        self._journal(SET, queue_id, entry.queue_type, priority, not_before)
+        self._update(lane, entry, priority, not_before, time.time())
+
+    def pop(
+        self,
+        queue_type: QueueType,
+        max_priority: int | None = None,
+        policy: FairQueuePolicy | None = None,
+        now: float | None = None,
+    ) -> dict[str, Any] | None:
+        lane = self._lanes.get(queue_type.value)
+        if lane is None:
+            return None
+        now = time.time() if now is None else now
+        self._promote(lane, now)
+        if policy is None:
+            best: QueueEntry | None = None
+            for flow in lane.flows.values():
+                head = self._head(lane, flow, max_priority)
+                if head and (best is None or (head.priority, head.id) < (best.priority, best.id)):
+                    best = head
+            if best is None:
+                return None
+            self._journal(DELETE, best.id, best.queue_type)
+            self._remove(lane, best)
+            return best.row()
+        utcnow = datetime.utcfromtimestamp(now)
+        chosen: tuple[tuple[int, float, float, int], str, QueueEntry] | None = None
+        for name, flow in list(lane.flows.items()):
+            head = self._head(lane, flow, max_priority)
+            if head is None:
+                if not flow.size:
+                    self._journal(PRUNE, queue_type.value, name)
+                    del lane.flows[name]
+                continue
+            effective = policy.effective_priority(head.priority, head.created_at, utcnow)
+            if head.priority > policy.urgent_priority and policy.aging_seconds > 0:
+                oldest = self._oldest(lane, flow, max_priority)
+                aged = policy.effective_priority(oldest.priority, oldest.created_at, utcnow)
+                if aged < effective:
+                    head, effective = oldest, aged
+            band = 0 if effective <= policy.urgent_priority else 1
+            key = (band, max(lane.vtime, flow.finish), effective, head.id)
+            if chosen is None or key < chosen[0]:
+                chosen = (key, name, head)
+        if chosen is None:
+            return None
+        (_, start, _, _), name, entry = chosen
+        lane.flows[name].finish = start + 1 / policy.weight(name)
+        lane.vtime = start
+        self._journal(POP, entry.id, entry.queue_type, name, lane.flows[name].finish, start)
+        self._remove(lane, entry)
+        return entry.row()
+
+    def peek(self, queue_type: QueueType) -> list[dict[str, Any]]:
+        lane = self._lanes.get(queue_type.value)
+        if lane is None:
+            return []
+        return [entry.row() for entry in sorted(lane.entries.values(), key=lambda entry: (entry.priority, entry.id))]
+
+    def delete(self, queue_id: int) -> None:
+        for lane in self._lanes.values():
+            entry = lane.entries.get(queue_id)
+            if entry:
+                self._journal(DELETE, queue_id, entry.queue_type)
+                self._remove(lane, entry)
+                return
+
+    def discard(self, queue_type: QueueType, news_ids: set[str]) -> None:
+        lane = self._lanes.get(queue_type.value)
+        if lane is None:
+            return
+        for news_id in news_ids:
+            queue_id = lane.by_news.get(news_id)
+            if queue_id is not None:
+                self._journal(DELETE, queue_id, queue_type.value)
+                self._remove(lane, lane.entries[queue_id])
+
+    def news_ids(self, queue_type: QueueType, min_priority: int | None = None) -> set[str]:
+        lane = self._lanes.get(queue_type.value)
+        if lane is None:
+            return set()
+        return {entry.news_id for entry in lane.entries.values() if min_priority is None or entry.priority >= min_priority}
+
+    def depths(self) -> dict[str, int]:
+        return {queue_type: len(lane.entries) for queue_type, lane in self._lanes.items() if lane.entries}
+
+    def clear(self) -> None:
+        self._journal(CLEAR)
+        self._clear()
+
+    def _clear(self) -> None:
+        for lane in self._lanes.values():
+            lane.entries.clear()
+            lane.by_news.clear()
+            lane.delayed.clear()
+            for flow in lane.flows.values():
+                flow.size = 0
+                flow.by_priority.clear()
+                flow.by_age.clear()
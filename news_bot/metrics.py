@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+    suffix = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], _Metric] = {}
+        REGISTRY.register(self)
+
+    def _new_child(self) -> _Metric:
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _series(self) -> list[tuple[tuple[str, ...], _Metric]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> list[str]:
+        name = self.name + self.suffix
+        lines = [f"# HELP {name} {self.documentation}", f"# TYPE {name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(child._samples(name, self.labelnames, values))
+        return lines
+
+    def _samples(self, name: str, labelnames: tuple[str, ...], values: tuple[str, ...]) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+    suffix = "_total"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), _register: bool = True) -> None:
+        self.value = 0.0
+        if _register:
+            super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> Counter:
+        return Counter(self.name, self.documentation, _register=False)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def _samples(self, name: str, labelnames: tuple[str, ...], values: tuple[str, ...]) -> list[str]:
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), _register: bool = True) -> None:
+        self.value = 0.0
+        self._function: Callable[[], float] | None = None
+        if _register:
+            super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> Gauge:
+        return Gauge(self.name, self.documentation, _register=False)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def _samples(self, name: str, labelnames: tuple[str, ...], values: tuple[str, ...]) -> list[str]:
+        value = self._function() if self._function else self.value
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        _register: bool = True,
+    ) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        if _register:
+            super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> Histogram:
+        return Histogram(self.name, self.documentation, buckets=self.buckets, _register=False)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+    def _samples(self, name: str, labelnames: tuple[str, ...], values: tuple[str, ...]) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "started", "elapsed")
+
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> _Timer:
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.elapsed = time.perf_counter() - self.started
+        self.histogram.observe(self.elapsed)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+DB_QUERY_SECONDS = Histogram("news_bot_db_query_seconds", "Time spent executing SQLite calls")
+DB_LOCK_WAIT_SECONDS = Histogram("news_bot_db_lock_wait_seconds", "Time spent waiting for the database lock")
+QUEUE_DEPTH = Gauge("news_bot_queue_depth", "Rows waiting per queue", ("queue",))
+QUEUE_CLAIM_SECONDS = Histogram("news_bot_queue_claim_seconds", "Time to claim the next queue row", ("queue",))
+QUEUE_ITEMS = Counter("news_bot_queue_items", "Queue rows handed to workers", ("queue",))
+STAGE_HANDOFF = Counter("news_bot_stage_handoff", "Stage inputs served from the in-process hand-off or the database", ("stage", "source"))
+FEED_FETCH_SECONDS = Histogram("news_bot_feed_fetch_seconds", "RSS feed fetch duration", ("feed",), STAGE_BUCKETS)
+FEED_BYTES = Counter("news_bot_feed_bytes", "RSS feed bytes downloaded", ("feed",))
+STAGE_SECONDS = Histogram("news_bot_stage_seconds", "Pipeline stage duration", ("stage",), STAGE_BUCKETS)
+BROWSER_PAGES = Gauge("news_bot_browser_pages", "Open Playwright pages", ("owner",))
+EVENT_LOOP_LAG_SECONDS = Histogram("news_bot_event_loop_lag_seconds", "Event loop scheduling delay")
+CIRCUIT_STATE = Gauge("news_bot_circuit_state", "Circuit breaker state per host (0 closed, 1 half-open, 2 open)", ("host",))
+
+SCRAPE_SECONDS = STAGE_SECONDS.labels("scrape")
+CLEAN_SECONDS = STAGE_SECONDS.labels("clean")
+UPLOAD_SECONDS = STAGE_SECONDS.labels("upload")
+PUBLISH_SECONDS = STAGE_SECONDS.labels("publish")
+CMS_PAGES = BROWSER_PAGES.labels("cms")
+SCRAPER_PAGES = BROWSER_PAGES.labels("scraper")
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(loop.time() - expected, 0.0)
+            EVENT_LOOP_LAG_SECONDS.observe(self.last_lag)
+
+
+class MetricsServer:
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY) -> None:
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("metrics endpoint listening on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in {b"\r\n", b"\n", b""}:
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -21,6 +21,7 @@ class NewsStatus(StrEnum):
     UPLOADED = "UPLOADED"
     PUBLISHED = "PUBLISHED"
     DELETED = "DELETED"
+    STALE = "STALE"
     FAILED = "FAILED"
 
 
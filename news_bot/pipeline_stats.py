@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from datetime import datetime
+
+HOUR_SECONDS = 3600
+DAY_SECONDS = 24 * HOUR_SECONDS
+BUCKET_SECONDS = 60
+
+OUTCOME_OK = "ok"
+OUTCOME_RETRY = "retry"
+OUTCOME_FAILED = "failed"
+
+LATENCY_LABELS = {
+    "SCRAPE": "rss→scrape",
+    "UPLOAD": "scrape→upload",
+    "PUBLISH": "upload→publish",
+}
+
+
+def seconds_since(iso_ts: str | None) -> float | None:
+    if not iso_ts:
+        return None
+    try:
+        return max((datetime.utcnow() - datetime.fromisoformat(iso_ts)).total_seconds(), 0.0)
+    except ValueError:
+        return None
+
+
+class RollingCounter:
+    def __init__(self, horizon_seconds: int = DAY_SECONDS) -> None:
+        self.horizon_seconds = horizon_seconds
+        self._buckets: deque[list[float]] = deque()
+
+    def add(self, amount: int = 1, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        start = now - now % BUCKET_SECONDS
+        if self._buckets and self._buckets[-1][0] == start:
+            self._buckets[-1][1] += amount
+        else:
+            self._buckets.append([start, amount])
+        while self._buckets and self._buckets[0][0] <= now - self.horizon_seconds:
+            self._buckets.popleft()
+
+    def total(self, seconds: int, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        lower = now - seconds
+        return int(sum(count for start, count in self._buckets if start > lower - BUCKET_SECONDS))
+
+
+class LatencyWindow:
+    def __init__(self, max_samples: int = 2000, horizon_seconds: int = HOUR_SECONDS) -> None:
+        self.horizon_seconds = horizon_seconds
+        self._samples: deque[tuple[float, float]] = deque(maxlen=max_samples)
+
+    def add(self, seconds: float, now: float | None = None) -> None:
+        self._samples.append((time.time() if now is None else now, seconds))
+
+    def percentiles(self, now: float | None = None) -> tuple[float, float] | None:
+        now = time.time() if now is None else now
+        values = sorted(value for ts, value in self._samples if ts > now - self.horizon_seconds)
+        if not values:
+            return None
+        return values[int(0.5 * (len(values) - 1))], values[int(0.95 * (len(values) - 1))]
+
+
+class PipelineStats:
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._counters: dict[tuple[str, str], RollingCounter] = {}
+        self._latency: dict[str, LatencyWindow] = {}
+        self.feeds_polled = RollingCounter()
+        self.feeds_not_modified = RollingCounter()
+
+    def _counter(self, stage: str, outcome: str) -> RollingCounter:
+        counter = self._counters.get((stage, outcome))
+        if counter is None:
+            counter = self._counters[(stage, outcome)] = RollingCounter()
+        return counter
+
+    def record(self, stage: str, outcome: str, latency: float | None = None) -> None:
+        self._counter(stage, outcome).add()
+        if outcome == OUTCOME_OK and latency is not None:
+            self._latency.setdefault(stage, LatencyWindow()).add(latency)
+
+    def record_feed(self, not_modified: bool) -> None:
+        self.feeds_polled.add()
+        if not_modified:
+            self.feeds_not_modified.add()
+
+    def count(self, stage: str, outcome: str, seconds: int) -> int:
+        counter = self._counters.get((stage, outcome))
+        return counter.total(seconds) if counter else 0
+
+    def percentiles(self, stage: str) -> tuple[float, float] | None:
+        window = self._latency.get(stage)
+        return window.percentiles() if window else None
+
+    def stage_summary(self, stage: str) -> dict[str, object]:
+        done_1h = self.count(stage, OUTCOME_OK, HOUR_SECONDS)
+        failed_1h = self.count(stage, OUTCOME_FAILED, HOUR_SECONDS)
+        retries_1h = self.count(stage, OUTCOME_RETRY, HOUR_SECONDS)
+        attempts_1h = done_1h + failed_1h + retries_1h
+        return {
+            "done_1h": done_1h,
+            "done_24h": self.count(stage, OUTCOME_OK, DAY_SECONDS),
+            "failed_24h": self.count(stage, OUTCOME_FAILED, DAY_SECONDS),
+            "retry_rate_1h": retries_1h / attempts_1h if attempts_1h else 0.0,
+            "failure_rate_1h": failed_1h / (done_1h + failed_1h) if done_1h + failed_1h else 0.0,
+            "latency": self.percentiles(stage),
+        }
+
+    def feed_summary(self) -> dict[str, object]:
+        polled = self.feeds_polled.total(HOUR_SECONDS)
+        not_modified = self.feeds_not_modified.total(HOUR_SECONDS)
+        return {
+            "polled_1h": polled,
+            "polled_24h": self.feeds_polled.total(DAY_SECONDS),
+            "not_modified_rate_1h": not_modified / polled if polled else 0.0,
+        }
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from news_bot.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+DISCOVERED = "discovered"
+ENQUEUED = "enqueued"
+CLAIMED = "claimed"
+SCRAPED = "scraped"
+CLEANED = "cleaned"
+UPLOADED = "uploaded"
+NOTIFIED = "notified"
+APPROVED = "approved"
+PUBLISHED = "published"
+DEFERRED = "deferred"
+FAILED = "failed"
+
+TraceEvent = tuple[str, str, float, int | None, float | None, str | None]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
+
+
+class PipelineTracer:
+    def __init__(
+        self,
+        db: Database,
+        flush_seconds: float = 1.0,
+        batch_size: int = 500,
+        max_pending: int = 20000,
+    ) -> None:
+        self.db = db
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped_total = 0
+        self._pending: list[TraceEvent] = []
+        self._task: asyncio.Task[None] | None = None
+        self._stop_event = asyncio.Event()
+
+    def record(
+        self,
+        news_id: str,
+        event: str,
+        attempt: int | None = None,
+        duration: float | None = None,
+        detail: str | None = None,
+    ) -> None:
+        if len(self._pending) >= self.max_pending:
+            self.dropped_total += 1
+            return
+        self._pending.append((news_id, event, time.time(), attempt, duration, detail))
+
+    def record_many(self, news_ids: list[str], event: str, detail: str | None = None) -> None:
+        for news_id in news_ids:
+            self.record(news_id, event, detail=detail)
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("pipeline trace flush failed")
+
+    async def flush(self) -> None:
+        while self._pending:
+            batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size :]
+            await self.db.executemany(
+                "INSERT INTO pipeline_events(news_id, event, ts, attempt, duration, detail) VALUES (?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+
+    async def trace(self, news_id: str) -> list[dict[str, object]]:
+        rows = await self.db.fetchall(
+            "SELECT event, ts, attempt, duration, detail FROM pipeline_events WHERE news_id = ? ORDER BY ts, id",
+            (news_id,),
+        )
+        return [dict(row) for row in rows]
+
+    async def stage_latency(
+        self,
+        from_event: str,
+        to_event: str,
+        since: float,
+        group_by_feed: bool = False,
+    ) -> dict[str, tuple[int, float, float]]:
+        rows = await self.db.fetchall(
+            """
+            SELECT COALESCE(n.feed_url, 'manual') AS feed, b.ts - a.ts AS elapsed
+            FROM (SELECT news_id, MIN(ts) AS ts FROM pipeline_events WHERE event = ? AND ts >= ? GROUP BY news_id) a
+            JOIN (SELECT news_id, MAX(ts) AS ts FROM pipeline_events WHERE event = ? AND ts >= ? GROUP BY news_id) b
+              ON a.news_id = b.news_id AND b.ts >= a.ts
+            LEFT JOIN news n ON n.id = a.news_id
+            """,
+            (from_event, since, to_event, since),
+        )
+        groups: dict[str, list[float]] = {}
+        for row in rows:
+            key = row["feed"] if group_by_feed else "all"
+            groups.setdefault(key, []).append(row["elapsed"])
+        return {
+            key: (len(values), percentile(values, 0.5), percentile(values, 0.95))
+            for key, values in groups.items()
+        }
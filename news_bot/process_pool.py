@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from multiprocessing.process import BaseProcess
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+EventHandler = Callable[[int, str, tuple[Any, ...]], Awaitable[None]]
+WorkerTarget = Callable[[int, Any, Any], None]
+
+
+class ProcessEventRelay:
+    def __init__(self, index: int, events: Any) -> None:
+        self.index = index
+        self.events = events
+
+    def emit(self, kind: str, *payload: Any) -> None:
+        try:
+            self.events.put_nowait((self.index, kind, payload))
+        except queue.Full:
+            logger.warning("event queue full, dropping event=%s worker=%s", kind, self.index)
+
+    def heartbeat(self) -> None:
+        self.emit("heartbeat", time.time())
+
+    def uploaded(self, news_id: str, title: str, edit_url: str) -> None:
+        self.emit("uploaded", news_id, title, edit_url)
+
+    def request_login(self) -> None:
+        self.emit("login_required")
+
+
+@dataclass(slots=True)
+class WorkerHandle:
+    index: int
+    process: BaseProcess
+    started_at: float
+    last_heartbeat: float
+    restarts: int = 0
+    restarting: bool = False
+
+
+class WorkerProcessPool:
+    def __init__(
+        self,
+        size: int,
+        target: WorkerTarget,
+        on_event: EventHandler,
+        heartbeat_timeout: float = 90,
+        check_interval: float = 5,
+    ) -> None:
+        self.size = size
+        self.target = target
+        self.on_event = on_event
+        self.heartbeat_timeout = heartbeat_timeout
+        self.check_interval = check_interval
+        self._ctx = multiprocessing.get_context("spawn")
+        self._events = self._ctx.Queue()
+        self._stop_flag = self._ctx.Event()
+        self._handles: dict[int, WorkerHandle] = {}
+        self._tasks: list[asyncio.Task[None]] = []
+        self._stopping = False
+
+    def _spawn(self, index: int, restarts: int = 0) -> WorkerHandle:
+        process = self._ctx.Process(
+            target=self.target,
+            args=(index, self._events, self._stop_flag),
+            name=f"news-bot-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        now = time.time()
+        handle = WorkerHandle(index, process, now, now, restarts)
+        self._handles[index] = handle
+        logger.info("worker process started index=%s pid=%s restarts=%s", index, process.pid, restarts)
+        return handle
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping = False
+        self._stop_flag.clear()
+        for index in range(self.size):
+            self._spawn(index)
+        self._tasks = [
+            asyncio.create_task(self._drain_events()),
+            asyncio.create_task(self._supervise()),
+        ]
+
+    async def stop(self, timeout: float = 30) -> None:
+        self._stopping = True
+        self._stop_flag.set()
+        for handle in self._handles.values():
+            await asyncio.to_thread(handle.process.join, timeout)
+            if handle.process.is_alive():
+                logger.warning("worker process did not exit, terminating index=%s", handle.index)
+                handle.process.terminate()
+                await asyncio.to_thread(handle.process.join, 5)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._handles.clear()
+
+    def health(self) -> list[dict[str, Any]]:
+        now = time.time()
+        return [
+            {
+                "index": handle.index,
+                "pid": handle.process.pid,
+                "alive": handle.process.is_alive(),
+                "heartbeat_age": round(now - handle.last_heartbeat, 1),
+                "restarts": handle.restarts,
+            }
+            for handle in sorted(self._handles.values(), key=lambda h: h.index)
+        ]
+
+    async def _drain_events(self) -> None:
+        while True:
+            try:
+                index, kind, payload = await asyncio.to_thread(self._events.get, True, 1.0)
+            except queue.Empty:
+                continue
+            handle = self._handles.get(index)
+            if handle:
+                handle.last_heartbeat = time.time()
+            if kind == "heartbeat":
+                continue
+            try:
+                await self.on_event(index, kind, payload)
+            except Exception:
+                logger.exception("worker event handler failed kind=%s worker=%s", kind, index)
+
+    async def _supervise(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(self.check_interval)
+            now = time.time()
+            for handle in list(self._handles.values()):
+                if self._stopping:
+                    return
+                if handle.restarting:
+                    continue
+                process = handle.process
+                if process.is_alive() and now - handle.last_heartbeat <= self.heartbeat_timeout:
+                    continue
+                if process.is_alive():
+                    logger.error("worker process unresponsive, terminating index=%s pid=%s", handle.index, process.pid)
+                    process.terminate()
+                    await asyncio.to_thread(process.join, 5)
+                else:
+                    logger.error("worker process exited index=%s exitcode=%s", handle.index, process.exitcode)
+                handle.restarting = True
+                delay = min(2 ** handle.restarts, 60) if now - handle.started_at < 60 else 0
+                self._tasks = [task for task in self._tasks if not task.done()]
+                self._tasks.append(asyncio.create_task(self._respawn(handle, delay)))
+
+    async def _respawn(self, handle: WorkerHandle, delay: float) -> None:
+        await asyncio.sleep(delay)
+        if not self._stopping:
+            self._spawn(handle.index, handle.restarts + 1)
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from news_bot.circuit_breaker import CircuitOpenError
+from news_bot.config import Settings
+from news_bot.database import Database
+from news_bot.models import QueueType
+from news_bot.pipeline_trace import CLAIMED, DEFERRED, PipelineTracer
+from news_bot.utils.jalali_time import TEHRAN, in_tehran_hours
+
+logger = logging.getLogger(__name__)
+
+
+WorkerFn = Callable[[str], Awaitable[None]]
+BatchWorkerFn = Callable[[list[str]], Awaitable[None]]
+ReadyFn = Callable[[], Awaitable[bool]]
+
+HOUR_SECONDS = 3600
+
+
+@dataclass(slots=True)
+class PublishPacing:
+    min_gap_seconds: int = 120
+    jitter_seconds: int = 120
+    max_per_hour: int = 15
+    quiet_hours: tuple[int, int] | None = None
+    urgent_priority: int = 1
+    batch_size: int = 10
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> PublishPacing:
+        return cls(
+            min_gap_seconds=settings.publish_min_gap_seconds,
+            jitter_seconds=settings.publish_jitter_seconds,
+            max_per_hour=settings.publish_max_per_hour,
+            quiet_hours=settings.publish_quiet_hours,
+            urgent_priority=settings.publish_urgent_priority,
+            batch_size=settings.publish_batch_size,
+        )
+
+    def in_quiet_hours(self, ts: float) -> bool:
+        return in_tehran_hours(ts, self.quiet_hours)
+
+    def quiet_hours_end(self, ts: float) -> float:
+        if not self.quiet_hours:
+            return ts
+        local = datetime.fromtimestamp(ts, tz=TEHRAN)
+        end = local.replace(hour=self.quiet_hours[1], minute=0, second=0, microsecond=0)
+        if end <= local:
+            end += timedelta(days=1)
+        return end.timestamp()
+
+
+@dataclass(order=True, slots=True)
+class PublishSlot:
+    due_at: float
+    seq: int
+    news_id: str = field(compare=False)
+    queue_id: int = field(compare=False)
+    urgent: bool = field(compare=False, default=False)
+
+
+class PublishScheduler:
+    def __init__(
+        self,
+        db: Database,
+        worker_fn: WorkerFn,
+        pacing: PublishPacing,
+        poll_seconds: float = 1.0,
+        batch_fn: BatchWorkerFn | None = None,
+        tracer: PipelineTracer | None = None,
+        ready: ReadyFn | None = None,
+    ) -> None:
+        self.db = db
+        self.worker_fn = worker_fn
+        self.ready = ready
+        self.batch_fn = batch_fn
+        self.tracer = tracer
+        self.pacing = pacing
+        self.poll_seconds = poll_seconds
+        self._heap: list[PublishSlot] = []
+        self._known: set[int] = set()
+        self._published: deque[float] = deque()
+        self._last_published = 0.0
+        self._seq = itertools.count()
+        self._task: asyncio.Task[None] | None = None
+        self._stop_event = asyncio.Event()
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            await self._task
+
+    def clear(self) -> None:
+        self._heap.clear()
+        self._known.clear()
+
+    def pending(self) -> list[PublishSlot]:
+        return sorted(self._heap)
+
+    def schedule(self, news_id: str, queue_id: int, priority: int, now: float | None = None) -> PublishSlot:
+        now = time.time() if now is None else now
+        urgent = priority <= self.pacing.urgent_priority
+        slot = PublishSlot(self._assign(urgent, now), next(self._seq), news_id, queue_id, urgent)
+        heapq.heappush(self._heap, slot)
+        self._known.add(queue_id)
+        if urgent:
+            self._reflow(now)
+        return slot
+
+    def _window_count(self, ts: float) -> int:
+        lower = ts - HOUR_SECONDS
+        count = sum(1 for published in self._published if lower < published <= ts)
+        count += sum(1 for slot in self._heap if lower < slot.due_at <= ts)
+        return count
+
+    def _earliest_in_window(self, ts: float) -> float:
+        lower = ts - HOUR_SECONDS
+        times = [published for published in self._published if lower < published <= ts]
+        times.extend(slot.due_at for slot in self._heap if lower < slot.due_at <= ts)
+        return min(times)
+
+    def _assign(self, urgent: bool, now: float) -> float:
+        if urgent:
+            pending = [slot.due_at for slot in self._heap if slot.urgent]
+            if pending:
+                return max(pending)
+            return max(now, self._last_published + self.pacing.min_gap_seconds)
+
+        previous = max([self._last_published] + [slot.due_at for slot in self._heap])
+        gap = self.pacing.min_gap_seconds + random.uniform(0, max(self.pacing.jitter_seconds, 0))
+        candidate = max(now, previous + gap)
+        while True:
+            if self.pacing.in_quiet_hours(candidate):
+                candidate = self.pacing.quiet_hours_end(candidate)
+                continue
+            if self.pacing.max_per_hour > 0 and self._window_count(candidate) >= self.pacing.max_per_hour:
+                candidate = self._earliest_in_window(candidate) + HOUR_SECONDS
+                continue
+            return candidate
+
+    def _reflow(self, now: float) -> None:
+        regular = sorted(slot for slot in self._heap if not slot.urgent)
+        self._heap = [slot for slot in self._heap if slot.urgent]
+        heapq.heapify(self._heap)
+        for slot in regular:
+            slot.due_at = self._assign(False, now)
+            heapq.heappush(self._heap, slot)
+
+    def _respace(self, now: float) -> None:
+        earliest = self._last_published + self.pacing.min_gap_seconds
+        if any(not slot.urgent and slot.due_at < earliest for slot in self._heap):
+            self._reflow(now)
+
+    async def _refill(self) -> None:
+        rows = await self.db.peek_queue(QueueType.PUBLISH)
+        for row in rows:
+            if row["id"] in self._known:
+                continue
+            slot = self.schedule(row["news_id"], row["id"], row["priority"])
+            logger.info(
+                "publish slot assigned news_id=%s due_at=%s urgent=%s",
+                slot.news_id,
+                datetime.fromtimestamp(slot.due_at, tz=TEHRAN).isoformat(timespec="seconds"),
+                slot.urgent,
+            )
+
+    async def _wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await self._refill()
+            except Exception:
+                logger.exception("publish scheduler refill failed")
+            if not self._heap:
+                await self._wait(self.poll_seconds)
+                continue
+            self._respace(time.time())
+            delay = self._heap[0].due_at - time.time()
+            if delay > 0:
+                await self._wait(min(delay, self.poll_seconds))
+                continue
+            if self.ready and not await self.ready():
+                await self._wait(self.poll_seconds)
+                continue
+            now = time.time()
+            due = [heapq.heappop(self._heap)]
+            limit = max(self.pacing.batch_size, 1) if self.batch_fn and due[0].urgent else 1
+            while self._heap and len(due) < limit and self._heap[0].urgent and self._heap[0].due_at <= now:
+                due.append(heapq.heappop(self._heap))
+            news_ids = [slot.news_id for slot in due]
+            if self.tracer:
+                self.tracer.record_many(news_ids, CLAIMED, detail=QueueType.PUBLISH.value)
+            deferred = False
+            try:
+                if len(due) > 1 and self.batch_fn:
+                    await self.batch_fn(news_ids)
+                else:
+                    await self.worker_fn(news_ids[0])
+            except CircuitOpenError as exc:
+                deferred = True
+                self._defer(due, exc)
+            except Exception:
+                logger.exception("worker failed queue=%s news_ids=%s", QueueType.PUBLISH.value, news_ids)
+            finally:
+                if not deferred:
+                    for slot in due:
+                        await self.db.delete_queue(slot.queue_id)
+                        self._known.discard(slot.queue_id)
+                    self._last_published = time.time()
+                    self._published.extend([self._last_published] * len(due))
+                    while self._published and self._published[0] <= self._last_published - HOUR_SECONDS:
+                        self._published.popleft()
+
+    def _defer(self, due: list[PublishSlot], exc: CircuitOpenError) -> None:
+        for slot in due:
+            slot.due_at = max(slot.due_at, exc.retry_at)
+            heapq.heappush(self._heap, slot)
+        if self.tracer:
+            self.tracer.record_many([slot.news_id for slot in due], DEFERRED, detail=f"{QueueType.PUBLISH.value} {exc.host}")
+        logger.info("deferred %d publish slots: %s", len(due), exc)
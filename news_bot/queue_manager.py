@@ -3,23 +3,52 @@ from __future__ import annotations
 import asyncio
 import logging
 import random
-from collections.abc import Awaitable, Callable
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from functools import partial
 
+from news_bot.backpressure import BackpressureController
+from news_bot.circuit_breaker import CircuitOpenError
+from news_bot.config import Settings
 from news_bot.database import Database
+from news_bot.fair_queue import FairQueuePolicy
+from news_bot.metrics import QUEUE_CLAIM_SECONDS, QUEUE_ITEMS
 from news_bot.models import QueueType
+from news_bot.pipeline_trace import CLAIMED, DEFERRED, PipelineTracer
+from news_bot.publish_scheduler import BatchWorkerFn, PublishPacing, PublishScheduler
 
 logger = logging.getLogger(__name__)
 
 
 WorkerFn = Callable[[str], Awaitable[None]]
+AdmissionFn = Callable[[QueueType], int | None]
+ReadyFn = Callable[[], Awaitable[bool]]
 
 
 class QueueWorker:
-    def __init__(self, db: Database, queue_type: QueueType, worker_fn: WorkerFn, delay_range: tuple[int, int] | None = None) -> None:
+    def __init__(
+        self,
+        db: Database,
+        queue_type: QueueType,
+        worker_fn: WorkerFn,
+        delay_range: tuple[int, int] | None = None,
+        admission: AdmissionFn | None = None,
+        ready: ReadyFn | None = None,
+        tracer: PipelineTracer | None = None,
+        policy: FairQueuePolicy | None = None,
+        max_priority: int | None = None,
+    ) -> None:
         self.db = db
         self.queue_type = queue_type
+        self.policy = policy
+        self.max_priority = max_priority
+        self.tracer = tracer
         self.worker_fn = worker_fn
         self.delay_range = delay_range
+        self.admission = admission
+        self.ready = ready
+        self._claim_seconds = QUEUE_CLAIM_SECONDS.labels(queue_type.value)
+        self._items = QUEUE_ITEMS.labels(queue_type.value)
         self._task: asyncio.Task[None] | None = None
         self._stop_event = asyncio.Event()
 
@@ -36,37 +65,117 @@ class QueueWorker:
 
     async def _run(self) -> None:
         while not self._stop_event.is_set():
-            row = await self.db.pop_queue(self.queue_type)
+            if self.ready and not await self.ready():
+                await asyncio.sleep(1)
+                continue
+            max_priority = self.admission(self.queue_type) if self.admission else None
+            if self.max_priority is not None:
+                max_priority = self.max_priority if max_priority is None else min(max_priority, self.max_priority)
+            started = time.perf_counter()
+            row = await self.db.pop_queue(self.queue_type, max_priority, self.policy)
+            self._claim_seconds.observe(time.perf_counter() - started)
             if not row:
                 await asyncio.sleep(1)
                 continue
             news_id = row["news_id"]
+            self._items.inc()
+            if self.tracer:
+                self.tracer.record(news_id, CLAIMED, detail=self.queue_type.value)
             try:
                 await self.worker_fn(news_id)
+            except CircuitOpenError as exc:
+                await self._defer(row["news_id"], row["priority"], exc)
+                continue
             except Exception:
                 logger.exception("worker failed queue=%s news_id=%s", self.queue_type, news_id)
             if self.delay_range:
                 await asyncio.sleep(random.randint(*self.delay_range))
 
+    async def _defer(self, news_id: str, priority: int, exc: CircuitOpenError) -> None:
+        await self.db.defer_queue(news_id, self.queue_type, priority, exc.retry_at)
+        if self.tracer:
+            self.tracer.record(news_id, DEFERRED, detail=f"{self.queue_type.value} {exc.host}")
+        logger.info("deferred queue=%s news_id=%s: %s", self.queue_type, news_id, exc)
+
 
 class QueueManager:
-    def __init__(self, db: Database) -> None:
+    def __init__(self, db: Database, settings: Settings, tracer: PipelineTracer | None = None) -> None:
         self.db = db
-        self._workers: list[QueueWorker] = []
-
-    def setup_workers(self, scrape_fn: WorkerFn, upload_fn: WorkerFn, publish_fn: WorkerFn) -> None:
-        self._workers = [
-            QueueWorker(self.db, QueueType.SCRAPE, scrape_fn),
-            QueueWorker(self.db, QueueType.UPLOAD, upload_fn),
-            QueueWorker(self.db, QueueType.PUBLISH, publish_fn, delay_range=(120, 240)),
-        ]
+        self.settings = settings
+        self.tracer = tracer
+        self.backpressure = BackpressureController(settings, db)
+        self.publish_scheduler: PublishScheduler | None = None
+        self.policy = FairQueuePolicy.from_settings(settings)
+        self._workers: list[QueueWorker | PublishScheduler] = []
+
+    def setup_workers(
+        self,
+        scrape_fn: WorkerFn,
+        upload_fn: WorkerFn,
+        publish_fn: WorkerFn,
+        stages: Iterable[QueueType] = tuple(QueueType),
+        upload_ready: ReadyFn | None = None,
+        publish_batch_fn: BatchWorkerFn | None = None,
+        publish_ready: ReadyFn | None = None,
+    ) -> None:
+        stages = set(stages)
+        self._workers = []
+        fast_lanes = range(max(self.settings.queue_fast_lane_workers, 0))
+        fast_priority = self.settings.queue_fast_lane_priority
+        if QueueType.SCRAPE in stages:
+            self._workers.append(QueueWorker(
+                self.db,
+                QueueType.SCRAPE,
+                scrape_fn,
+                admission=self.backpressure.priority_cap,
+                tracer=self.tracer,
+                policy=self.policy,
+            ))
+            self._workers.extend(
+                QueueWorker(self.db, QueueType.SCRAPE, scrape_fn, tracer=self.tracer, policy=self.policy, max_priority=fast_priority)
+                for _ in fast_lanes
+            )
+        if QueueType.UPLOAD in stages:
+            self._workers.extend(
+                QueueWorker(self.db, QueueType.UPLOAD, upload_fn, ready=upload_ready, tracer=self.tracer, policy=self.policy)
+                for _ in range(max(self.settings.upload_concurrency, 1))
+            )
+            self._workers.extend(
+                QueueWorker(
+                    self.db,
+                    QueueType.UPLOAD,
+                    partial(upload_fn, urgent=True),
+                    ready=partial(upload_ready, urgent=True) if upload_ready else None,
+                    tracer=self.tracer,
+                    policy=self.policy,
+                    max_priority=fast_priority,
+                )
+                for _ in fast_lanes
+            )
+        if QueueType.PUBLISH in stages:
+            self.publish_scheduler = PublishScheduler(
+                self.db,
+                publish_fn,
+                PublishPacing.from_settings(self.settings),
+                batch_fn=publish_batch_fn,
+                tracer=self.tracer,
+                ready=publish_ready,
+            )
+            self._workers.append(self.publish_scheduler)
 
     def start(self) -> None:
+        self.backpressure.start()
         for worker in self._workers:
             worker.start()
 
     async def stop(self) -> None:
-        await asyncio.gather(*(worker.stop() for worker in self._workers), return_exceptions=True)
+        await asyncio.gather(
+            self.backpressure.stop(),
+            *(worker.stop() for worker in self._workers),
+            return_exceptions=True,
+        )
 
     async def clear(self) -> None:
-        await self.db.execute("DELETE FROM queues")
+        await self.db.clear_queues()
+        if self.publish_scheduler:
+            self.publish_scheduler.clear()
@@ -2,22 +2,42 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from datetime import datetime
 
-import feedparser
+import httpx
 
+from news_bot.backpressure import BackpressureController
+from news_bot.circuit_breaker import BreakerRegistry
 from news_bot.config import Settings
 from news_bot.database import Database
+from news_bot.metrics import FEED_BYTES, FEED_FETCH_SECONDS
 from news_bot.models import NewsStatus, QueueType
+from news_bot.pipeline_stats import PipelineStats
+from news_bot.pipeline_trace import DISCOVERED, ENQUEUED, PipelineTracer
 from news_bot.utils.id_generator import dedupe_hash, make_news_id
 
 logger = logging.getLogger(__name__)
 
 
 class RSSMonitor:
-    def __init__(self, settings: Settings, db: Database) -> None:
+    def __init__(
+        self,
+        settings: Settings,
+        db: Database,
+        backpressure: BackpressureController | None = None,
+        stats: PipelineStats | None = None,
+        tracer: PipelineTracer | None = None,
+        breakers: BreakerRegistry | None = None,
+    ) -> None:
         self.settings = settings
         self.db = db
+        self.backpressure = backpressure
+        self.stats = stats
+        self.tracer = tracer
+        self.breakers = breakers
+        self._validators: dict[str, dict[str, str]] = {}
+        self._client: httpx.AsyncClient | None = None
         self._task: asyncio.Task[None] | None = None
         self._stop_event = asyncio.Event()
 
@@ -31,6 +51,9 @@ class RSSMonitor:
         self._stop_event.set()
         if self._task:
             await self._task
+        if self._client:
+            await self._client.aclose()
+            self._client = None
 
     async def _run(self) -> None:
         while not self._stop_event.is_set():
@@ -40,9 +63,49 @@ class RSSMonitor:
                 logger.exception("rss monitor failed")
             await asyncio.sleep(self.settings.rss_interval_seconds)
 
+    async def _fetch(self, feed_url: str) -> bytes | None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(follow_redirects=True, timeout=httpx.Timeout(30.0, connect=10.0))
+        started = time.perf_counter()
+        response = await self._client.get(feed_url, headers=self._validators.get(feed_url, {}))
+        FEED_FETCH_SECONDS.labels(feed_url).observe(time.perf_counter() - started)
+        FEED_BYTES.labels(feed_url).inc(len(response.content))
+        not_modified = response.status_code == 304
+        if self.stats:
+            self.stats.record_feed(not_modified)
+        if not_modified:
+            return None
+        response.raise_for_status()
+        validators = {}
+        if response.headers.get("etag"):
+            validators["If-None-Match"] = response.headers["etag"]
+        if response.headers.get("last-modified"):
+            validators["If-Modified-Since"] = response.headers["last-modified"]
+        self._validators[feed_url] = validators
+        return response.content
+
     async def check_once(self) -> None:
+        import feedparser
+
+        if self.backpressure and self.backpressure.rss_paused():
+            logger.info("rss check skipped: downstream queues over high watermark")
+            return
         for feed_url in self.settings.rss_feeds:
-            feed = await asyncio.to_thread(feedparser.parse, feed_url)
+            if self.breakers and not self.breakers.allow(feed_url):
+                logger.debug("rss fetch skipped feed=%s: circuit open", feed_url)
+                continue
+            try:
+                content = await self._fetch(feed_url)
+            except httpx.HTTPError as exc:
+                logger.warning("rss fetch failed feed=%s: %s", feed_url, exc)
+                if self.breakers:
+                    self.breakers.failure(feed_url)
+                continue
+            if self.breakers:
+                self.breakers.success(feed_url)
+            if content is None:
+                continue
+            feed = await asyncio.to_thread(feedparser.parse, content)
             for entry in feed.entries:
                 source_url = entry.get("link", "").strip()
                 title = entry.get("title", "").strip()
@@ -66,12 +129,15 @@ class RSSMonitor:
                 news_id = make_news_id()
                 await self.db.execute(
                     """
-                    INSERT OR IGNORE INTO news(id, source_url, title, lead, content_html, image_path, category, status, cms_edit_url, created_at, updated_at)
-                    VALUES (?, ?, ?, '', '', NULL, 'سیاسی', ?, NULL, ?, ?)
+                    INSERT OR IGNORE INTO news(id, source_url, title, lead, content_html, image_path, category, status, cms_edit_url, feed_url, created_at, updated_at)
+                    VALUES (?, ?, ?, '', '', NULL, 'سیاسی', ?, NULL, ?, ?, ?)
                     """,
-                    (news_id, source_url, title, NewsStatus.NEW.value, now, now),
+                    (news_id, source_url, title, NewsStatus.NEW.value, feed_url, now, now),
                 )
                 created = await self.db.fetchone("SELECT id FROM news WHERE source_url = ?", (source_url,))
                 await self.db.execute("INSERT OR IGNORE INTO seen_hashes(hash, created_at) VALUES (?, ?)", (digest, now))
                 if created and created["id"] == news_id:
-                    await self.db.add_queue(news_id, QueueType.SCRAPE)
+                    await self.db.add_queue(news_id, QueueType.SCRAPE, flow=feed_url)
+                    if self.tracer:
+                        self.tracer.record(news_id, DISCOVERED, detail=feed_url)
+                        self.tracer.record(news_id, ENQUEUED, detail=QueueType.SCRAPE.value)
@@ -1,25 +1,29 @@
 from __future__ import annotations
 
-from playwright.async_api import async_playwright
-
+from news_bot.browser import BrowserHost, ManagedContext
+from news_bot.metrics import SCRAPER_PAGES
 from news_bot.scraper.base_scraper import BaseScraper
 
 
 class KhabarOnlineScraper(BaseScraper):
-    def __init__(self, headless: bool = True) -> None:
-        self.headless = headless
+    def __init__(self, browser_host: BrowserHost, max_pages_per_context: int = 0) -> None:
+        self.browser_host = browser_host
+        self.contexts = ManagedContext(browser_host, max_pages_per_context)
 
     async def scrape(self, url: str) -> dict[str, str | None]:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=self.headless)
-            page = await browser.new_page()
-            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            await page.wait_for_timeout(2000)
-            html = await page.content()
-            title = await page.title()
-            lead = await page.locator("meta[name='description']").get_attribute("content")
-            image = await page.locator("article img").first.get_attribute("src") if await page.locator("article img").count() else None
-            await browser.close()
+        async with self.browser_host.lease():
+            page = await self.contexts.new_page()
+            SCRAPER_PAGES.inc()
+            page.once("close", lambda _: SCRAPER_PAGES.dec())
+            try:
+                await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+                await page.wait_for_timeout(2000)
+                html = await page.content()
+                title = await page.title()
+                lead = await page.locator("meta[name='description']").get_attribute("content")
+                image = await page.locator("article img").first.get_attribute("src") if await page.locator("article img").count() else None
+            finally:
+                await page.close()
             return {
                 "title": title.strip(),
                 "lead": (lead or "").strip(),
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any
+
+from news_bot.database import Database
+from news_bot.utils.persian_text import match_expression, normalize, search_text
+
+logger = logging.getLogger(__name__)
+
+
+class SearchIndex:
+    def __init__(self, db: Database, batch_size: int = 500, pause_seconds: float = 0.05) -> None:
+        self.db = db
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.backfilled_total = 0
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def available(self) -> bool:
+        return self.db.search_available
+
+    async def index(self, news_id: str, title: str, lead: str, content_html: str) -> None:
+        if not self.available:
+            return
+        try:
+            await self.db.index_news_many([(news_id, normalize(title), normalize(lead), search_text(content_html))])
+        except Exception:
+            logger.exception("search indexing failed news_id=%s", news_id)
+
+    def start(self) -> None:
+        if not self.available or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._backfill())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _backfill(self) -> None:
+        after = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                rows = await self.db.unindexed_news(after, self.batch_size)
+                if not rows:
+                    break
+                after = rows[-1]["rowid"]
+                await self.db.index_news_many([
+                    (row["id"], normalize(row["title"]), normalize(row["lead"]), search_text(row["content_html"]))
+                    for row in rows
+                ])
+                self.backfilled_total += len(rows)
+                await asyncio.sleep(self.pause_seconds)
+        except Exception:
+            logger.exception("search index backfill failed")
+            return
+        if self.backfilled_total:
+            logger.info("search index backfilled %s stories in %.1fs", self.backfilled_total, time.perf_counter() - started)
+
+    async def search(self, query: str, limit: int = 10) -> list[dict[str, Any]]:
+        match = match_expression(query)
+        if not match or not self.available:
+            return []
+        return [dict(row) for row in await self.db.search_news(match, limit)]
@@ -1,50 +1,155 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import date
+import logging
+from collections.abc import Callable
+from datetime import date, datetime
 
 from news_bot.database import Database
 
+logger = logging.getLogger(__name__)
+
+
+StateDict = dict[str, str | None]
+StateListener = Callable[[StateDict], None]
+
+PROFILE_SESSION_SEPARATOR = "/"
+
+DEFAULT_STATE: StateDict = {
+    "bot_status": "OFF",
+    "selected_profile": "didbaniran",
+    "selected_user": None,
+    "last_login_date": None,
+    "session_valid_until": None,
+}
+
 
 class StateManager:
     def __init__(self, db: Database) -> None:
         self.db = db
-        self._otp_waiter: asyncio.Future[str] | None = None
-
-    async def get_state(self) -> dict[str, str | None]:
-        row = await self.db.fetchone("SELECT bot_status, selected_profile, selected_user, last_login_date FROM state WHERE id = 1")
-        if not row:
-            return {
-                "bot_status": "OFF",
-                "selected_profile": "didbaniran",
-                "selected_user": None,
-                "last_login_date": None,
-            }
-        return dict(row)
+        self._otp_waiters: dict[str, asyncio.Future[str]] = {}
+        self._state: StateDict | None = None
+        self._account_sessions: dict[str, str | None] = {}
+        self._changed = asyncio.Event()
+        self._listeners: list[StateListener] = []
+
+    async def load(self) -> StateDict:
+        row = await self.db.fetchone(
+            "SELECT bot_status, selected_profile, selected_user, last_login_date, session_valid_until FROM state WHERE id = 1"
+        )
+        state = dict(row) if row else dict(DEFAULT_STATE)
+        accounts = await self.db.fetchall("SELECT username, session_valid_until FROM cms_users")
+        sessions = await self.db.fetchall("SELECT session_key, session_valid_until FROM cms_sessions")
+        self._account_sessions = {account["username"]: account["session_valid_until"] for account in accounts}
+        self._account_sessions.update((session["session_key"], session["session_valid_until"]) for session in sessions)
+        if state != self._state:
+            self._state = state
+            self._notify()
+        return dict(state)
+
+    def snapshot(self) -> StateDict:
+        return dict(self._state or DEFAULT_STATE)
+
+    async def get_state(self) -> StateDict:
+        if self._state is None:
+            return await self.load()
+        return self.snapshot()
+
+    def subscribe(self, listener: StateListener) -> None:
+        self._listeners.append(listener)
+
+    async def wait_changed(self) -> StateDict:
+        await self._changed.wait()
+        return self.snapshot()
+
+    def _notify(self) -> None:
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+        snapshot = self.snapshot()
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception:
+                logger.exception("state listener failed")
+
+    async def _write(self, column: str, value: str | None) -> None:
+        await self.db.execute(f"UPDATE state SET {column} = ? WHERE id = 1", (value,))
+        state = self.snapshot()
+        if state.get(column) == value and self._state is not None:
+            return
+        state[column] = value
+        self._state = state
+        self._notify()
 
     async def set_bot_status(self, status: str) -> None:
-        await self.db.execute("UPDATE state SET bot_status = ? WHERE id = 1", (status,))
+        await self._write("bot_status", status)
 
     async def set_profile(self, profile: str) -> None:
-        await self.db.execute("UPDATE state SET selected_profile = ? WHERE id = 1", (profile,))
+        await self._write("selected_profile", profile)
 
     async def set_selected_user(self, username: str | None) -> None:
-        await self.db.execute("UPDATE state SET selected_user = ? WHERE id = 1", (username,))
+        await self._write("selected_user", username)
+
+    async def set_last_login_today(self, username: str | None = None) -> None:
+        today = date.today().isoformat()
+        if username is None:
+            await self._write("last_login_date", today)
+            return
+        await self.db.execute("UPDATE cms_users SET last_login_date = ? WHERE username = ?", (today, username))
+
+    async def set_session_valid_until(self, username: str | None, valid_until: datetime | None) -> None:
+        value = valid_until.isoformat(timespec="seconds") if valid_until else None
+        if username is None:
+            await self._write("session_valid_until", value)
+            return
+        if self._account_sessions.get(username) == value:
+            return
+        if PROFILE_SESSION_SEPARATOR in username:
+            await self.db.execute(
+                """
+                INSERT INTO cms_sessions(session_key, session_valid_until) VALUES (?, ?)
+                ON CONFLICT(session_key) DO UPDATE SET session_valid_until = excluded.session_valid_until
+                """,
+                (username, value),
+            )
+        else:
+            await self.db.execute("UPDATE cms_users SET session_valid_until = ? WHERE username = ?", (value, username))
+        self._account_sessions[username] = value
+
+    def session_valid_until(self, username: str | None = None) -> str | None:
+        if username is None:
+            return self.snapshot().get("session_valid_until")
+        return self._account_sessions.get(username)
+
+    @staticmethod
+    def profile_session_key(profile: str, username: str) -> str:
+        return f"{profile}{PROFILE_SESSION_SEPARATOR}{username}"
 
-    async def set_last_login_today(self) -> None:
-        await self.db.execute("UPDATE state SET last_login_date = ? WHERE id = 1", (date.today().isoformat(),))
+    def needs_login(self, username: str | None = None) -> bool:
+        valid_until = self.session_valid_until(username)
+        return not valid_until or valid_until <= datetime.utcnow().isoformat(timespec="seconds")
 
-    async def needs_login(self) -> bool:
-        state = await self.get_state()
-        return state.get("last_login_date") != date.today().isoformat()
+    def prepare_otp_waiter(self, account: str) -> asyncio.Future[str]:
+        previous = self._otp_waiters.get(account)
+        if previous and not previous.done():
+            previous.cancel()
+        waiter = asyncio.get_running_loop().create_future()
+        self._otp_waiters[account] = waiter
+        return waiter
 
-    def prepare_otp_waiter(self) -> asyncio.Future[str]:
-        loop = asyncio.get_running_loop()
-        self._otp_waiter = loop.create_future()
-        return self._otp_waiter
+    def otp_accounts(self) -> list[str]:
+        for account in [account for account, waiter in self._otp_waiters.items() if waiter.done()]:
+            del self._otp_waiters[account]
+        return list(self._otp_waiters)
 
-    def submit_otp(self, otp: str) -> bool:
-        if self._otp_waiter and not self._otp_waiter.done():
-            self._otp_waiter.set_result(otp)
-            return True
-        return False
+    def submit_otp(self, otp: str, account: str | None = None) -> str | None:
+        pending = self.otp_accounts()
+        if account is None:
+            if len(pending) != 1:
+                return None
+            account = pending[0]
+        waiter = self._otp_waiters.pop(account, None)
+        if waiter is None:
+            return None
+        waiter.set_result(otp)
+        return account
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import re
+import time
 
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram import CallbackQuery, InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.error import Conflict, InvalidToken, TelegramError
 from telegram.ext import (
     Application,
@@ -14,16 +16,30 @@ from telegram.ext import (
     filters,
 )
 
+from news_bot.circuit_breaker import CLOSED, BreakerRegistry
 from news_bot.cleaner import ContentCleaner
+from news_bot.cms.account_pool import CMSAccountPool
 from news_bot.config import Settings
 from news_bot.database import Database
+from news_bot.diagnostics import Profiler
+from news_bot.fanout import ProfileFanout
+from news_bot.handoff import StageHandoff
 from news_bot.models import NewsStatus, QueueType
+from news_bot.pipeline_stats import LATENCY_LABELS, PipelineStats
+from news_bot.pipeline_trace import APPROVED, DISCOVERED, ENQUEUED, PUBLISHED, SCRAPED, UPLOADED, PipelineTracer
 from news_bot.queue_manager import QueueManager
+from news_bot.search_index import SearchIndex
 from news_bot.state_manager import StateManager
+from news_bot.telegram_outbox import TelegramOutbox
+from news_bot.utils.id_generator import make_news_id
 
 logger = logging.getLogger(__name__)
 
 
+URL_PATTERN = re.compile(r"https?://[^\s<>\"']+")
+MAX_URL_FILE_BYTES = 1024 * 1024
+
+
 class TelegramController:
     def __init__(
         self,
@@ -32,19 +48,40 @@ class TelegramController:
         state_manager: StateManager,
         queue_manager: QueueManager,
         cleaner: ContentCleaner,
+        stats: PipelineStats | None = None,
+        accounts: CMSAccountPool | None = None,
+        tracer: PipelineTracer | None = None,
+        profiler: Profiler | None = None,
+        breakers: BreakerRegistry | None = None,
+        search_index: SearchIndex | None = None,
+        fanout: ProfileFanout | None = None,
+        handoff: StageHandoff | None = None,
     ) -> None:
         self.settings = settings
         self.db = db
         self.state_manager = state_manager
         self.queue_manager = queue_manager
         self.cleaner = cleaner
+        self.stats = stats
+        self.accounts = accounts
+        self.tracer = tracer
+        self.profiler = profiler
+        self.breakers = breakers
+        self.search_index = search_index
+        self.handoff = handoff
+        self.fanout = fanout
+        self._background: set[asyncio.Task[None]] = set()
+        self.outbox = TelegramOutbox(settings, db)
         self.app: Application | None = None
         self.enabled = False
         self._polling_stopped_due_conflict = False
         token = (settings.telegram_token or "").strip()
         if token:
             try:
-                self.app = Application.builder().token(token).build()
+                builder = Application.builder().token(token)
+                if settings.telegram_api_base_url:
+                    builder = builder.base_url(settings.telegram_api_base_url)
+                self.app = builder.build()
                 self._register_handlers()
                 self.enabled = True
             except InvalidToken:
@@ -60,13 +97,21 @@ class TelegramController:
         self.app.add_handler(CommandHandler("off", self.on_off))
         self.app.add_handler(CommandHandler("reset", self.on_reset))
         self.app.add_handler(CommandHandler("status", self.on_status))
+        self.app.add_handler(CommandHandler("stats", self.on_stats))
+        self.app.add_handler(CommandHandler("trace", self.on_trace))
+        self.app.add_handler(CommandHandler("search", self.on_search))
+        self.app.add_handler(CommandHandler("latency", self.on_latency))
+        self.app.add_handler(CommandHandler("diag", self.on_diag))
         self.app.add_handler(CommandHandler("adduser", self.on_add_user))
         self.app.add_handler(CommandHandler("user", self.on_select_user))
         self.app.add_handler(CommandHandler("profile", self.on_select_profile))
         self.app.add_handler(CommandHandler("addurl", self.on_add_url))
         self.app.add_handler(CommandHandler("blacklist", self.on_blacklist))
-        self.app.add_handler(MessageHandler(filters.Regex(r"^\d{6}$"), self.on_otp))
-        self.app.add_handler(CallbackQueryHandler(self.on_callback, pattern=r"^(publish|delete|profile|userselect):"))
+        self.app.add_handler(CommandHandler("approve", self.on_approve))
+        self.app.add_handler(CommandHandler("otp", self.on_otp))
+        self.app.add_handler(MessageHandler(filters.Regex(r"^(\S+\s+)?\d{6}$"), self.on_otp))
+        self.app.add_handler(MessageHandler(filters.Document.TXT, self.on_url_file))
+        self.app.add_handler(CallbackQueryHandler(self.on_callback, pattern=r"^(publish|publishnow|delete|profile|userselect|approve):"))
 
     async def start(self) -> None:
         if not self.enabled or not self.app:
@@ -75,6 +120,7 @@ class TelegramController:
         await self.app.start()
         if self.app.updater:
             await self.app.updater.start_polling(error_callback=self._polling_error_handler)
+        self.outbox.start(self.app.bot)
         await self._send_startup_message()
 
     def _polling_error_handler(self, error: TelegramError) -> None:
@@ -121,6 +167,7 @@ class TelegramController:
     async def stop(self) -> None:
         if not self.enabled or not self.app:
             return
+        await self.outbox.stop()
         if self.app.updater:
             await self.app.updater.stop()
         await self.app.stop()
@@ -133,7 +180,7 @@ class TelegramController:
         return bool(chat and chat.id == self.settings.allowed_chat_id)
 
     def _profile_keyboard(self) -> InlineKeyboardMarkup:
-        keyboard = [[InlineKeyboardButton("didbaniran", callback_data="profile:didbaniran")]]
+        keyboard = [[InlineKeyboardButton(name, callback_data=f"profile:{name}")] for name in self.settings.site_profiles]
         return InlineKeyboardMarkup(keyboard)
 
     async def _user_keyboard(self) -> InlineKeyboardMarkup | None:
@@ -180,7 +227,157 @@ class TelegramController:
         if not await self._authorized(update):
             return
         state = await self.state_manager.get_state()
-        await update.effective_message.reply_text(str(state))
+        backpressure = self.queue_manager.backpressure.describe()
+        lines = [str(state), f"RSS paused: {backpressure['rss_paused']} | shed stale: {backpressure['shed_total']}"]
+        for name, info in backpressure["queues"].items():
+            flag = "THROTTLED" if info["throttled"] else "ok"
+            lines.append(f"{name}: {info['depth']} (high={info['high']}, low={info['low']}) {flag}")
+        if self.breakers:
+            now = time.time()
+            for breaker in sorted(self.breakers.describe(), key=lambda row: (row["state"] == CLOSED, row["host"])):
+                retry = f", retry in {max(breaker['retry_at'] - now, 0):.0f}s" if breaker["retry_at"] else ""
+                origin = f" [{breaker['origin']}]" if breaker["origin"] != "main" else ""
+                lines.append(
+                    f"Circuit {breaker['host']}{origin}: {breaker['state']} | fail {breaker['failure_rate']:.0%} of {breaker['calls']}"
+                    f" | trips {breaker['trips_total']}, rejected {breaker['rejected_total']}{retry}"
+                )
+        await update.effective_message.reply_text("\n".join(lines))
+
+    async def on_stats(self, update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._authorized(update):
+            return
+        depths = await self.db.queue_depths()
+        lines = ["Queues: " + " | ".join(f"{queue_type.value}={depths.get(queue_type.value, 0)}" for queue_type in QueueType)]
+        if self.stats:
+            for queue_type in QueueType:
+                summary = self.stats.stage_summary(queue_type.value)
+                latency = summary["latency"]
+                latency_text = f"p50 {latency[0]:.0f}s p95 {latency[1]:.0f}s" if latency else "p50/p95 n/a"
+                lines.append(
+                    f"{queue_type.value}: {summary['done_1h']}/1h {summary['done_24h']}/24h | "
+                    f"{LATENCY_LABELS[queue_type.value]} {latency_text} | "
+                    f"retry {summary['retry_rate_1h']:.0%} fail {summary['failure_rate_1h']:.0%} ({summary['failed_24h']} failed/24h)"
+                )
+            feeds = self.stats.feed_summary()
+            lines.append(f"Feeds polled: {feeds['polled_1h']}/1h {feeds['polled_24h']}/24h | 304 hits {feeds['not_modified_rate_1h']:.0%}")
+        accounts = self.fanout.describe() if self.fanout else self.accounts.describe() if self.accounts else []
+        if accounts:
+            for account in accounts:
+                health = "ok" if account["authenticated"] else "login needed"
+                if account["logging_in"]:
+                    health = "logging in"
+                profile = f" [{account['profile']}]" if account["profile"] else ""
+                lines.append(
+                    f"CMS {account['username']}{profile}: {health}, in flight {account['in_flight']}, "
+                    f"valid until {account['valid_until'] or '-'}, last probe {account['last_probe_ok']}"
+                )
+        lines.append(f"Telegram outbox: sent {self.outbox.sent_total}, coalesced {self.outbox.coalesced_total}, dropped {self.outbox.dropped_total}")
+        await update.effective_message.reply_text("\n".join(lines))
+
+    async def on_trace(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._authorized(update):
+            return
+        if not self.tracer or not context.args:
+            await update.effective_message.reply_text("Usage: /trace <news id or source url>")
+            return
+        key = context.args[0]
+        row = await self.db.fetchone("SELECT id, title FROM news WHERE id = ? OR source_url = ?", (key, key))
+        if not row:
+            await update.effective_message.reply_text("News not found")
+            return
+        await self.tracer.flush()
+        events = await self.tracer.trace(row["id"])
+        if not events:
+            await update.effective_message.reply_text(f"No trace recorded for {row['title']}")
+            return
+        started = events[0]["ts"]
+        lines = [f"{row['title']} ({row['id']})"]
+        previous = started
+        for event in events:
+            line = f"+{event['ts'] - started:.1f}s (waited {event['ts'] - previous:.1f}s) {event['event']}"
+            if event["attempt"]:
+                line += f" attempt {event['attempt']}"
+            if event["duration"] is not None:
+                line += f" took {event['duration']:.1f}s"
+            if event["detail"]:
+                line += f" [{event['detail']}]"
+            lines.append(line)
+            previous = event["ts"]
+        await update.effective_message.reply_text("\n".join(lines)[:4096])
+
+    async def on_search(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._authorized(update):
+            return
+        if not self.search_index or not self.search_index.available:
+            await update.effective_message.reply_text("Search is not available on this database")
+            return
+        query = " ".join(context.args or [])
+        if not query:
+            await update.effective_message.reply_text("Usage: /search <words or \"exact phrase\">")
+            return
+        started = time.perf_counter()
+        results = await self.search_index.search(query, self.settings.search_result_limit)
+        elapsed = time.perf_counter() - started
+        if not results:
+            await update.effective_message.reply_text(f"No stories match {query} ({elapsed * 1000:.0f}ms)")
+            return
+        lines = [f"{len(results)} stories for {query} ({elapsed * 1000:.0f}ms):"]
+        for number, row in enumerate(results, 1):
+            lines.append(f"{number}. {row['title']} [{row['status']}, {row['created_at'][:10]}]")
+            if row["snippet"]:
+                lines.append(f"   {row['snippet']}")
+            lines.append(f"   {row['cms_edit_url'] or row['source_url']}")
+        await update.effective_message.reply_text("\n".join(lines)[:4096], disable_web_page_preview=True)
+
+    async def on_latency(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._authorized(update):
+            return
+        if not self.tracer:
+            return
+        hours = int(context.args[0]) if context.args and context.args[0].isdigit() else 24
+        since = time.time() - hours * 3600
+        await self.tracer.flush()
+        lines = [f"Latency over the last {hours}h (count, p50, p95):"]
+        for label, start, end in (
+            ("discovered→scraped", DISCOVERED, SCRAPED),
+            ("scraped→uploaded", SCRAPED, UPLOADED),
+            ("uploaded→published", UPLOADED, PUBLISHED),
+            ("discovered→published", DISCOVERED, PUBLISHED),
+        ):
+            result = (await self.tracer.stage_latency(start, end, since)).get("all")
+            lines.append(f"{label}: " + (f"{result[0]}, {result[1]:.0f}s, {result[2]:.0f}s" if result else "n/a"))
+        for feed, result in sorted((await self.tracer.stage_latency(DISCOVERED, PUBLISHED, since, group_by_feed=True)).items()):
+            lines.append(f"{feed}: {result[0]}, {result[1]:.0f}s, {result[2]:.0f}s")
+        await update.effective_message.reply_text("\n".join(lines))
+
+    async def on_diag(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._authorized(update):
+            return
+        args = context.args or []
+        kind = args[0] if args else "cpu"
+        if not self.profiler or kind not in {"cpu", "mem"}:
+            await update.effective_message.reply_text("Usage: /diag <cpu|mem> [seconds]")
+            return
+        if self.profiler.busy():
+            await update.effective_message.reply_text("A profile is already running")
+            return
+        seconds = min(int(args[1]), 600) if len(args) > 1 and args[1].isdigit() else self.settings.profile_default_seconds
+        task = asyncio.create_task(self._run_profile(self.profiler, kind, seconds))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        await update.effective_message.reply_text(f"Started {kind} profile for {seconds}s")
+
+    async def _run_profile(self, profiler: Profiler, kind: str, seconds: int) -> None:
+        try:
+            if kind == "cpu":
+                path, summary = await profiler.cpu(seconds)
+            else:
+                path, summary = await profiler.memory(seconds)
+        except Exception:
+            logger.exception("%s profile failed", kind)
+            await self.send_message(f"{kind} profile failed")
+            return
+        await self.send_message(f"{kind} profile written to {path}\n\n{summary[:3500]}")
 
     async def on_add_user(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         if not await self._authorized(update):
@@ -217,19 +414,49 @@ class TelegramController:
             return
         await update.effective_message.reply_text("Step 1: Select profile", reply_markup=self._profile_keyboard())
 
-    async def on_add_url(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async def on_add_url(self, update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
         if not await self._authorized(update):
             return
-        if not context.args:
-            await update.effective_message.reply_text("Usage: /addurl <url>")
+        urls = URL_PATTERN.findall(update.effective_message.text or "")
+        if not urls:
+            await update.effective_message.reply_text("Usage: /addurl <url> [<url> ...] or send a .txt file with one URL per line")
+            return
+        await update.effective_message.reply_text(await self._ingest_urls(urls))
+
+    async def on_url_file(self, update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._authorized(update):
+            return
+        document = update.effective_message.document
+        if not document:
             return
-        source_url = context.args[0]
-        row = await self.db.fetchone("SELECT id FROM news WHERE source_url = ?", (source_url,))
-        if row:
-            await self.db.add_queue(row["id"], QueueType.SCRAPE, priority=1)
-            await update.effective_message.reply_text("Queued existing URL")
+        if document.file_size and document.file_size > MAX_URL_FILE_BYTES:
+            await update.effective_message.reply_text("URL file is too large (max 1 MB)")
             return
-        await update.effective_message.reply_text("URL not found in database yet")
+        telegram_file = await document.get_file()
+        content = bytes(await telegram_file.download_as_bytearray()).decode("utf-8", errors="ignore")
+        urls = URL_PATTERN.findall(content)
+        if not urls:
+            await update.effective_message.reply_text("No URLs found in file")
+            return
+        await update.effective_message.reply_text(await self._ingest_urls(urls))
+
+    async def _ingest_urls(self, urls: list[str]) -> str:
+        unique = list(dict.fromkeys(url.rstrip(".,;)") for url in urls))
+        limit = self.settings.manual_ingest_max_urls
+        dropped = max(len(unique) - limit, 0)
+        counts, queued = await self.db.ingest_urls(
+            [(make_news_id(), url) for url in unique[:limit]],
+            self.settings.manual_ingest_priority,
+        )
+        if self.tracer:
+            self.tracer.record_many(queued, DISCOVERED, detail="manual")
+            self.tracer.record_many(queued, ENQUEUED, detail=QueueType.SCRAPE.value)
+        reply = f"Queued {counts['inserted']} new and {counts['requeued']} existing URLs for scraping"
+        if counts["skipped"]:
+            reply += f"; {counts['skipped']} already processed"
+        if dropped:
+            reply += f"; {dropped} over the {limit} URL limit ignored"
+        return reply
 
     async def on_blacklist(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         if not await self._authorized(update):
@@ -241,12 +468,67 @@ class TelegramController:
         await self.cleaner.add_blacklist_phrase(phrase)
         await update.effective_message.reply_text("Blacklist phrase added")
 
-    async def on_otp(self, update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+    async def _awaiting_approval(self) -> list[dict[str, str | None]]:
+        return [dict(row) for row in await self.db.awaiting_approval()]
+
+    async def on_approve(self, update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
         if not await self._authorized(update):
             return
-        text = (update.effective_message.text or "").strip()
-        if self.state_manager.submit_otp(text):
-            await update.effective_message.reply_text("OTP received")
+        pending = await self._awaiting_approval()
+        if not pending:
+            await update.effective_message.reply_text("No uploaded stories are waiting for approval")
+            return
+        keyboard = [[
+            InlineKeyboardButton(f"Schedule all ({len(pending)})", callback_data="approve:sched:all"),
+            InlineKeyboardButton(f"Publish all now ({len(pending)})", callback_data="approve:now:all"),
+        ]]
+        lines = [f"{len(pending)} uploaded stories awaiting approval:"]
+        for index, feed_url in enumerate(self.settings.rss_feeds):
+            count = sum(1 for row in pending if row["feed_url"] == feed_url)
+            if not count:
+                continue
+            lines.append(f"{feed_url}: {count}")
+            keyboard.append([
+                InlineKeyboardButton(f"Schedule feed {index + 1} ({count})", callback_data=f"approve:sched:{index}"),
+                InlineKeyboardButton(f"Now feed {index + 1} ({count})", callback_data=f"approve:now:{index}"),
+            ])
+        await update.effective_message.reply_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(keyboard))
+
+    async def _approve(self, mode: str, scope: str) -> int:
+        pending = await self._awaiting_approval()
+        if scope != "all":
+            index = int(scope)
+            if index >= len(self.settings.rss_feeds):
+                return 0
+            pending = [row for row in pending if row["feed_url"] == self.settings.rss_feeds[index]]
+        news_ids = [row["id"] for row in pending]
+        if self.tracer:
+            self.tracer.record_many(news_ids, APPROVED, detail=mode)
+        if mode == "now":
+            await self.db.add_queue_many(news_ids, QueueType.PUBLISH, priority=self.settings.publish_urgent_priority)
+        else:
+            await self.db.add_queue_many(news_ids, QueueType.PUBLISH)
+        return len(news_ids)
+
+    async def on_otp(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        explicit = context.args is not None
+        pending = self.state_manager.otp_accounts()
+        if not pending and not explicit:
+            return
+        if not await self._authorized(update):
+            return
+        parts = context.args if explicit else (update.effective_message.text or "").split()
+        if not parts or len(parts) > 2:
+            await update.effective_message.reply_text("Usage: /otp [account] <code>")
+            return
+        account = parts[0] if len(parts) == 2 else None
+        received = self.state_manager.submit_otp(parts[-1], account)
+        if received:
+            await update.effective_message.reply_text(f"OTP received for {received}")
+        elif not pending:
+            await update.effective_message.reply_text("No CMS login is waiting for an OTP")
+        else:
+            await update.effective_message.reply_text(f"Send \"<account> <code>\"; waiting: {', '.join(pending)}")
 
     async def on_callback(self, update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
         query = update.callback_query
@@ -271,23 +553,44 @@ class TelegramController:
             await self.state_manager.set_bot_status("ON")
             await query.edit_message_text(f"Selected user: {username}. Bot is ON. RSS monitoring and queues are active.")
             return
+        if data.startswith("approve:"):
+            _, mode, scope = data.split(":", 2)
+            count = await self._approve(mode, scope)
+            if mode == "now":
+                await query.edit_message_text(f"Publishing {count} stories as one batch")
+            else:
+                await query.edit_message_text(f"Added {count} stories to publish schedule")
+            return
         action, news_id = data.split(":", 1)
+        if action in {"publish", "publishnow"} and self.tracer:
+            self.tracer.record(news_id, APPROVED, detail=action)
         if action == "publish":
-            await self.db.add_queue(news_id, QueueType.PUBLISH, priority=1)
-            await query.edit_message_text("Added to publish queue")
+            await self.db.add_queue(news_id, QueueType.PUBLISH)
+            await self._resolve_item(query, news_id, "Added to publish schedule")
+        elif action == "publishnow":
+            await self.db.add_queue(news_id, QueueType.PUBLISH, priority=self.settings.publish_urgent_priority)
+            await self._resolve_item(query, news_id, "Publishing ahead of schedule")
         elif action == "delete":
             await self.db.execute("UPDATE news SET status = ? WHERE id = ?", (NewsStatus.DELETED.value, news_id))
-            await query.edit_message_text("Deleted")
+            if self.handoff:
+                self.handoff.discard(news_id)
+            await self._resolve_item(query, news_id, "Deleted")
+
+    async def _resolve_item(self, query: CallbackQuery, news_id: str, text: str) -> None:
+        markup = query.message.reply_markup if query.message else None
+        rows = list(markup.inline_keyboard) if markup else []
+        if len(rows) <= 1:
+            await query.edit_message_text(text)
+            return
+        remaining = [row for row in rows if not any((button.callback_data or "").endswith(f":{news_id}") for button in row)]
+        await query.edit_message_reply_markup(InlineKeyboardMarkup(remaining) if remaining else None)
+
+    async def send_message(self, text: str) -> None:
+        if not self.enabled or not self.app or not self.settings.allowed_chat_id:
+            return
+        await self.outbox.enqueue_text(self.settings.allowed_chat_id, text)
 
     async def send_uploaded_notification(self, news_id: str, title: str, edit_url: str) -> None:
         if not self.enabled or not self.app or not self.settings.allowed_chat_id:
             return
-        keyboard = [[
-            InlineKeyboardButton("Publish", callback_data=f"publish:{news_id}"),
-            InlineKeyboardButton("Delete", callback_data=f"delete:{news_id}"),
-        ]]
-        await self.app.bot.send_message(
-            chat_id=self.settings.allowed_chat_id,
-            text=f"Uploaded: {title}\n{edit_url}",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-        )
+        await self.outbox.enqueue_uploaded(self.settings.allowed_chat_id, news_id, title, edit_url)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from news_bot.config import Settings
+from news_bot.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+KIND_TEXT = "text"
+KIND_UPLOADED = "uploaded"
+MAX_MESSAGE_LENGTH = 4096
+MAX_BACKOFF_SECONDS = 300
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def upload_buttons(news_id: str, prefix: str = "") -> list[InlineKeyboardButton]:
+    return [
+        InlineKeyboardButton(f"{prefix}Publish", callback_data=f"publish:{news_id}"),
+        InlineKeyboardButton(f"{prefix}Publish now", callback_data=f"publishnow:{news_id}"),
+        InlineKeyboardButton(f"{prefix}Delete", callback_data=f"delete:{news_id}"),
+    ]
+
+
+class TelegramOutbox:
+    def __init__(self, settings: Settings, db: Database) -> None:
+        self.settings = settings
+        self.db = db
+        self._bot: Bot | None = None
+        self._global = TokenBucket(settings.telegram_global_messages_per_second, settings.telegram_global_messages_per_second)
+        self._chats: dict[int, TokenBucket] = {}
+        self._paused_until: dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self.sent_total = 0
+        self.coalesced_total = 0
+        self.dropped_total = 0
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._task:
+            await self._task
+            self._task = None
+
+    async def enqueue_text(self, chat_id: int, text: str) -> None:
+        await self._enqueue(chat_id, KIND_TEXT, {"text": text})
+
+    async def enqueue_uploaded(self, chat_id: int, news_id: str, title: str, edit_url: str) -> None:
+        await self._enqueue(chat_id, KIND_UPLOADED, {"news_id": news_id, "title": title, "edit_url": edit_url})
+
+    async def _enqueue(self, chat_id: int, kind: str, payload: dict[str, str]) -> None:
+        await self.db.add_outbox(chat_id, kind, json.dumps(payload, ensure_ascii=False))
+        self._wakeup.set()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            per_minute = self.settings.telegram_chat_messages_per_minute
+            bucket = TokenBucket(per_minute / 60, min(per_minute, 3))
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0.05))
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                hold = await self._drain()
+            except Exception:
+                logger.exception("telegram outbox drain failed")
+                hold = 5.0
+            if self._stop_event.is_set():
+                return
+            await self._wait(hold)
+
+    async def _drain(self) -> float:
+        now = time.time()
+        rows = await self.db.due_outbox(now)
+        hold = 5.0
+        next_at = await self.db.next_outbox_attempt(now)
+        if next_at:
+            hold = min(hold, next_at - now)
+        by_chat: dict[int, list[sqlite3.Row]] = {}
+        for row in rows:
+            by_chat.setdefault(row["chat_id"], []).append(row)
+        for chat_id, chat_rows in by_chat.items():
+            if self._paused(chat_id):
+                hold = min(hold, self._paused_until[chat_id] - time.time())
+                continue
+            for row in (row for row in chat_rows if row["kind"] == KIND_TEXT):
+                if self._paused(chat_id):
+                    break
+                await self._deliver(chat_id, [row])
+            uploads = [row for row in chat_rows if row["kind"] == KIND_UPLOADED]
+            limit = max(self.settings.telegram_digest_max_items, 1)
+            while uploads and not self._paused(chat_id):
+                age = (datetime.utcnow() - datetime.fromisoformat(uploads[0]["created_at"])).total_seconds()
+                if len(uploads) < limit and age < self.settings.telegram_coalesce_seconds:
+                    hold = min(hold, self.settings.telegram_coalesce_seconds - age)
+                    break
+                chunk, uploads = uploads[:limit], uploads[limit:]
+                await self._deliver(chat_id, chunk)
+        return hold
+
+    def _paused(self, chat_id: int) -> bool:
+        return self._paused_until.get(chat_id, 0) > time.time()
+
+    def _render(self, rows: list[sqlite3.Row]) -> tuple[str, InlineKeyboardMarkup | None]:
+        payloads = [json.loads(row["payload"]) for row in rows]
+        if rows[0]["kind"] == KIND_TEXT:
+            return payloads[0]["text"], None
+        if len(payloads) == 1:
+            item = payloads[0]
+            return f"Uploaded: {item['title']}\n{item['edit_url']}", InlineKeyboardMarkup([upload_buttons(item["news_id"])])
+        lines = [f"Uploaded {len(payloads)} stories:"]
+        keyboard = []
+        for index, item in enumerate(payloads, start=1):
+            lines.append(f"{index}. {item['title']}\n{item['edit_url']}")
+            keyboard.append(upload_buttons(item["news_id"], prefix=f"{index}. "))
+        text = "\n".join(lines)
+        if len(text) > MAX_MESSAGE_LENGTH:
+            text = text[: MAX_MESSAGE_LENGTH - 1] + "…"
+        return text, InlineKeyboardMarkup(keyboard)
+
+    async def _deliver(self, chat_id: int, rows: list[sqlite3.Row]) -> None:
+        if not self._bot:
+            return
+        ids = [row["id"] for row in rows]
+        text, markup = self._render(rows)
+        await self._chat_bucket(chat_id).acquire()
+        await self._global.acquire()
+        try:
+            await self._bot.send_message(chat_id=chat_id, text=text, reply_markup=markup)
+        except RetryAfter as exc:
+            delay = exc.retry_after.total_seconds() if isinstance(exc.retry_after, timedelta) else float(exc.retry_after)
+            logger.warning("telegram flood control; retrying in %.0fs chat_id=%s", delay, chat_id)
+            self._paused_until[chat_id] = time.time() + delay
+            await self.db.execute(
+                f"UPDATE telegram_outbox SET next_attempt_at = ? WHERE id IN ({','.join('?' for _ in ids)})",
+                (time.time() + delay, *ids),
+            )
+            return
+        except (BadRequest, Forbidden):
+            logger.exception("telegram rejected outbox message; dropping ids=%s", ids)
+            self.dropped_total += len(ids)
+            await self.db.delete_outbox(ids)
+            return
+        except TelegramError:
+            attempts = max(row["attempts"] for row in rows) + 1
+            if attempts >= self.settings.telegram_send_max_attempts:
+                logger.exception("telegram send failed %d times; dropping ids=%s", attempts, ids)
+                self.dropped_total += len(ids)
+                await self.db.delete_outbox(ids)
+                return
+            logger.warning("telegram send failed; retrying ids=%s attempt=%d", ids, attempts)
+            await self.db.defer_outbox(ids, time.time() + min(2 ** attempts, MAX_BACKOFF_SECONDS))
+            return
+        await self.db.delete_outbox(ids)
+        self.sent_total += 1
+        self.coalesced_total += len(ids) - 1
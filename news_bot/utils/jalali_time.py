@@ -10,6 +10,16 @@ def now_tehran() -> datetime:
     return datetime.now(tz=TEHRAN)
 
 
+def in_tehran_hours(ts: float, window: tuple[int, int] | None) -> bool:
+    if not window:
+        return False
+    start, end = window
+    hour = datetime.fromtimestamp(ts, tz=TEHRAN).hour
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
 def _gregorian_to_jalali(gy: int, gm: int, gd: int) -> tuple[int, int, int]:
     g_days_in_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
     j_days_in_month = [31, 31, 31, 31, 31, 31, 30, 30, 30, 30, 30, 29]
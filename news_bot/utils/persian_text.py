@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import html
+import re
+
+TAG_RE = re.compile(r"<(script|style)\b.*?</\1\s*>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+DIACRITICS_RE = re.compile("[\u064b-\u065f\u0670\u0640]")
+SPACE_RE = re.compile(r"\s+")
+PHRASE_RE = re.compile(r'"([^"]+)"|(\S+)')
+WORD_RE = re.compile(r"\w+")
+CHARACTERS = str.maketrans({
+    "ي": "ی",
+    "ى": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+    "\u200c": " ",
+    "\u200d": "",
+    "\u200f": "",
+    "\u200e": "",
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+})
+
+
+def normalize(text: str) -> str:
+    text = DIACRITICS_RE.sub("", text.translate(CHARACTERS))
+    return SPACE_RE.sub(" ", text).strip().lower()
+
+
+def strip_html(content_html: str) -> str:
+    return html.unescape(TAG_RE.sub(" ", content_html))
+
+
+def search_text(content_html: str) -> str:
+    return normalize(strip_html(content_html))
+
+
+def match_expression(query: str) -> str:
+    terms = []
+    for phrase, word in PHRASE_RE.findall(query):
+        words = WORD_RE.findall(normalize(phrase or word))
+        if words:
+            terms.append('"' + " ".join(words) + '"')
+    if terms and " " not in terms[-1]:
+        terms[-1] += "*"
+    return " ".join(terms)
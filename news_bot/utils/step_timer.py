@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import time
+
+
+class StepTimer:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.steps: dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._last = self._started
+
+    def mark(self, step: str) -> None:
+        now = time.perf_counter()
+        self.steps[step] = self.steps.get(step, 0.0) + (now - self._last)
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self._started
+
+    def summary(self) -> str:
+        parts = " ".join(f"{step}={seconds * 1000:.0f}ms" for step, seconds in self.steps.items())
+        return f"{self.name} total={self.total * 1000:.0f}ms {parts}"